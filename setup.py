@@ -23,6 +23,14 @@ setuptools.setup(
         "requests-toolbelt>=0.9.1",
         "contextlib2>=0.5.5",
     ],
+    extras_require={
+        "async": ["httpx>=0.23.0"],
+        "http2": ["httpx[http2]>=0.23.0"],
+        "compression": ["brotli>=1.0.9", "zstandard>=0.18.0"],
+        "opentelemetry": ["opentelemetry-api>=1.12.0"],
+        "pandas": ["pandas>=2.0.0"],
+        "arrow": ["pyarrow>=8.0.0"],
+    },
     setup_requires=["pytest-runner"],
     tests_require=["pytest"],
 )
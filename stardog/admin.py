@@ -2,11 +2,13 @@
 
 """
 
+import concurrent.futures
 import json
 import contextlib2
 import urllib
 from time import sleep
 
+from . import catalog as catalog
 from . import content_types as content_types
 from .http import client
 
@@ -26,18 +28,53 @@ class Admin(object):
         username: object = None,
         password: object = None,
         auth: object = None,
+        session: object = None,
+        pool: object = None,
+        pool_maxsize: object = None,
+        pool_block: object = None,
+        keep_alive: object = None,
+        compress_uploads: object = False,
+        transport: object = None,
+        hooks: object = None,
+        metadata_cache: object = None,
     ) -> None:
         """Initializes an admin connection to a Stardog server.
 
         Args:
           endpoint (str, optional): Url of the server endpoint.
-            Defaults to `http://localhost:5820`
+            Defaults to `http://localhost:5820`. A list of urls, or a
+            :class:`stardog.http.cluster.Cluster`, routes changes to the
+            cluster coordinator and spreads reads across the nodes
           username (str, optional): Username to use in the connection.
             Defaults to `admin`
           password (str, optional): Password to use in the connection.
             Defaults to `admin`
         auth (requests.auth.AuthBase, optional): requests Authentication object.
             Defaults to `None`
+          session (requests.session.Session, optional): requests Session object.
+            Defaults to `None`
+          pool (stardog.http.client.ConnectionPool, optional): Connection pool
+            shared with other connections to the same endpoint.
+            Defaults to `None`
+          pool_maxsize (int, optional): Maximum number of pooled connections
+            when not sharing a pool. Defaults to 10
+          pool_block (bool, optional): Wait for a free pooled connection
+            instead of opening a throwaway one. Defaults to False
+          keep_alive (bool, optional): Reuse connections between requests.
+            Defaults to True
+          compress_uploads (bool, optional): gzip files bulk loaded by
+            :meth:`new_database` while uploading them, unless they are
+            already encoded. Defaults to False
+          transport (str or stardog.http.transports.Transport, optional):
+            HTTP backend, 'requests', 'urllib3' or 'httpx' (HTTP/2), or a
+            Transport instance. Defaults to 'requests'
+          hooks (list[callable], optional): Called with a
+            :class:`stardog.http.instrumentation.RequestEvent` holding the
+            timings of every request. Defaults to `None`
+          metadata_cache (stardog.cache.MetadataCache, optional): Cache for
+            the database, user, role, virtual graph and data source lists
+            and for database options and namespaces, invalidated by changes
+            made through this Admin. Defaults to `None`
 
         auth and username/password should not be used together.  If the are the value
         of `auth` will take precedent.
@@ -45,7 +82,22 @@ class Admin(object):
           >>> admin = Admin(endpoint='http://localhost:9999',
                             username='admin', password='admin')
         """
-        self.client = client.Client(endpoint, None, username, password, auth=auth)
+        self.client = client.Client(
+            endpoint,
+            None,
+            username,
+            password,
+            auth=auth,
+            session=session,
+            pool=pool,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=keep_alive,
+            compress_uploads=compress_uploads,
+            transport=transport,
+            hooks=hooks,
+            metadata_cache=metadata_cache,
+        )
 
     def shutdown(self):
         """Shuts down the server."""
@@ -153,6 +205,7 @@ class Admin(object):
                     fmeta["context"] = context
 
                 fmetas.append(fmeta)
+                data, encoding = self.client._upload(content, data)
                 params.append(
                     (
                         fname,
@@ -160,7 +213,7 @@ class Admin(object):
                             fname,
                             data,
                             content.content_type,
-                            {"Content-Encoding": content.content_encoding},
+                            {"Content-Encoding": encoding},
                         ),
                     )
                 )
@@ -173,7 +226,19 @@ class Admin(object):
             }
 
             params.append(("root", (None, json.dumps(meta), "application/json")))
-            self.client.post("/admin/databases", files=params)
+
+            if self.client.compress_uploads:
+                # requests reads every file into memory to build a multipart
+                # body, so stream it instead
+                parts = [(field,) + (part + (None,))[:4] for field, part in params]
+                content_type, body = self.client._multipart_stream(parts)
+                self.client.post(
+                    "/admin/databases",
+                    data=body,
+                    headers={"Content-Type": content_type},
+                )
+            else:
+                self.client.post("/admin/databases", files=params)
             return Database(name, self.client)
 
     def restore(self, from_path, *, name=None, force=False):
@@ -1033,6 +1098,55 @@ class Admin(object):
         self.client.post("/admin/cache/target", json=params)
         return CacheTarget(name, self.client)
 
+    def snapshot(self, max_workers=8):
+        """Fetches the databases, users, roles, virtual graphs and data
+        sources of the server into a catalog.
+
+        The listings are requested at once, and the details of each item,
+        such as database options, as soon as its listing arrives.
+
+        Args:
+          max_workers (int, optional): Number of requests sent at once.
+            Defaults to 8
+
+        Returns:
+          stardog.catalog.Catalog: The snapshot
+
+        Examples:
+          >>> catalog = admin.snapshot()
+          >>> catalog.databases['mydb']['search.enabled']
+          >>> catalog.roles_granting('read', 'db', 'mydb')
+        """
+        details = {
+            "databases": (self.databases, lambda db: db.get_all_options()),
+            "users": (
+                self.users,
+                lambda user: [role.name for role in user.roles()],
+            ),
+            "roles": (self.roles, lambda role: role.permissions()),
+            "virtual_graphs": (self.virtual_graphs, lambda vg: vg.info()),
+            "datasources": (self.datasources, None),
+        }
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            listings = {
+                pool.submit(listing): kind for kind, (listing, _) in details.items()
+            }
+            pending = {}
+            for listing in concurrent.futures.as_completed(listings):
+                kind = listings[listing]
+                detail = details[kind][1]
+                pending[kind] = [
+                    (item.name, detail and pool.submit(detail, item))
+                    for item in listing.result()
+                ]
+
+        fetched = {
+            kind: {name: future and future.result() for name, future in items}
+            for kind, items in pending.items()
+        }
+        return catalog.Catalog(**fetched)
+
     def __enter__(self):
         return self
 
@@ -1201,40 +1315,101 @@ class Database(object):
         :return: True if the operation succeeded.
         :rtype: Bool
         """
+        namespaces = self.__namespace_option()
+        if prefix in namespaces:
+            raise Exception(
+                "Namespace already exists for this database: "
+                f"{{'prefix': '{prefix}', 'name': '{namespaces[prefix]}'}}"
+            )
 
-        # easy way to check if a namespace already exists
-        current_namespaces = self.namespaces()
-        for namespace in current_namespaces:
-            if prefix == namespace["prefix"]:
-                raise Exception(
-                    f"Namespace already exists for this database: {namespace}"
-                )
-
-        namespaces = self.get_options("database.namespaces")["database.namespaces"]
-        namespace_to_append = f"{prefix}={iri}"
-        namespaces.append(namespace_to_append)
-        result = self.set_options({"database.namespaces": namespaces})
-        return result
+        namespaces[prefix] = iri
+        return self.__set_namespace_option(namespaces)
 
     def remove_namespace(self, prefix):
         """Removes a specific namespace from a database
         :return: True if the operation succeeded.
         :rtype: Bool
         """
+        namespaces = self.__namespace_option()
+        if prefix not in namespaces:
+            raise Exception(f"Namespace does not exists for this database: {prefix}")
 
-        # easy way to check if a namespace already exists
-        current_namespaces = self.namespaces()
-        for namespace in current_namespaces:
-            if prefix == namespace["prefix"]:
-                namespaces = self.get_options("database.namespaces")[
-                    "database.namespaces"
-                ]
-                namespace_to_remove = f"{prefix}={namespace['name']}"
-                namespaces.remove(namespace_to_remove)
-                result = self.set_options({"database.namespaces": namespaces})
-                return result
+        del namespaces[prefix]
+        return self.__set_namespace_option(namespaces)
+
+    def set_namespaces(self, namespaces):
+        """Replaces the namespaces of a database.
+
+        The current namespaces are read once and compared locally, and the
+        database options are only written, once, if they differ.
+
+        Args:
+          namespaces (dict): Maps every prefix to keep to its IRI
+
+        Returns:
+          dict: The prefixes `added`, `removed` and `changed`, each a sorted
+            list. All empty if nothing was written
+
+        Examples:
+          >>> db.set_namespaces({'ex': 'http://example.org/', 'owl': OWL})
+        """
+        current = self.__namespace_option()
+        # keeps the current order, new prefixes go last
+        updated = {p: namespaces[p] for p in current if p in namespaces}
+        updated.update(namespaces)
+        return self.__apply_namespaces(current, updated)
 
-        raise Exception(f"Namespace does not exists for this database: {namespace}")
+    def update_namespaces(self, add=None, remove=None):
+        """Adds, changes and removes namespaces of a database.
+
+        Same as :meth:`set_namespaces` with the current namespaces, updated
+        with `add`, without those in `remove`.
+
+        Args:
+          add (dict, optional): Maps prefixes to add or change to their IRI
+          remove (iterable of str, optional): Prefixes to remove. Prefixes
+            that are not defined are ignored
+
+        Returns:
+          dict: The prefixes `added`, `removed` and `changed`, as returned by
+            :meth:`set_namespaces`
+
+        Examples:
+          >>> db.update_namespaces(add={'ex': 'http://example.org/'},
+                                   remove=['foaf'])
+        """
+        current = self.__namespace_option()
+        updated = dict(current)
+        updated.update(add or {})
+        for prefix in remove or ():
+            updated.pop(prefix, None)
+        return self.__apply_namespaces(current, updated)
+
+    def __apply_namespaces(self, current, updated):
+        diff = {
+            "added": sorted(set(updated) - set(current)),
+            "removed": sorted(set(current) - set(updated)),
+            "changed": sorted(
+                p for p in updated if p in current and current[p] != updated[p]
+            ),
+        }
+        if any(diff.values()):
+            self.__set_namespace_option(updated)
+        return diff
+
+    def __namespace_option(self):
+        # the database.namespaces option lists 'prefix=iri' strings
+        values = self.get_options("database.namespaces")["database.namespaces"]
+        return dict(value.split("=", 1) for value in values or [])
+
+    def __set_namespace_option(self, namespaces):
+        return self.set_options(
+            {
+                "database.namespaces": [
+                    "{}={}".format(prefix, iri) for prefix, iri in namespaces.items()
+                ]
+            }
+        )
 
     def __repr__(self):
         return self.name
@@ -0,0 +1,4 @@
+from stardog.aio.admin import AsyncAdmin
+from stardog.aio.connection import AsyncConnection
+
+__all__ = ["AsyncAdmin", "AsyncConnection"]
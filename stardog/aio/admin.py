@@ -0,0 +1,661 @@
+"""Administer a Stardog server from asyncio code.
+"""
+
+import json
+import contextlib2
+
+from . import client
+
+
+class AsyncAdmin(object):
+    """Asynchronous Admin Connection.
+
+    Mirrors the database, user, role, query and cluster operations of
+    :class:`stardog.admin.Admin` with coroutine methods. Use
+    :class:`stardog.admin.Admin` for the remaining server resources.
+    """
+
+    def __init__(
+        self,
+        endpoint=None,
+        username=None,
+        password=None,
+        auth=None,
+        session=None,
+        max_connections=100,
+    ):
+        """Initializes an asynchronous admin connection to a Stardog server.
+
+        Args:
+          endpoint (str, optional): Url of the server endpoint.
+            Defaults to `http://localhost:5820`
+          username (str, optional): Username to use in the connection.
+            Defaults to `admin`
+          password (str, optional): Password to use in the connection.
+            Defaults to `admin`
+          auth (httpx.Auth, optional): httpx Authentication object.
+            Defaults to `None`
+          session (httpx.AsyncClient, optional): httpx AsyncClient object.
+            Defaults to `None`
+          max_connections (int, optional): Maximum number of concurrent
+            HTTP connections to the server. Defaults to 100
+
+        Examples:
+          >>> async with AsyncAdmin(endpoint='http://localhost:9999',
+                                    username='admin', password='admin') as admin:
+                dbs = await admin.databases()
+        """
+        self.client = client.AsyncClient(
+            endpoint,
+            None,
+            username,
+            password,
+            auth=auth,
+            session=session,
+            max_connections=max_connections,
+        )
+
+    async def shutdown(self):
+        """Shuts down the server."""
+        await self.client.post("/admin/shutdown")
+
+    async def alive(self):
+        """Determine whether the server is running.
+
+        Returns:
+          bool: True if server is alive
+        """
+        r = await self.client.get("/admin/alive")
+        return r.status_code == 200
+
+    async def healthcheck(self):
+        """Determine whether the server is running and able to accept traffic.
+
+        Returns:
+          bool: True if server is able to accept traffic
+        """
+        r = await self.client.get("/admin/healthcheck")
+        return r.status_code == 200
+
+    async def get_server_metrics(self):
+        """Return metric information from the registry in JSON format.
+
+        Returns:
+          dict: Server metrics
+        """
+        r = await self.client.get("/admin/status")
+        return r.json()
+
+    def database(self, name):
+        """Retrieves an object representing a database.
+
+        Args:
+          name (str): The database name
+
+        Returns:
+          AsyncDatabase: The requested database
+        """
+        return AsyncDatabase(name, self.client)
+
+    async def databases(self):
+        """Retrieves all databases.
+
+        Returns:
+          list[AsyncDatabase]: A list of database objects
+        """
+        r = await self.client.get("/admin/databases")
+        databases = r.json()["databases"]
+        return list(map(lambda name: AsyncDatabase(name, self.client), databases))
+
+    async def new_database(self, name, options=None, *contents, **kwargs):
+        """Creates a new database.
+
+        Takes the same arguments as
+        :meth:`stardog.admin.Admin.new_database`.
+
+        Returns:
+            AsyncDatabase: The database object
+
+        Examples:
+            >>> await admin.new_database('db', {'search.enabled': True})
+        """
+        fmetas = []
+        params = []
+        copy_to_server = kwargs.get("copy_to_server", False)
+        with contextlib2.ExitStack() as stack:
+            for c in contents:
+                content = c[0] if isinstance(c, tuple) else c
+                context = c[1] if isinstance(c, tuple) else None
+
+                data = stack.enter_context(content.data())
+                fname = content.name
+                fmeta = {"filename": fname}
+
+                if context:
+                    fmeta["context"] = context
+
+                fmetas.append(fmeta)
+                headers = (
+                    {"Content-Encoding": content.content_encoding}
+                    if content.content_encoding
+                    else {}
+                )
+                params.append(
+                    (fname, (fname, data, content.content_type, headers)),
+                )
+
+            meta = {
+                "dbname": name,
+                "options": options if options else {},
+                "files": fmetas,
+                "copyToServer": copy_to_server,
+            }
+
+            params.append(("root", (None, json.dumps(meta), "application/json")))
+            await self.client.post("/admin/databases", files=params)
+            return AsyncDatabase(name, self.client)
+
+    async def restore(self, from_path, *, name=None, force=False):
+        """Restore a database.
+
+        Takes the same arguments as :meth:`stardog.admin.Admin.restore`.
+        """
+        params = {"from": from_path, "force": force}
+        if name:
+            params["name"] = name
+
+        await self.client.put("/admin/restore", params=params)
+
+    async def query(self, id):
+        """Gets information about a running query.
+
+        Args:
+          id (str): Query ID
+
+        Returns:
+            dict: Query information
+        """
+        r = await self.client.get("/admin/queries/{}".format(id))
+        return r.json()
+
+    async def queries(self):
+        """Gets information about all running queries.
+
+        Returns:
+          dict: Query information
+        """
+        r = await self.client.get("/admin/queries")
+        return r.json()["queries"]
+
+    async def kill_query(self, id):
+        """Kills a running query.
+
+        Args:
+          id (str): ID of the query to kill
+        """
+        await self.client.delete("/admin/queries/{}".format(id))
+
+    def user(self, name):
+        """Retrieves an object representing a user.
+
+        Args:
+          name (str): The name of the user
+
+        Returns:
+          AsyncUser: The User object
+        """
+        return AsyncUser(name, self.client)
+
+    async def users(self):
+        """Retrieves all users.
+
+        Returns:
+          list[AsyncUser]: A list of User objects
+        """
+        r = await self.client.get("/admin/users")
+        users = r.json()["users"]
+        return list(map(lambda name: AsyncUser(name, self.client), users))
+
+    async def new_user(self, username, password, superuser=False):
+        """Creates a new user.
+
+        Args:
+          username (str): The username
+          password (str): The password
+          superuser (bool): Should the user be super? Defaults to false.
+
+        Returns:
+          AsyncUser: The new User object
+        """
+        meta = {
+            "username": username,
+            "password": list(password),
+            "superuser": superuser,
+        }
+
+        await self.client.post("/admin/users", json=meta)
+        return self.user(username)
+
+    def role(self, name):
+        """Retrieves an object representing a role.
+
+        Args:
+          name (str): The name of the Role
+
+        Returns:
+          AsyncRole: The Role object
+        """
+        return AsyncRole(name, self.client)
+
+    async def roles(self):
+        """Retrieves all roles.
+
+        Returns:
+          list[AsyncRole]: A list of Role objects
+        """
+        r = await self.client.get("/admin/roles")
+        roles = r.json()["roles"]
+        return list(map(lambda name: AsyncRole(name, self.client), roles))
+
+    async def new_role(self, name):
+        """Creates a  new role.
+
+        Args:
+          name (str): The name of the new Role
+
+        Returns:
+          AsyncRole: The new Role object
+        """
+        await self.client.post("/admin/roles", json={"rolename": name})
+        return AsyncRole(name, self.client)
+
+    async def validate(self):
+        """Validates an admin connection."""
+        await self.client.get("/admin/users/valid")
+
+    async def cluster_coordinator_check(self):
+        """Determine if a specific cluster node is the cluster coordinator.
+
+        Returns:
+          bool: True if the node is a coordinator, false if not.
+        """
+        r = await self.client.get("/admin/cluster/coordinator")
+        return r.status_code == 200
+
+    async def cluster_status(self):
+        """Status information for each node in the cluster.
+
+        Returns:
+          dict: Nodes of the cluster and extra information
+        """
+        r = await self.client.get("/admin/cluster/status")
+        return r.json()
+
+    async def cluster_info(self):
+        """Info about the nodes in the Stardog Pack cluster.
+
+        Returns:
+          dict: Nodes of the cluster
+        """
+        r = await self.client.get("/admin/cluster")
+        return r.json()
+
+    async def close(self):
+        """Close the underlying HTTP connections."""
+        await self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+class AsyncDatabase(object):
+    """Asynchronous Database Admin
+
+    See Also:
+      :class:`stardog.admin.Database`
+    """
+
+    def __init__(self, name, client):
+        """Initializes an AsyncDatabase.
+
+        Use :meth:`stardog.aio.AsyncAdmin.database`,
+        :meth:`stardog.aio.AsyncAdmin.databases`, or
+        :meth:`stardog.aio.AsyncAdmin.new_database` instead of
+        constructing manually.
+        """
+        self.database_name = name
+        self.client = client
+        self.path = "/admin/databases/{}".format(name)
+
+    @property
+    def name(self):
+        """The name of the database."""
+        return self.database_name
+
+    async def get_options(self, *options):
+        """Get the value of specific metadata options for a database
+
+        Args:
+          *options (str): Database option names
+
+        Returns:
+          dict: Database options
+        """
+        meta = dict([(x, None) for x in options])
+
+        r = await self.client.put(self.path + "/options", json=meta)
+        return r.json()
+
+    async def get_all_options(self):
+        """Get the value of every metadata option for a database
+
+        Returns:
+          dict: All database metadata
+        """
+        r = await self.client.get(self.path + "/options")
+        return r.json()
+
+    async def set_options(self, options):
+        """Sets database options.
+
+        The database must be offline.
+
+        Args:
+          options (dict): Database options
+        """
+        r = await self.client.post(self.path + "/options", json=options)
+        return r.status_code == 200
+
+    async def optimize(self):
+        """Optimizes a database."""
+        await self.client.put(self.path + "/optimize")
+
+    async def verify(self):
+        """verifies a database."""
+        await self.client.post(self.path + "/verify")
+
+    async def backup(self, *, to=None):
+        """Create a backup of a database on the server.
+
+        Args:
+          to (string, optional): specify a path on the server to store
+            the backup
+        """
+        params = {"to": to} if to else {}
+        await self.client.put(self.path + "/backup", params=params)
+
+    async def online(self):
+        """Sets a database to online state."""
+        await self.client.put(self.path + "/online")
+
+    async def offline(self):
+        """Sets a database to offline state."""
+        await self.client.put(self.path + "/offline")
+
+    async def copy(self, to):
+        """Makes a copy of this database under another name.
+
+        The database must be offline.
+
+        Args:
+          to (str): Name of the new database to be created
+
+        Returns:
+          AsyncDatabase: The new Database
+        """
+        await self.client.put(self.path + "/copy", params={"to": to})
+        return AsyncDatabase(to, self.client)
+
+    async def drop(self):
+        """Drops the database."""
+        await self.client.delete(self.path)
+
+    async def namespaces(self):
+        """Retrieve the namespaces stored in the database.
+
+        Returns:
+          dict: The prefixes and IRIs of the stored namespaces
+        """
+        r = await self.client.get(f"/{self.database_name}/namespaces")
+        return r.json()["namespaces"]
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return self.name == other.name
+
+
+class AsyncUser(object):
+    """Asynchronous User
+
+    See Also:
+      :class:`stardog.admin.User`
+    """
+
+    def __init__(self, name, client):
+        """Initializes an AsyncUser.
+
+        Use :meth:`stardog.aio.AsyncAdmin.user`,
+        :meth:`stardog.aio.AsyncAdmin.users`, or
+        :meth:`stardog.aio.AsyncAdmin.new_user` instead of
+        constructing manually.
+        """
+        self.username = name
+        self.client = client
+        self.path = "/admin/users/{}".format(name)
+
+    @property
+    def name(self):
+        """str: The user name."""
+        return self.username
+
+    async def set_password(self, password):
+        """Sets a new password.
+
+        Args:
+          password (str)
+        """
+        await self.client.put(self.path + "/pwd", json={"password": password})
+
+    async def is_enabled(self):
+        """Checks if the user is enabled.
+
+        Returns:
+          bool: User activation state
+        """
+        r = await self.client.get(self.path + "/enabled")
+        return bool(r.json()["enabled"])
+
+    async def set_enabled(self, enabled):
+        """Enables or disables the user.
+
+        Args:
+          enabled (bool): Desired User state
+        """
+        await self.client.put(self.path + "/enabled", json={"enabled": enabled})
+
+    async def is_superuser(self):
+        """Checks if the user is a super user.
+
+        Returns:
+          bool: Superuser state
+        """
+        r = await self.client.get(self.path + "/superuser")
+        return bool(r.json()["superuser"])
+
+    async def roles(self):
+        """Gets all the User's roles.
+
+        Returns:
+          list[AsyncRole]
+        """
+        r = await self.client.get(self.path + "/roles")
+        roles = r.json()["roles"]
+        return list(map(lambda name: AsyncRole(name, self.client), roles))
+
+    async def add_role(self, role):
+        """Adds an existing role to the user.
+
+        Args:
+          role (str): The name of the role to add
+        """
+        await self.client.post(self.path + "/roles", json={"rolename": role})
+
+    async def remove_role(self, role):
+        """Removes a role from the user.
+
+        Args:
+          role (str): The name of the role to remove
+        """
+        await self.client.delete(self.path + "/roles/" + role)
+
+    async def delete(self):
+        """Deletes the user."""
+        await self.client.delete(self.path)
+
+    async def permissions(self):
+        """Gets the user permissions.
+
+        Returns:
+          dict: User permissions
+        """
+        r = await self.client.get("/admin/permissions/user/{}".format(self.name))
+        return r.json()["permissions"]
+
+    async def add_permission(self, action, resource_type, resource):
+        """Add a permission to the user.
+
+        Args:
+          action (str): Action type (e.g., 'read', 'write')
+          resource_type (str): Resource type (e.g., 'user', 'db')
+          resource (str): Target resource (e.g., 'username', '*')
+        """
+        meta = {
+            "action": action,
+            "resource_type": resource_type,
+            "resource": [resource],
+        }
+        await self.client.put("/admin/permissions/user/{}".format(self.name), json=meta)
+
+    async def remove_permission(self, action, resource_type, resource):
+        """Removes a permission from the user.
+
+        Args:
+          action (str): Action type (e.g., 'read', 'write')
+          resource_type (str): Resource type (e.g., 'user', 'db')
+          resource (str): Target resource (e.g., 'username', '*')
+        """
+        meta = {
+            "action": action,
+            "resource_type": resource_type,
+            "resource": [resource],
+        }
+        await self.client.post(
+            "/admin/permissions/user/{}/delete".format(self.name), json=meta
+        )
+
+    async def effective_permissions(self):
+        """Gets the user's effective permissions.
+
+        Returns:
+          dict: User effective permissions
+        """
+        r = await self.client.get("/admin/permissions/effective/user/" + self.name)
+        return r.json()["permissions"]
+
+    def __eq__(self, other):
+        return self.name == other.name
+
+
+class AsyncRole(object):
+    """Asynchronous Role
+
+    See Also:
+      :class:`stardog.admin.Role`
+    """
+
+    def __init__(self, name, client):
+        """Initializes an AsyncRole.
+
+        Use :meth:`stardog.aio.AsyncAdmin.role`,
+        :meth:`stardog.aio.AsyncAdmin.roles`, or
+        :meth:`stardog.aio.AsyncAdmin.new_role` instead of
+        constructing manually.
+        """
+        self.role_name = name
+        self.client = client
+        self.path = "/admin/roles/{}".format(name)
+
+    @property
+    def name(self):
+        """The name of the Role."""
+        return self.role_name
+
+    async def users(self):
+        """Lists the users for this role.
+
+        Returns:
+          list[AsyncUser]
+        """
+        r = await self.client.get(self.path + "/users")
+        users = r.json()["users"]
+        return list(map(lambda name: AsyncUser(name, self.client), users))
+
+    async def delete(self, force=None):
+        """Deletes the role.
+
+        Args:
+          force (bool): Force deletion of the role
+        """
+        await self.client.delete(self.path, params={"force": force})
+
+    async def permissions(self):
+        """Gets the role permissions.
+
+        Returns:
+          dict: Role permissions
+        """
+        r = await self.client.get("/admin/permissions/role/{}".format(self.name))
+        return r.json()["permissions"]
+
+    async def add_permission(self, action, resource_type, resource):
+        """Adds a permission to the role.
+
+        Args:
+          action (str): Action type (e.g., 'read', 'write')
+          resource_type (str): Resource type (e.g., 'user', 'db')
+          resource (str): Target resource (e.g., 'username', '*')
+        """
+        meta = {
+            "action": action,
+            "resource_type": resource_type,
+            "resource": [resource],
+        }
+        await self.client.put("/admin/permissions/role/{}".format(self.name), json=meta)
+
+    async def remove_permission(self, action, resource_type, resource):
+        """Removes a permission from the role.
+
+        Args:
+          action (str): Action type (e.g., 'read', 'write')
+          resource_type (str): Resource type (e.g., 'user', 'db')
+          resource (str): Target resource (e.g., 'username', '*')
+        """
+        meta = {
+            "action": action,
+            "resource_type": resource_type,
+            "resource": [resource],
+        }
+        await self.client.post(
+            "/admin/permissions/role/{}/delete".format(self.name), json=meta
+        )
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return self.name == other.name
@@ -0,0 +1,125 @@
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from .. import exceptions as exceptions
+from ..http import client
+
+
+class AsyncClient(object):
+    DEFAULT_ENDPOINT = client.Client.DEFAULT_ENDPOINT
+    DEFAULT_USERNAME = client.Client.DEFAULT_USERNAME
+    DEFAULT_PASSWORD = client.Client.DEFAULT_PASSWORD
+
+    def __init__(
+        self,
+        endpoint=None,
+        database=None,
+        username=None,
+        password=None,
+        session=None,
+        auth=None,
+        max_connections=100,
+    ):
+        if httpx is None:
+            raise ImportError(
+                "stardog.aio requires httpx, install it with `pip install pystardog[async]`"
+            )
+
+        self.url = endpoint if endpoint else self.DEFAULT_ENDPOINT
+        self.username = username if username else self.DEFAULT_USERNAME
+
+        if database:
+            self.url = "{}/{}".format(self.url, database)
+
+        if auth is None:
+            auth = httpx.BasicAuth(
+                self.username, password if password else self.DEFAULT_PASSWORD
+            )
+
+        if session is None:
+            self.session = httpx.AsyncClient(
+                auth=auth,
+                timeout=None,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            )
+        elif isinstance(session, httpx.AsyncClient):
+            self.session = session
+            self.session.auth = auth
+        else:
+            raise TypeError(
+                f"type(session) = {type(session)} must be a valid httpx.AsyncClient object."
+            )
+
+    async def post(self, path, **kwargs):
+        return await self._request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self._request("PUT", path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await self._request("GET", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self._request("DELETE", path, **kwargs)
+
+    async def close(self):
+        await self.session.aclose()
+
+    async def _request(self, method, path, stream=False, data=None, **kwargs):
+        # requests silently drops None values, httpx does not
+        for key in ("params", "headers"):
+            if kwargs.get(key) is not None:
+                kwargs[key] = _without_none(kwargs[key])
+
+        if isinstance(data, dict):
+            kwargs["data"] = _without_none(data)
+        elif data is not None:
+            kwargs["content"] = _body(data)
+
+        request = self.session.build_request(method, self.url + path, **kwargs)
+        response = await self.session.send(request, stream=stream)
+        return await self.__wrap(response)
+
+    async def __wrap(self, response):
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            try:
+                msg = response.json()
+            except ValueError:
+                # sometimes errors come as strings
+                msg = {"message": response.text}
+
+            raise exceptions.StardogException(
+                "[{}] {}: {}".format(
+                    response.status_code, msg.get("code", ""), msg.get("message", "")
+                ),
+                response.status_code,
+                msg.get("code"),
+            )
+
+        return response
+
+
+def _without_none(values):
+    return {k: v for k, v in values.items() if v is not None}
+
+
+def _body(data, chunk_size=65536):
+    if not hasattr(data, "read"):
+        return data
+
+    # file objects are read in chunks so large uploads are not buffered
+    async def _chunks():
+        while True:
+            chunk = data.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+
+    return _chunks()
@@ -0,0 +1,465 @@
+"""Connect to Stardog databases from asyncio code.
+"""
+
+import asyncio
+import collections
+import contextlib
+import distutils.util
+
+from .. import content_types as content_types
+from .. import exceptions as exceptions
+from . import client
+
+
+class AsyncConnection(object):
+    """Asynchronous Database Connection.
+
+    Mirrors :class:`stardog.connection.Connection` with coroutine methods,
+    so many queries can be in flight on a single event loop.
+    """
+
+    def __init__(
+        self,
+        database,
+        endpoint=None,
+        username=None,
+        password=None,
+        auth=None,
+        session=None,
+        max_connections=100,
+    ):
+        """Initializes an asynchronous connection to a Stardog database.
+
+        Args:
+          database (str): Name of the database
+          endpoint (str): Url of the server endpoint.
+            Defaults to `http://localhost:5820`
+          username (str, optional): Username to use in the connection
+          password (str, optional): Password to use in the connection
+          auth (httpx.Auth, optional): httpx Authentication object.
+            Defaults to `None`
+          session (httpx.AsyncClient, optional): httpx AsyncClient object.
+            Defaults to `None`
+          max_connections (int, optional): Maximum number of concurrent
+            HTTP connections to the server. Defaults to 100
+
+        Examples:
+          >>> async with AsyncConnection('db', endpoint='http://localhost:9999',
+                                         username='admin', password='admin') as conn:
+                results = await conn.select('select * {?s ?p ?o}')
+        """
+        self.client = client.AsyncClient(
+            endpoint,
+            database,
+            username,
+            password,
+            auth=auth,
+            session=session,
+            max_connections=max_connections,
+        )
+        self.transaction = None
+
+    async def begin(self, **kwargs):
+        """Begins a transaction.
+
+        Args:
+          reasoning (bool, optional): Enable reasoning for all queries
+            inside the transaction.
+
+        Returns:
+          str: Transaction ID
+
+        Raises:
+            stardog.exceptions.TransactionException
+              If already in a transaction
+        """
+        self._assert_not_in_transaction()
+        r = await self.client.post("/transaction/begin", params=kwargs)
+        self.transaction = r.text
+        return self.transaction
+
+    async def rollback(self):
+        """Rolls back the current transaction.
+
+        Raises:
+            stardog.exceptions.TransactionException
+              If currently not in a transaction
+        """
+        self._assert_in_transaction()
+        await self.client.post("/transaction/rollback/{}".format(self.transaction))
+        self.transaction = None
+
+    async def commit(self):
+        """Commits the current transaction.
+
+        Raises:
+          stardog.exceptions.TransactionException
+            If currently not in a transaction
+        """
+        self._assert_in_transaction()
+        await self.client.post("/transaction/commit/{}".format(self.transaction))
+        self.transaction = None
+
+    async def add(self, content, graph_uri=None):
+        """Adds data to the database.
+
+        Args:
+          content (Content): Data to add
+          graph_uri (str, optional): Named graph into which to add the data
+
+        Raises:
+          stardog.exceptions.TransactionException
+            If not currently in a transaction
+
+        Examples:
+          >>> await conn.add(File('example.ttl'), graph_uri='urn:graph')
+        """
+        self._assert_in_transaction()
+
+        with content.data() as data:
+            await self.client.post(
+                "/{}/add".format(self.transaction),
+                params={"graph-uri": graph_uri},
+                headers={
+                    "Content-Type": content.content_type,
+                    "Content-Encoding": content.content_encoding,
+                },
+                data=data,
+            )
+
+    async def remove(self, content, graph_uri=None):
+        """Removes data from the database.
+
+        Args:
+          content (Content): Data to remove
+          graph_uri (str, optional): Named graph from which to remove the data
+
+        Raises:
+          stardog.exceptions.TransactionException
+            If currently not in a transaction
+
+        Examples:
+          >>> await conn.remove(File('example.ttl'), graph_uri='urn:graph')
+        """
+        self._assert_in_transaction()
+
+        with content.data() as data:
+            await self.client.post(
+                "/{}/remove".format(self.transaction),
+                params={"graph-uri": graph_uri},
+                headers={
+                    "Content-Type": content.content_type,
+                    "Content-Encoding": content.content_encoding,
+                },
+                data=data,
+            )
+
+    async def clear(self, graph_uri=None):
+        """Removes all data from the database or specific named graph.
+
+        Args:
+          graph_uri (str, optional): Named graph from which to remove data
+
+        Raises:
+          stardog.exceptions.TransactionException
+            If currently not in a transaction
+        """
+        self._assert_in_transaction()
+        await self.client.post(
+            "/{}/clear".format(self.transaction), params={"graph-uri": graph_uri}
+        )
+
+    async def size(self, exact=False):
+        """Database size.
+
+        Args:
+          exact (bool, optional): Calculate the size exactly. Defaults to False
+
+        Returns:
+          int: The number of elements in database
+        """
+        r = await self.client.get("/size", params={"exact": exact})
+        return int(r.text)
+
+    def export(
+        self,
+        content_type=content_types.TURTLE,
+        stream=False,
+        chunk_size=10240,
+        graph_uri=None,
+    ):
+        """Exports the contents of the database.
+
+        Args:
+          content_type (str): RDF content type. Defaults to 'text/turtle'
+          stream (bool): Chunk results? Defaults to False
+          chunk_size (int): Number of bytes to read per chunk when streaming.
+            Defaults to 10240
+          graph_uri (str, optional): Named graph to export
+
+        Returns:
+          bytes: If stream = False, once awaited
+
+        Returns:
+          async gen: If stream = True, inside an ``async with`` block
+
+        Examples:
+          no streaming
+
+          >>> contents = await conn.export()
+
+          streaming
+
+          >>> async with conn.export(stream=True) as stream:
+                contents = b''.join([chunk async for chunk in stream])
+        """
+        kwargs = {
+            "headers": {"Accept": content_type},
+            "params": {"graph-uri": graph_uri},
+        }
+
+        if stream:
+            return self._stream("/export", chunk_size, **kwargs)
+
+        return self._content("/export", **kwargs)
+
+    async def explain(self, query, base_uri=None):
+        """Explains the evaluation of a SPARQL query.
+
+        Args:
+          query (str): SPARQL query
+          base_uri (str, optional): Base URI for the parsing of the query
+
+        Returns:
+         str: Query explanation
+        """
+        params = {"query": query, "baseURI": base_uri}
+        r = await self.client.post("/explain", data=params)
+        return r.text
+
+    async def __query(self, query, method, content_type=None, **kwargs):
+        txId = self.transaction
+        params = {
+            "query": query,
+            "baseURI": kwargs.get("base_uri"),
+            "limit": kwargs.get("limit"),
+            "offset": kwargs.get("offset"),
+            "timeout": kwargs.get("timeout"),
+            "reasoning": kwargs.get("reasoning"),
+        }
+
+        # query bindings
+        bindings = kwargs.get("bindings", {})
+        for k, v in bindings.items():
+            params["${}".format(k)] = v
+
+        url = "/{}/{}".format(txId, method) if txId else "/{}".format(method)
+
+        r = await self.client.post(
+            url,
+            data=params,
+            headers={"Accept": content_type},
+        )
+
+        return r.json() if content_type == content_types.SPARQL_JSON else r.content
+
+    async def select(self, query, content_type=content_types.SPARQL_JSON, **kwargs):
+        """Executes a SPARQL select query.
+
+        Takes the same arguments as
+        :meth:`stardog.connection.Connection.select`.
+
+        Returns:
+          dict: If content_type='application/sparql-results+json'
+
+        Returns:
+          bytes: Other content types
+
+        Examples:
+          >>> await conn.select('select * {?s ?p ?o}', limit=100)
+        """
+        return await self.__query(query, "query", content_type=content_type, **kwargs)
+
+    async def select_pages(self, query, page_size=10000, prefetch=2, **kwargs):
+        """Executes a SPARQL select query one page of results at a time.
+
+        Up to `prefetch` page requests are in flight at once as tasks, and
+        iteration stops after the first page holding fewer than `page_size`
+        results, cancelling the requests for later pages. Takes the same
+        arguments as :meth:`stardog.connection.Connection.select_pages`.
+
+        Returns:
+          async gen: SPARQL JSON bindings
+
+        Examples:
+          >>> async for binding in conn.select_pages(
+                  'select * {?s ?p ?o} order by ?s', page_size=5000):
+                print(binding['s']['value'])
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+
+        offset = kwargs.pop("offset", None) or 0
+        limit = kwargs.pop("limit", None)
+        end = None if limit is None else offset + limit
+
+        async def _fetch(offset, size):
+            r = await self.select(query, offset=offset, limit=size, **kwargs)
+            return r["results"]["bindings"]
+
+        pending = collections.deque()
+        try:
+            while True:
+                while len(pending) < max(prefetch, 1) and (end is None or offset < end):
+                    size = page_size if end is None else min(page_size, end - offset)
+                    pending.append((size, asyncio.ensure_future(_fetch(offset, size))))
+                    offset += size
+                if not pending:
+                    return
+
+                size, task = pending.popleft()
+                page = await task
+                for binding in page:
+                    yield binding
+                if len(page) < size:
+                    return
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def graph(self, query, content_type=content_types.TURTLE, **kwargs):
+        """Executes a SPARQL graph query.
+
+        Takes the same arguments as
+        :meth:`stardog.connection.Connection.graph`.
+
+        Returns:
+          bytes: Results in format given by content_type
+        """
+        return await self.__query(query, "query", content_type, **kwargs)
+
+    async def paths(self, query, content_type=content_types.SPARQL_JSON, **kwargs):
+        """Executes a SPARQL paths query.
+
+        Takes the same arguments as
+        :meth:`stardog.connection.Connection.paths`.
+
+        Returns:
+          dict: if content_type='application/sparql-results+json'.
+
+        Returns:
+          bytes: other content types.
+        """
+        return await self.__query(query, "query", content_type, **kwargs)
+
+    async def ask(self, query, **kwargs):
+        """Executes a SPARQL ask query.
+
+        Takes the same arguments as
+        :meth:`stardog.connection.Connection.ask`.
+
+        Returns:
+          bool: Result of ask query
+        """
+        r = await self.__query(query, "query", content_types.BOOLEAN, **kwargs)
+        return bool(distutils.util.strtobool(r.decode()))
+
+    async def update(self, query, **kwargs):
+        """Executes a SPARQL update query.
+
+        Takes the same arguments as
+        :meth:`stardog.connection.Connection.update`.
+        """
+        await self.__query(query, "update", None, **kwargs)
+
+    async def is_consistent(self, graph_uri=None):
+        """Checks if the database or named graph is consistent wrt its schema.
+
+        Args:
+          graph_uri (str, optional): Named graph from which to check
+            consistency
+
+        Returns:
+          bool: Database consistency state
+        """
+        r = await self.client.get(
+            "/reasoning/consistency",
+            params={"graph-uri": graph_uri},
+        )
+
+        return bool(distutils.util.strtobool(r.text))
+
+    async def explain_inference(self, content):
+        """Explains the given inference results.
+
+        Args:
+          content (Content): Data from which to provide explanations
+
+        Returns:
+          dict: Explanation results
+        """
+        txId = self.transaction
+
+        with content.data() as data:
+            url = "/reasoning/{}/explain".format(txId) if txId else "/reasoning/explain"
+
+            r = await self.client.post(
+                url,
+                data=data,
+                headers={
+                    "Content-Type": content.content_type,
+                    "Content-Encoding": content.content_encoding,
+                },
+            )
+
+            return r.json()["proofs"]
+
+    async def explain_inconsistency(self, graph_uri=None):
+        """Explains why the database or a named graph is inconsistent.
+
+        Args:
+          graph_uri (str, optional): Named graph for which to explain
+            inconsistency
+
+        Returns:
+          dict: Explanation results
+        """
+        txId = self.transaction
+        url = (
+            "/reasoning/{}/explain/inconsistency".format(txId)
+            if txId
+            else "/reasoning/explain/inconsistency"
+        )
+
+        r = await self.client.get(url, params={"graph-uri": graph_uri})
+        return r.json()["proofs"]
+
+    async def _content(self, path, **kwargs):
+        r = await self.client.get(path, **kwargs)
+        return r.content
+
+    @contextlib.asynccontextmanager
+    async def _stream(self, path, chunk_size, **kwargs):
+        r = await self.client.get(path, stream=True, **kwargs)
+        try:
+            yield r.aiter_bytes(chunk_size=chunk_size)
+        finally:
+            await r.aclose()
+
+    def _assert_not_in_transaction(self):
+        if self.transaction:
+            raise exceptions.TransactionException("Already in a transaction")
+
+    def _assert_in_transaction(self):
+        if not self.transaction:
+            raise exceptions.TransactionException("Not in a transaction")
+
+    async def close(self):
+        """Close the underlying HTTP connections."""
+        await self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -0,0 +1,714 @@
+"""Client-side caching of query results.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+
+
+class CacheStats(object):
+    """Counters of a result cache.
+
+    Attributes:
+      hits (int): Lookups answered from the cache
+      revalidations (int): Hits confirmed by the server to be up to date
+      misses (int): Lookups that were not, including expired entries
+      evictions (int): Entries dropped to stay within the size limits
+      expirations (int): Entries dropped because they outlived the TTL
+      invalidations (int): Entries dropped by invalidation
+      entries (int): Entries currently cached
+      bytes (int): Size of the cached results
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.entries = 0
+        self.bytes = 0
+
+    @property
+    def hit_ratio(self):
+        """float: Hits over lookups, 0 if there were none."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return "CacheStats(hits={}, misses={}, entries={}, bytes={})".format(
+            self.hits, self.misses, self.entries, self.bytes
+        )
+
+
+class CacheBackend(object):
+    """Interface of the result caches a Connection can use.
+
+    Results are bytes, stored per database url under a key built by
+    :func:`query_key`. Each database has an invalidation generation, bumped
+    by :meth:`invalidate`, so that results fetched while the database
+    changed are not stored.
+    """
+
+    def get(self, database, key):
+        """Looks up a result.
+
+        Args:
+          database (str): Url of the database
+          key (tuple): Query and arguments, see :func:`query_key`
+
+        Returns:
+          bytes: The result, `None` if it is not cached
+        """
+        raise NotImplementedError()
+
+    def put(self, database, key, value, generation=None):
+        """Stores a result.
+
+        Args:
+          database (str): Url of the database
+          key (tuple): Query and arguments, see :func:`query_key`
+          value (bytes): The result
+          generation (int, optional): :meth:`generation` of the database
+            before the result was fetched. The result is not stored if the
+            database was invalidated since. Defaults to `None`
+        """
+        raise NotImplementedError()
+
+    def generation(self, database):
+        """Returns the invalidation generation of a database.
+
+        Args:
+          database (str): Url of the database
+
+        Returns:
+          int: Changes whenever the database is invalidated
+        """
+        raise NotImplementedError()
+
+    def invalidate(self, database=None):
+        """Drops the results of a database.
+
+        Args:
+          database (str, optional): Url of the database. Defaults to `None`,
+            dropping every result
+        """
+        raise NotImplementedError()
+
+    def clear(self):
+        """Drops every result and resets the statistics."""
+        raise NotImplementedError()
+
+    def stats(self):
+        """Statistics of the cache.
+
+        Returns:
+          CacheStats: A copy of the counters
+        """
+        raise NotImplementedError()
+
+
+class ResultCache(CacheBackend):
+    """In-memory LRU cache of query results with a TTL and a memory budget.
+
+    Holds the raw response bodies of queries, keyed by the database, the
+    query and every argument that can change its results. A cache can be
+    shared by several connections. Each :class:`stardog.connection.Connection`
+    given the cache invalidates the entries of its database when it commits,
+    updates or clears, but changes made by other clients are only seen once
+    entries expire.
+
+    Examples:
+      >>> cache = ResultCache(max_entries=512, max_bytes=32 * 2**20, ttl=30)
+      >>> conn = Connection('db', cache=cache)
+      >>> conn.select('select * {?s ?p ?o} limit 10')
+      >>> cache.stats().misses
+      1
+    """
+
+    # rough per-entry overhead of the key, the entry and the LRU links
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 2**20, ttl=60.0):
+        """Initializes a result cache.
+
+        Args:
+          max_entries (int, optional): Maximum number of cached results.
+            Defaults to 1024
+          max_bytes (int, optional): Memory budget for the cached results,
+            in bytes. Results larger than the budget are not cached.
+            Defaults to 64 MiB
+          ttl (float, optional): Seconds a result stays valid, `None` to
+            keep results until they are evicted or invalidated.
+            Defaults to 60
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._generations = collections.Counter()
+        self._stats = CacheStats()
+
+    def generation(self, database):
+        """Returns the invalidation generation of a database.
+
+        Pass it to :meth:`put` to skip storing a result that was fetched
+        while the database was invalidated.
+
+        Args:
+          database (str): Url of the database
+
+        Returns:
+          int: Number of invalidations so far
+        """
+        with self._lock:
+            return self._generations[database] + self._generations[None]
+
+    def get(self, database, key):
+        """Looks up a result.
+
+        Args:
+          database (str): Url of the database
+          key (tuple): Query and arguments, see :func:`query_key`
+
+        Returns:
+          bytes: The result, `None` if it is not cached
+        """
+        with self._lock:
+            entry = self._entries.get((database, key))
+            if entry is not None and entry[1] is not None:
+                if entry[1] <= time.monotonic():
+                    self.__drop((database, key))
+                    self._stats.expirations += 1
+                    entry = None
+
+            if entry is None:
+                self._stats.misses += 1
+                return None
+
+            self._entries.move_to_end((database, key))
+            self._stats.hits += 1
+            return entry[0]
+
+    def put(self, database, key, value, generation=None):
+        """Stores a result.
+
+        Args:
+          database (str): Url of the database
+          key (tuple): Query and arguments, see :func:`query_key`
+          value (bytes): The result
+          generation (int, optional): :meth:`generation` of the database
+            before the result was fetched. Defaults to `None`
+        """
+        size = len(value) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            current = self._generations[database] + self._generations[None]
+            if generation is not None and generation != current:
+                return
+            if (database, key) in self._entries:
+                self.__drop((database, key))
+            self._entries[(database, key)] = (value, expires, size)
+            self._stats.entries += 1
+            self._stats.bytes += size
+
+            while (
+                self._stats.entries > self.max_entries
+                or self._stats.bytes > self.max_bytes
+            ):
+                self.__drop(next(iter(self._entries)))
+                self._stats.evictions += 1
+
+    def invalidate(self, database=None):
+        """Drops the results of a database.
+
+        Args:
+          database (str, optional): Url of the database. Defaults to `None`,
+            dropping every result
+        """
+        with self._lock:
+            self._generations[database] += 1
+            stale = [k for k in self._entries if database in (None, k[0])]
+            for k in stale:
+                self.__drop(k)
+            self._stats.invalidations += len(stale)
+
+    def clear(self):
+        """Drops every result and resets the statistics."""
+        with self._lock:
+            self._generations[None] += 1
+            self._entries.clear()
+            self._stats = CacheStats()
+
+    def stats(self):
+        """Statistics of the cache.
+
+        Returns:
+          CacheStats: A copy of the counters
+        """
+        with self._lock:
+            stats = CacheStats()
+            stats.__dict__.update(self._stats.__dict__)
+            return stats
+
+    def __drop(self, k):
+        size = self._entries.pop(k)[2]
+        self._stats.entries -= 1
+        self._stats.bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """Result cache in a SQLite file shared by the processes of a host.
+
+    Every process, e.g. each worker of a web server, opens the same file,
+    so results fetched by one are served to all of them and survive
+    restarts. The database runs in WAL mode, so readers do not block each
+    other or the writer. Entries are evicted least recently used first to
+    stay within the limits, with last use recorded at a granularity of a
+    second to keep hits from writing. Invalidation generations are stored
+    in the file too, so a commit through any process drops the results of
+    its database for all of them.
+
+    Hits and misses are counted per instance, entries and bytes are those
+    of the whole file.
+
+    Examples:
+      >>> cache = SQLiteCache('/var/cache/myapp/stardog.sqlite', ttl=300)
+      >>> conn = Connection('db', cache=cache)
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS results ("
+        " digest TEXT PRIMARY KEY, database TEXT NOT NULL, value BLOB NOT NULL,"
+        " size INTEGER NOT NULL, expires REAL, used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS results_database ON results (database)",
+        "CREATE INDEX IF NOT EXISTS results_used ON results (used)",
+        "CREATE TABLE IF NOT EXISTS generations ("
+        " database TEXT PRIMARY KEY, generation INTEGER NOT NULL)",
+        # running totals, so that checking the limits does not scan results
+        "CREATE TABLE IF NOT EXISTS totals ("
+        " id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER, bytes INTEGER)",
+        "INSERT OR IGNORE INTO totals VALUES (0, 0, 0)",
+        "CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN"
+        " UPDATE totals SET entries = entries + 1, bytes = bytes + new.size; END",
+        "CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN"
+        " UPDATE totals SET entries = entries - 1, bytes = bytes - old.size; END",
+    )
+
+    def __init__(
+        self, path, max_entries=100000, max_bytes=1024 * 2**20, ttl=60.0, timeout=5.0
+    ):
+        """Initializes a SQLite result cache.
+
+        Args:
+          path (str): Cache file, created if missing
+          max_entries (int, optional): Maximum number of cached results.
+            Defaults to 100000
+          max_bytes (int, optional): Maximum size of the cached results, in
+            bytes. Results larger than that are not cached.
+            Defaults to 1 GiB
+          ttl (float, optional): Seconds a result stays valid, `None` to
+            keep results until they are evicted or invalidated.
+            Defaults to 60
+          timeout (float, optional): Seconds to wait for another process
+            holding the write lock. Defaults to 5
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+        with self.__db() as db:
+            for statement in self.SCHEMA:
+                db.execute(statement)
+
+    def __db(self):
+        # one connection per thread, reopened in forked processes
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def __count(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    @staticmethod
+    def __generation(db, database):
+        row = db.execute(
+            "SELECT total(generation) FROM generations WHERE database IN (?, '')",
+            (database,),
+        ).fetchone()
+        return int(row[0])
+
+    def get(self, database, key):
+        now = time.time()
+        digest = _digest(database, key)
+        with self.__db() as db:
+            row = db.execute(
+                "SELECT value, expires, used FROM results WHERE digest = ?",
+                (digest,),
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                db.execute("DELETE FROM results WHERE digest = ?", (digest,))
+                self.__count("_expirations")
+                row = None
+            if row is None:
+                self.__count("_misses")
+                return None
+            if row[2] < now - 1:
+                db.execute(
+                    "UPDATE results SET used = ? WHERE digest = ?", (now, digest)
+                )
+
+        self.__count("_hits")
+        return row[0]
+
+    def put(self, database, key, value, generation=None):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        expires = None if self.ttl is None else now + self.ttl
+        with self.__db() as db:
+            # takes the write lock before reading the generation
+            db.execute("BEGIN IMMEDIATE")
+            if generation is not None and generation != self.__generation(db, database):
+                return
+            digest = _digest(database, key)
+            db.execute("DELETE FROM results WHERE digest = ?", (digest,))
+            db.execute(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, database, value, size, expires, now),
+            )
+
+            count, total = db.execute("SELECT entries, bytes FROM totals").fetchone()
+            if count > self.max_entries or total > self.max_bytes:
+                self.__evict(db, count, total)
+
+    def __evict(self, db, count, total):
+        # makes room for a tenth of the limits, so evictions are batched
+        max_entries = int(self.max_entries * 0.9)
+        max_bytes = int(self.max_bytes * 0.9)
+        stale = []
+        for digest, size in db.execute(
+            "SELECT digest, size FROM results ORDER BY used"
+        ):
+            if count <= max_entries and total <= max_bytes:
+                break
+            stale.append((digest,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM results WHERE digest = ?", stale)
+        self.__count("_evictions", len(stale))
+
+    def generation(self, database):
+        with self.__db() as db:
+            return self.__generation(db, database)
+
+    def invalidate(self, database=None):
+        with self.__db() as db:
+            db.execute(
+                "INSERT INTO generations VALUES (?, 1) ON CONFLICT (database)"
+                " DO UPDATE SET generation = generation + 1",
+                (database or "",),
+            )
+            if database is None:
+                dropped = db.execute("DELETE FROM results").rowcount
+            else:
+                dropped = db.execute(
+                    "DELETE FROM results WHERE database = ?", (database,)
+                ).rowcount
+        self.__count("_invalidations", dropped)
+
+    def clear(self):
+        self.invalidate()
+        with self._lock:
+            self._hits = self._misses = self._evictions = 0
+            self._expirations = self._invalidations = 0
+
+    def stats(self):
+        with self.__db() as db:
+            entries, size = db.execute("SELECT entries, bytes FROM totals").fetchone()
+
+        stats = CacheStats()
+        with self._lock:
+            stats.hits = self._hits
+            stats.misses = self._misses
+            stats.evictions = self._evictions
+            stats.expirations = self._expirations
+            stats.invalidations = self._invalidations
+        stats.entries = entries
+        stats.bytes = size
+        return stats
+
+    def __len__(self):
+        return self.stats().entries
+
+    def close(self):
+        """Closes the connection of the calling thread to the file."""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+# admin reads the metadata cache keeps
+_METADATA = re.compile(
+    r"^(?:/admin/(?:databases|users|roles|virtual_graphs|data_sources)"
+    r"|/admin/databases/[^/]+/options"
+    r"|/(?!admin/)[^/]+/namespaces)$"
+)
+# requests changing the server state that only read
+_READS = re.compile(r"^PUT /admin/databases/[^/]+/options$")
+# collections changed along with another one
+_RELATED = {"restore": "databases"}
+
+
+class MetadataCache(object):
+    """Cache of admin metadata reads, revalidated with the server.
+
+    Keeps the responses listing databases, users, roles, virtual graphs and
+    data sources, and those of database options and namespaces. Responses
+    carrying an ETag or Last-Modified header are revalidated with a
+    conditional request every time they are read, and served from the cache
+    when the server answers 304 Not Modified. Responses without validators
+    are served from the cache until their TTL expires.
+
+    Responses are kept per server and credentials, see :func:`identity`,
+    and not at all for auth objects whose credentials are not known.
+    Changes made through a client holding the cache, e.g. creating a
+    database or setting its options, drop the cached responses of the
+    changed collection.
+
+    Examples:
+      >>> admin = Admin(metadata_cache=MetadataCache(ttl=5))
+      >>> while True:
+            reconcile(admin.databases())
+    """
+
+    def __init__(self, ttl=10.0):
+        """Initializes a metadata cache.
+
+        Args:
+          ttl (float, optional): Seconds a response without ETag or
+            Last-Modified header stays valid. Defaults to 10
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = CacheStats()
+
+    def request(self, endpoint, path, send, **kwargs):
+        """Sends a GET request, answering it from the cache if possible.
+
+        Args:
+          endpoint (str): Server url
+          path (str): Request path
+          send (callable): Sends the request, called with the request
+            keyword arguments
+          **kwargs: Request keyword arguments
+
+        Returns:
+          requests.Response: The response
+        """
+        if kwargs.get("params") or kwargs.get("stream") or not _METADATA.match(path):
+            return send(**kwargs)
+        # users see what their permissions allow
+        user = identity(kwargs.get("auth"))
+        if user is None:
+            return send(**kwargs)
+
+        key = (endpoint, user, path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry["validators"] is None:
+            if entry["expires"] > time.monotonic():
+                self.__count("hits")
+                return _copy(entry["response"])
+            entry = None
+
+        if entry is not None:
+            headers = dict(kwargs.get("headers") or {})
+            headers.update(entry["validators"])
+            kwargs["headers"] = headers
+
+        r = send(**kwargs)
+        if r.status_code == 304 and entry is not None:
+            self.__count("hits")
+            self.__count("revalidations")
+            return _copy(entry["response"])
+
+        self.__count("misses")
+        if r.status_code == 200:
+            validators = {}
+            if r.headers.get("ETag"):
+                validators["If-None-Match"] = r.headers["ETag"]
+            if r.headers.get("Last-Modified"):
+                validators["If-Modified-Since"] = r.headers["Last-Modified"]
+            with self._lock:
+                self._entries[key] = {
+                    "response": _copy(r),
+                    "validators": validators or None,
+                    "expires": time.monotonic() + self.ttl,
+                }
+        return r
+
+    def invalidate(self, method, path):
+        """Drops the responses a request may have changed.
+
+        Args:
+          method (str): Request method
+          path (str): Request path
+        """
+        path = path.split("?", 1)[0]
+        if method == "GET" or _READS.match("{} {}".format(method, path)):
+            return
+
+        parts = path.strip("/").split("/")
+        if parts[0] == "admin":
+            collection = _RELATED.get(parts[1], parts[1]) if len(parts) > 1 else ""
+            prefixes = ["/admin/" + collection]
+            # namespaces are database options too
+            if collection == "databases" and len(parts) > 2:
+                prefixes.append("/{}/".format(parts[2]))
+        else:
+            prefixes = [
+                "/{}/".format(parts[0]),
+                "/admin/databases/{}/".format(parts[0]),
+            ]
+
+        with self._lock:
+            stale = [k for k in self._entries if k[2].startswith(tuple(prefixes))]
+            for k in stale:
+                del self._entries[k]
+            self._stats.invalidations += len(stale)
+
+    def clear(self):
+        """Drops every response and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._stats = CacheStats()
+
+    def stats(self):
+        """Statistics of the cache.
+
+        Returns:
+          CacheStats: A copy of the counters
+        """
+        with self._lock:
+            stats = CacheStats()
+            stats.__dict__.update(self._stats.__dict__)
+            stats.entries = len(self._entries)
+            stats.bytes = sum(
+                len(e["response"].content) for e in self._entries.values()
+            )
+            return stats
+
+    def __count(self, name):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+
+def _copy(response):
+    copy = requests.Response()
+    copy.status_code = response.status_code
+    copy.reason = response.reason
+    copy.headers = requests.structures.CaseInsensitiveDict(response.headers)
+    copy.encoding = response.encoding
+    copy.url = response.url
+    copy.request = response.request
+    copy.elapsed = response.elapsed
+    copy._content = response.content
+    return copy
+
+
+def _digest(database, key):
+    data = json.dumps([database, key], separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def identity(auth):
+    """Identifies the credentials of an authentication object.
+
+    Basic and digest credentials, ``(username, password)`` tuples and auth
+    objects with a str `token` attribute are identified by a digest of
+    their class and credentials, so that users never share cached results.
+
+    Args:
+      auth: requests authentication object
+
+    Returns:
+      str: The digest, `None` if the credentials are not known, e.g. for
+        Kerberos, and responses must not be cached
+    """
+    if isinstance(auth, (requests.auth.HTTPBasicAuth, requests.auth.HTTPDigestAuth)):
+        credentials = (auth.username, auth.password)
+    elif isinstance(auth, tuple) and len(auth) == 2:
+        credentials = auth
+    elif isinstance(getattr(auth, "token", None), str):
+        credentials = (auth.token,)
+    else:
+        return None
+    data = repr((type(auth).__module__, type(auth).__qualname__, credentials))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def query_key(identity, endpoint, method, query, content_type, **kwargs):
+    """Builds the cache key of a query.
+
+    Args:
+      identity (str): Credentials running the query, as results depend on
+        permissions, see :func:`identity`
+      endpoint (str): Url of the database, as users of the same name on
+        other servers are other users
+      method (str): Query endpoint, e.g. 'query'
+      query (str): SPARQL query
+      content_type (str): Content type of the results
+      **kwargs: Query arguments: `base_uri`, `limit`, `offset`,
+        `reasoning` and `bindings`. The timeout is left out
+
+    Returns:
+      tuple: The key
+    """
+    bindings = kwargs.get("bindings") or {}
+    return (
+        identity,
+        endpoint,
+        method,
+        query,
+        content_type,
+        kwargs.get("base_uri"),
+        kwargs.get("limit"),
+        kwargs.get("offset"),
+        kwargs.get("reasoning"),
+        tuple(sorted((str(k), str(v)) for k, v in bindings.items())),
+    )
@@ -0,0 +1,169 @@
+"""A read-only snapshot of the databases, users, roles, virtual graphs and
+data sources of a server.
+"""
+
+import types
+
+_ANY = "*"
+_ALL = "all"
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return types.MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _resource(resource):
+    # a database is ["db"], a named graph ["db", "graph"]
+    if isinstance(resource, str):
+        return resource
+    resource = tuple(resource)
+    return resource[0] if len(resource) == 1 else resource
+
+
+class Catalog(object):
+    """A snapshot of the server catalog, indexed by name.
+
+    Everything is fetched once, so lookups never go to the server. Mappings
+    and lists are exposed as read-only mappings and tuples.
+
+    Use :meth:`stardog.admin.Admin.snapshot` instead of constructing
+    manually.
+
+    Examples:
+      >>> catalog = admin.snapshot()
+      >>> catalog.roles_granting('read', 'db', 'mydb')
+      frozenset({'reader'})
+    """
+
+    __slots__ = (
+        "_databases",
+        "_users",
+        "_roles",
+        "_virtual_graphs",
+        "_datasources",
+        "_role_users",
+        "_grants",
+    )
+
+    def __init__(self, databases, users, roles, virtual_graphs, datasources):
+        """Initializes a catalog.
+
+        Args:
+          databases (dict): Options of each database, by name
+          users (dict): Role names of each user, by name
+          roles (dict): Permissions of each role, by name
+          virtual_graphs (dict): Info of each virtual graph, by name
+          datasources (iterable of str): Data source names
+        """
+        self._databases = _freeze(dict(databases))
+        self._users = _freeze({name: list(r) for name, r in users.items()})
+        self._roles = _freeze({name: list(p) for name, p in roles.items()})
+        self._virtual_graphs = _freeze(dict(virtual_graphs))
+        self._datasources = frozenset(datasources)
+
+        role_users = {}
+        for user, user_roles in self._users.items():
+            for role in user_roles:
+                role_users.setdefault(role, set()).add(user)
+        self._role_users = {role: frozenset(u) for role, u in role_users.items()}
+
+        grants = {}
+        for role, permissions in self._roles.items():
+            for permission in permissions:
+                key = (
+                    permission["action"].lower(),
+                    permission["resource_type"].lower(),
+                    _resource(permission["resource"]),
+                )
+                grants.setdefault(key, set()).add(role)
+        self._grants = {key: frozenset(r) for key, r in grants.items()}
+
+    @property
+    def databases(self):
+        """Mapping: Options of each database, by name."""
+        return self._databases
+
+    @property
+    def users(self):
+        """Mapping: Role names of each user, by name."""
+        return self._users
+
+    @property
+    def roles(self):
+        """Mapping: Permissions of each role, by name."""
+        return self._roles
+
+    @property
+    def virtual_graphs(self):
+        """Mapping: Info of each virtual graph, by name."""
+        return self._virtual_graphs
+
+    @property
+    def datasources(self):
+        """frozenset: Data source names."""
+        return self._datasources
+
+    def users_with_role(self, role):
+        """Finds the users having a role.
+
+        Args:
+          role (str): The role name
+
+        Returns:
+          frozenset[str]: User names
+        """
+        return self._role_users.get(role, frozenset())
+
+    def roles_granting(self, action, resource_type, resource):
+        """Finds the roles with a permission, directly or through wildcards.
+
+        Args:
+          action (str): Action type (e.g., 'read', 'write')
+          resource_type (str): Resource type (e.g., 'db', 'named-graph')
+          resource (str or tuple[str]): Target resource, e.g. 'mydb', or
+            ``('mydb', 'urn:graph')`` for a named graph
+
+        Returns:
+          frozenset[str]: Role names
+        """
+        action = action.lower()
+        resource_type = resource_type.lower()
+        resource = _resource(resource)
+
+        roles = frozenset()
+        for a in {action, _ALL, _ANY}:
+            for t in {resource_type, _ANY}:
+                for r in {resource, _ANY}:
+                    roles |= self._grants.get((a, t, r), frozenset())
+        return roles
+
+    def users_granted(self, action, resource_type, resource):
+        """Finds the users having a permission through one of their roles.
+
+        Permissions granted to users directly, and those of superusers, are
+        not part of the catalog.
+
+        Args:
+          action (str): Action type (e.g., 'read', 'write')
+          resource_type (str): Resource type (e.g., 'db', 'named-graph')
+          resource (str or tuple[str]): Target resource
+
+        Returns:
+          frozenset[str]: User names
+        """
+        users = frozenset()
+        for role in self.roles_granting(action, resource_type, resource):
+            users |= self.users_with_role(role)
+        return users
+
+    def __repr__(self):
+        return "Catalog({} databases, {} users, {} roles, {} virtual graphs)".format(
+            len(self._databases),
+            len(self._users),
+            len(self._roles),
+            len(self._virtual_graphs),
+        )
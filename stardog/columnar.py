@@ -0,0 +1,433 @@
+"""Columnar materialization of select results with pandas, NumPy and Arrow.
+
+Results are fetched as SPARQL TSV, which keeps datatypes unlike CSV, and
+parsed by the pandas or Arrow C++ CSV reader in chunks straight from the
+response. Each column is then converted with vectorized string operations:
+xsd numeric, boolean and date/time literals become native types, IRIs and
+literals become their lexical forms.
+
+Requires pandas (``pip install pystardog[pandas]``) or pyarrow
+(``pip install pystardog[arrow]``).
+"""
+
+import csv
+import io
+import itertools
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RDF_LANG_STRING = "http://www.w3.org/1999/02/22-rdf-syntax-ns#langString"
+
+_INTEGERS = {
+    XSD + t
+    for t in (
+        "integer",
+        "int",
+        "long",
+        "short",
+        "byte",
+        "nonNegativeInteger",
+        "nonPositiveInteger",
+        "negativeInteger",
+        "positiveInteger",
+        "unsignedLong",
+        "unsignedInt",
+        "unsignedShort",
+        "unsignedByte",
+    )
+}
+_FLOATS = {XSD + "decimal", XSD + "double", XSD + "float"}
+_DATETIMES = {XSD + "dateTime", XSD + "date", XSD + "dateTimeStamp"}
+_BOOLEAN = XSD + "boolean"
+
+# literal, with an optional datatype or language tag
+_LITERAL = r'^"(?P<lexical>.*)"(?:\^\^<(?P<datatype>[^>]*)>|@(?P<lang>[A-Za-z0-9-]+))?$'
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", '"': '"', "\\": "\\", "'": "'"}
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "Columnar results require pandas, install it with `pip install pandas`"
+        )
+    return pandas
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+    except ImportError:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "Arrow results require pyarrow, install it with `pip install pyarrow`"
+        )
+    return pyarrow
+
+
+def read_tsv(chunks, chunk_size=100000):
+    """Parses SPARQL TSV results into a DataFrame.
+
+    Args:
+      chunks (iterable of bytes): The response body
+      chunk_size (int, optional): Number of rows parsed and converted at a
+        time. Defaults to 100000
+
+    Returns:
+      pandas.DataFrame: One column per variable
+    """
+    pd = _pandas()
+
+    reader = pd.read_csv(
+        io.BufferedReader(_ChunkReader(chunks)),
+        sep="\t",
+        dtype=str,
+        quoting=csv.QUOTE_NONE,
+        keep_default_na=False,
+        na_filter=False,
+        chunksize=chunk_size,
+    )
+
+    columns = {}
+    for frame in reader:
+        for name in frame.columns:
+            columns.setdefault(name, []).append(convert(frame[name]))
+
+    return pd.DataFrame(
+        {name.lstrip("?$"): _concat(parts) for name, parts in columns.items()}
+    )
+
+
+def _concat(parts):
+    # chunks without any bound value take the dtype of the others
+    pd = _pandas()
+
+    bound = [i for i, part in enumerate(parts) if part.notna().any()]
+    dtypes = {str(parts[i].dtype) for i in bound}
+    if len(dtypes) == 1:
+        dtype = parts[bound[0]].dtype
+        parts = [
+            part if i in bound else part.astype(dtype) for i, part in enumerate(parts)
+        ]
+    elif dtypes == {"Int64", "float64"}:
+        parts = [part.astype("float64") for part in parts]
+
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts, ignore_index=True)
+
+
+def convert(column):
+    """Converts a column of SPARQL TSV terms to native values.
+
+    Args:
+      column (pandas.Series): Terms as serialized in SPARQL TSV, with
+        empty strings for unbound values
+
+    Returns:
+      pandas.Series: Int64, float64, boolean or datetime64 if every bound
+        value has a matching datatype, lexical forms otherwise
+    """
+    pd = _pandas()
+
+    bound = column[column != ""]
+    if bound.empty:
+        return pd.Series(None, index=column.index, dtype=object)
+
+    lexical, datatype = _parse_terms(bound)
+    datatypes = set(datatype.unique())
+
+    if datatypes <= _INTEGERS:
+        values = pd.to_numeric(lexical).astype("Int64")
+    elif datatypes <= _INTEGERS | _FLOATS:
+        values = pd.to_numeric(lexical).astype("float64")
+    elif datatypes == {_BOOLEAN}:
+        values = lexical.isin(("true", "1")).astype("boolean")
+    elif datatypes <= _DATETIMES:
+        values = pd.to_datetime(lexical, format="ISO8601", utc=True)
+        if not lexical.str.contains(r"(?:Z|[+-]\d\d:\d\d)$").any():
+            values = values.dt.tz_localize(None)
+    else:
+        values = lexical.astype(object)
+
+    return values.reindex(column.index)
+
+
+def to_arrays(frame):
+    """Converts a DataFrame from :func:`read_tsv` to NumPy arrays.
+
+    Nullable integer and boolean columns with unbound values become float64
+    and object arrays.
+
+    Args:
+      frame (pandas.DataFrame): The frame
+
+    Returns:
+      dict: Maps variable names to numpy.ndarray
+    """
+    arrays = {}
+    for name in frame.columns:
+        column = frame[name]
+        if str(column.dtype) == "Int64":
+            if column.hasnans:
+                arrays[name] = column.to_numpy(dtype="float64", na_value=float("nan"))
+            else:
+                arrays[name] = column.to_numpy(dtype="int64")
+        elif str(column.dtype) == "boolean" and not column.hasnans:
+            arrays[name] = column.to_numpy(dtype=bool)
+        else:
+            arrays[name] = column.to_numpy()
+    return arrays
+
+
+def _parse_terms(terms):
+    pd = _pandas()
+
+    first = terms.str[0]
+    iri = first == "<"
+    literal = first == '"'
+    bnode = first == "_"
+    bare = ~(iri | literal | bnode)
+
+    lexical = pd.Series("", index=terms.index, dtype=object)
+    datatype = pd.Series("", index=terms.index, dtype=object)
+
+    if iri.any():
+        lexical[iri] = terms[iri].str.slice(1, -1)
+        datatype[iri] = "iri"
+    if bnode.any():
+        lexical[bnode] = terms[bnode]
+        datatype[bnode] = "bnode"
+
+    if literal.any():
+        parts = terms[literal].str.extract(_LITERAL)
+        labels = parts["lexical"]
+        escaped = labels.str.contains("\\", regex=False).fillna(False)
+        if escaped.any():
+            labels[escaped] = labels[escaped].str.replace(
+                r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), regex=True
+            )
+        lexical[literal] = labels
+        datatype[literal] = (
+            parts["datatype"]
+            .fillna(parts["lang"].notna().map({True: RDF_LANG_STRING, False: ""}))
+            .replace("", XSD + "string")
+        )
+
+    # abbreviated numbers and booleans
+    if bare.any():
+        values = terms[bare]
+        lexical[bare] = values
+        kinds = pd.Series(XSD + "string", index=values.index, dtype=object)
+        kinds[values.str.fullmatch(r"[+-]?\d+")] = XSD + "integer"
+        kinds[values.str.fullmatch(r"[+-]?\d*\.\d+")] = XSD + "decimal"
+        kinds[values.str.fullmatch(r"[+-]?(?:\d+\.?\d*|\.\d+)[eE][+-]?\d+")] = (
+            XSD + "double"
+        )
+        kinds[values.isin(("true", "false"))] = _BOOLEAN
+        datatype[bare] = kinds
+
+    return lexical, datatype
+
+
+def read_arrow(chunks, batch_rows=65536, schema=None):
+    """Parses SPARQL TSV results into Arrow record batches.
+
+    Batches are built while the response is read. Columns of IRIs and
+    blank nodes are dictionary encoded. Column types are inferred from the first batch
+    unless a schema is given.
+
+    Args:
+      chunks (iterable of bytes): The response body
+      batch_rows (int, optional): Maximum number of rows per batch.
+        Defaults to 65536
+      schema (pyarrow.Schema, optional): Types to convert the columns to.
+        Defaults to `None`, inferring them
+
+    Returns:
+      pyarrow.RecordBatchReader: The batches. Use ``read_all()`` for a Table
+
+    Raises:
+      ValueError: If a later batch does not fit the inferred types
+    """
+    pa = _pyarrow()
+
+    stream = io.BufferedReader(_ChunkReader(chunks), buffer_size=1 << 16)
+    names = stream.readline().decode("utf-8").rstrip("\r\n").split("\t")
+    names = [name.lstrip("?$") for name in names if name]
+    if not names or not stream.peek(1):
+        schema = schema or pa.schema([(name, pa.string()) for name in names])
+        return pa.RecordBatchReader.from_batches(schema, iter(()))
+
+    reader = pa.csv.open_csv(
+        stream,
+        read_options=pa.csv.ReadOptions(column_names=names, block_size=1 << 20),
+        parse_options=pa.csv.ParseOptions(delimiter="\t", quote_char=False),
+        convert_options=pa.csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    )
+
+    raw = (batch for batch in _rebatch(reader, batch_rows) if batch.num_rows)
+    if schema is None:
+        first = next(raw, None)
+        if first is None:
+            schema = pa.schema([(name, pa.string()) for name in names])
+            return pa.RecordBatchReader.from_batches(schema, iter(()))
+        first = _arrow_batch(first)
+        schema = first.schema
+        batches = itertools.chain(
+            [first], (_arrow_batch(batch, schema) for batch in raw)
+        )
+    else:
+        batches = (_arrow_batch(batch, schema) for batch in raw)
+
+    return pa.RecordBatchReader.from_batches(schema, batches)
+
+
+def _rebatch(reader, rows):
+    pa = _pyarrow()
+
+    pending = []
+    count = 0
+    for batch in reader:
+        pending.append(batch)
+        count += batch.num_rows
+        while count >= rows:
+            table = pa.Table.from_batches(pending).combine_chunks()
+            yield from table.slice(0, rows).to_batches()
+            pending = table.slice(rows).to_batches()
+            count -= rows
+    if count:
+        yield from pa.Table.from_batches(pending).combine_chunks().to_batches()
+
+
+def _arrow_batch(batch, schema=None):
+    pa = _pyarrow()
+
+    arrays = []
+    for i, name in enumerate(batch.schema.names):
+        target = schema.field(name).type if schema is not None else None
+        arrays.append(_arrow_column(batch.column(i), target))
+        if target is not None and arrays[-1].type != target:
+            raise ValueError(
+                "Column {} does not fit type {} inferred from the first batch, "
+                "pass a schema".format(name, target)
+            )
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def _arrow_column(column, target=None):
+    pa = _pyarrow()
+    pc = pa.compute
+
+    if column.null_count == len(column):
+        return column.cast(target) if target is not None else column
+
+    first = pc.utf8_slice_codeunits(column, 0, 1)
+    iri = pc.equal(first, "<")
+    literal = pc.equal(first, '"')
+    bnode = pc.equal(first, "_")
+    bare = pc.invert(pc.or_(pc.or_(iri, literal), bnode))
+
+    parts = pc.extract_regex(column, _LITERAL)
+    label = _unescape(parts.field("lexical"))
+    lang = pc.if_else(
+        pc.not_equal(parts.field("lang"), ""), RDF_LANG_STRING, XSD + "string"
+    )
+    typed = pc.if_else(
+        pc.not_equal(parts.field("datatype"), ""), parts.field("datatype"), lang
+    )
+
+    kind = pa.scalar(XSD + "string")
+    for pattern, datatype in (
+        (r"^(true|false)$", _BOOLEAN),
+        (r"^[+-]?(?:\d+\.?\d*|\.\d+)[eE][+-]?\d+$", XSD + "double"),
+        (r"^[+-]?\d*\.\d+$", XSD + "decimal"),
+        (r"^[+-]?\d+$", XSD + "integer"),
+    ):
+        kind = pc.if_else(pc.match_substring_regex(column, pattern), datatype, kind)
+
+    datatype = pc.if_else(
+        iri,
+        "iri",
+        pc.if_else(
+            bnode, "bnode", pc.if_else(literal, typed, pc.if_else(bare, kind, ""))
+        ),
+    )
+    lexical = pc.if_else(
+        iri,
+        pc.utf8_slice_codeunits(column, 1, -1),
+        pc.if_else(literal, label, column),
+    )
+
+    datatypes = set(pc.unique(datatype.drop_null()).to_pylist())
+    numbers = pc.replace_substring_regex(lexical, r"^\+", "")
+
+    try:
+        if datatypes <= _INTEGERS and target in (None, pa.int64()):
+            return pc.cast(numbers, pa.int64())
+        if datatypes <= _INTEGERS | _FLOATS and target in (None, pa.float64()):
+            return pc.cast(numbers, pa.float64())
+        if datatypes == {_BOOLEAN} and target in (None, pa.bool_()):
+            return pc.or_(pc.equal(lexical, "true"), pc.equal(lexical, "1"))
+        if datatypes == {XSD + "date"} and target in (None, pa.date32()):
+            return pc.cast(lexical, pa.date32())
+        if datatypes <= _DATETIMES:
+            zoned = pc.match_substring_regex(lexical, r"(?:Z|[+-]\d\d:\d\d)$")
+            if pc.all(zoned).as_py():
+                timestamps = pa.timestamp("us", tz="UTC")
+            elif not pc.any(zoned).as_py():
+                timestamps = pa.timestamp("us")
+            else:
+                timestamps = None
+            if timestamps is not None and target in (None, timestamps):
+                return pc.cast(lexical, timestamps)
+    except pa.ArrowInvalid:
+        pass
+
+    if target is None and datatypes <= {"iri", "bnode"}:
+        return pc.dictionary_encode(lexical)
+    if target is not None and pa.types.is_dictionary(target):
+        return pc.dictionary_encode(lexical)
+    return lexical
+
+
+def _unescape(labels):
+    pc = _pyarrow().compute
+
+    if not pc.any(pc.match_substring(labels, "\\")).as_py():
+        return labels
+
+    # escaped backslashes are set aside so that they are not read as escapes
+    labels = pc.replace_substring(labels, "\\\\", "\x00")
+    for escape, char in _ESCAPES.items():
+        if escape != "\\":
+            labels = pc.replace_substring(labels, "\\" + escape, char)
+    return pc.replace_substring(labels, "\x00", "\\")
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view of an iterable of bytes chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
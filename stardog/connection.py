@@ -1,13 +1,28 @@
 """Connect to Stardog databases.
 """
 
+import concurrent.futures
 import contextlib
 import distutils.util
-
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import zlib
+
+from . import cache as cache
+from . import columnar as columnar
 from . import content_types as content_types
 from . import exceptions as exceptions
+from . import ntriples as ntriples
+from . import results as results
+from . import sparql as sparql
 from .http import client
 import urllib
+import urllib.parse
 
 
 class Connection(object):
@@ -15,6 +30,12 @@ class Connection(object):
 
     This is the entry point for all user-related operations on a
     Stardog database
+
+    By default a Connection is meant to be used by a single thread. Created
+    with ``thread_safe=True``, queries may be issued from many threads at
+    once over the shared connection pool, and each thread gets its own
+    transaction: :meth:`begin`, :meth:`commit` and friends only affect the
+    transaction of the calling thread.
     """
 
     def __init__(
@@ -25,29 +46,151 @@ class Connection(object):
         password=None,
         auth=None,
         session=None,
+        pool=None,
+        pool_maxsize=None,
+        pool_block=None,
+        keep_alive=None,
+        thread_safe=False,
+        accept_encoding=None,
+        compress_uploads=False,
+        hedge=None,
+        transport=None,
+        hooks=None,
+        binary_results=False,
+        cache=None,
     ):
         """Initializes a connection to a Stardog database.
 
         Args:
           database (str): Name of the database
           endpoint (str): Url of the server endpoint.
-            Defaults to `http://localhost:5820`
+            Defaults to `http://localhost:5820`. A list of urls, or a
+            :class:`stardog.http.cluster.Cluster`, routes writes to the
+            cluster coordinator and spreads reads across the nodes
           username (str, optional): Username to use in the connection
           password (str, optional): Password to use in the connection
           auth (requests.auth.AuthBase, optional): requests Authentication object.
             Defaults to `None`
           session (requests.session.Session, optional): requests Session object.
             Defaults to `None`
+          pool (stardog.http.client.ConnectionPool, optional): Connection pool
+            shared with other connections to the same endpoint.
+            Defaults to `None`
+          pool_maxsize (int, optional): Maximum number of pooled connections
+            when not sharing a pool. Defaults to 10
+          pool_block (bool, optional): Wait for a free pooled connection
+            instead of opening a throwaway one. Defaults to False
+          keep_alive (bool, optional): Reuse connections between requests.
+            Defaults to True
+          thread_safe (bool, optional): Keep transaction state per thread so
+            the connection can be shared by a thread pool. Size `pool_maxsize`
+            to the number of threads. Defaults to False
+          accept_encoding (bool, str or list[str], optional): Compressed
+            response codings to negotiate, e.g. `['zstd', 'gzip']`, or True
+            for every coding available locally. Bytes received and decoded
+            are counted in `conn.client.transfer_stats`. Defaults to `None`,
+            leaving negotiation to requests
+          compress_uploads (bool, optional): gzip data sent by :meth:`add`,
+            :meth:`remove` and :meth:`ICV.add` while uploading it, unless it
+            is already encoded. Defaults to False
+          hedge (stardog.http.hedging.HedgePolicy, optional): Duplicate slow
+            select, ask, graph, paths, size and export requests to another
+            node, keeping the first response. Defaults to `None`
+          transport (str or stardog.http.transports.Transport, optional):
+            HTTP backend, 'requests', 'urllib3' or 'httpx' (HTTP/2), or a
+            Transport instance. Defaults to 'requests'
+          hooks (list[callable], optional): Called with a
+            :class:`stardog.http.instrumentation.RequestEvent` holding the
+            timings of every request. Defaults to `None`
+          binary_results (bool, optional): Have :meth:`select` fetch results
+            in the compact binary results format and decode them into the
+            same structure as SPARQL JSON results. Defaults to False
+          cache (stardog.cache.ResultCache, optional): Cache for the
+            results of :meth:`select`, :meth:`ask` and :meth:`graph` queries
+            run outside of transactions. Invalidated by :meth:`commit`,
+            :meth:`update` and :meth:`clear`. Results are cached per
+            credentials, and not at all for auth objects whose credentials
+            are not known, see :func:`stardog.cache.identity`. Defaults to
+            `None`
 
         Examples:
           >>> conn = Connection('db', endpoint='http://localhost:9999',
                                 username='admin', password='admin')
+
+          sharing a connection between threads
+
+          >>> conn = Connection('db', thread_safe=True, pool_maxsize=16)
+          >>> with ThreadPoolExecutor(16) as pool:
+                results = list(pool.map(conn.select, queries))
+
+          sharing a pool
+
+          >>> pool = ConnectionPool(pool_maxsize=50)
+          >>> conn = Connection('db', pool=pool)
+
+          talking to cluster nodes directly
+
+          >>> conn = Connection('db', endpoint=['http://sd1:5820',
+                                                'http://sd2:5820'])
+
+          caching results
+
+          >>> conn = Connection('db', cache=ResultCache(ttl=30))
         """
         self.client = client.Client(
-            endpoint, database, username, password, auth=auth, session=session
+            endpoint,
+            database,
+            username,
+            password,
+            auth=auth,
+            session=session,
+            pool=pool,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=keep_alive,
+            accept_encoding=accept_encoding,
+            compress_uploads=compress_uploads,
+            hedge=hedge,
+            transport=transport,
+            hooks=hooks,
+            in_transaction=self._in_transaction,
         )
+        self.binary_results = binary_results
+        self.cache = cache
+        self._local = threading.local() if thread_safe else None
         self.transaction = None
 
+    @property
+    def transaction(self):
+        """str: ID of the current transaction, or None if not in one."""
+        if self._local is not None:
+            return getattr(self._local, "transaction", None)
+        return self._transaction
+
+    @transaction.setter
+    def transaction(self, value):
+        if self._local is not None:
+            self._local.transaction = value
+        else:
+            self._transaction = value
+
+    def _in_transaction(self):
+        return self.transaction is not None
+
+    def _thread_initializer(self):
+        """Returns a callable running the caller's transaction on a thread.
+
+        Transactions of thread safe connections are per thread, so threads
+        working on behalf of the caller call it before sending requests.
+        """
+        transaction = self.transaction
+
+        def _initializer():
+            if self._local is not None:
+                self.transaction = transaction
+
+        return _initializer
+
     def docs(self):
         """Makes a document storage object.
 
@@ -124,6 +267,7 @@ class Connection(object):
         self._assert_in_transaction()
         self.client.post("/transaction/commit/{}".format(self.transaction))
         self.transaction = None
+        self.__invalidate()
 
     def add(self, content, graph_uri=None):
         """Adds data to the database.
@@ -142,14 +286,15 @@ class Connection(object):
         self._assert_in_transaction()
 
         with content.data() as data:
+            body, encoding = self.client._upload(content, data)
             self.client.post(
                 "/{}/add".format(self.transaction),
                 params={"graph-uri": graph_uri},
                 headers={
                     "Content-Type": content.content_type,
-                    "Content-Encoding": content.content_encoding,
+                    "Content-Encoding": encoding,
                 },
-                data=data,
+                data=body,
             )
 
     def remove(self, content, graph_uri=None):
@@ -170,14 +315,15 @@ class Connection(object):
         self._assert_in_transaction()
 
         with content.data() as data:
+            body, encoding = self.client._upload(content, data)
             self.client.post(
                 "/{}/remove".format(self.transaction),
                 params={"graph-uri": graph_uri},
                 headers={
                     "Content-Type": content.content_type,
-                    "Content-Encoding": content.content_encoding,
+                    "Content-Encoding": encoding,
                 },
-                data=data,
+                data=body,
             )
 
     def clear(self, graph_uri=None):
@@ -203,6 +349,7 @@ class Connection(object):
         self.client.post(
             "/{}/clear".format(self.transaction), params={"graph-uri": graph_uri}
         )
+        self.__invalidate()
 
     def size(self, exact=False):
         """Database size.
@@ -264,11 +411,99 @@ class Connection(object):
                 params={"graph-uri": graph_uri},
                 stream=stream,
             ) as r:
-                yield r.iter_content(chunk_size=chunk_size) if stream else r.content
+                yield self.client._iter_content(r, chunk_size) if stream else r.content
 
         db = _export()
         return _nextcontext(db) if stream else next(db)
 
+    def export_to_file(
+        self,
+        path,
+        content_type=content_types.TURTLE,
+        graph_uri=None,
+        compression=None,
+        chunk_size=1048576,
+        progress=None,
+    ):
+        """Exports the contents of the database to a file.
+
+        The response is read from the socket into a single reusable buffer
+        and written to a temporary file next to `path`, which is renamed to
+        `path` once the export is complete, so `path` never holds a partial
+        export. If the export fails the temporary file is removed.
+
+        Args:
+          path (str): File to write
+          content_type (str): RDF content type. Defaults to 'text/turtle'
+          graph_uri (str, optional): Named graph to export
+          compression (str, optional): 'gzip' to write a gzip file. The
+            export is asked for gzip encoded and written as received, or
+            compressed while writing if the server does not encode it.
+            Defaults to `None`, writing it uncompressed
+          chunk_size (int, optional): Size in bytes of the read buffer.
+            Defaults to 1048576
+          progress (callable, optional): Called with the :class:`ExportStats`
+            at most once per second while exporting, and once at the end
+
+        Returns:
+          ExportStats: Bytes received and written and the time it took
+
+        Examples:
+          >>> conn.export_to_file('db.nt.gz', content_types.NTRIPLES,
+                                  compression='gzip', progress=print)
+        """
+        if compression not in (None, "gzip"):
+            raise ValueError("Unsupported compression: {}".format(compression))
+
+        headers = {"Accept": content_type}
+        if compression:
+            headers["Accept-Encoding"] = "gzip"
+
+        temp = "{}.{}.part".format(path, uuid.uuid4().hex[:8])
+        stats = ExportStats()
+        try:
+            with open(temp, "xb") as f, self.client.get(
+                "/export",
+                headers=headers,
+                params={"graph-uri": graph_uri},
+                stream=True,
+            ) as r:
+                encoded = r.headers.get("Content-Encoding", "identity").lower()
+                passthrough = compression == "gzip" and encoded == "gzip"
+                compressor = None
+                if compression and not passthrough:
+                    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+                buffer = bytearray(chunk_size)
+                reported = stats.start
+                for chunk in self.client._iter_into(r, buffer, not passthrough):
+                    stats.bytes_received += len(chunk)
+                    if compressor is not None:
+                        chunk = compressor.compress(chunk)
+                    f.write(chunk)
+                    stats.bytes_written += len(chunk)
+
+                    if progress is not None and time.monotonic() - reported >= 1:
+                        reported = time.monotonic()
+                        stats.seconds = reported - stats.start
+                        progress(stats)
+
+                if compressor is not None:
+                    stats.bytes_written += f.write(compressor.flush())
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+        stats.seconds = time.monotonic() - stats.start
+        if progress is not None:
+            progress(stats)
+        return stats
+
     def explain(self, query, base_uri=None):
         """Explains the evaluation of a SPARQL query.
 
@@ -289,7 +524,58 @@ class Connection(object):
         return r.text
 
     def __query(self, query, method, content_type=None, **kwargs):
+        body = self.__content(query, method, content_type, **kwargs)
+        return json.loads(body) if content_type == content_types.SPARQL_JSON else body
+
+    def __content(self, query, method, content_type=None, **kwargs):
+        results_cache = self.cache
+        # transactions see their own uncommitted changes
+        if results_cache is None or method != "query" or self.transaction:
+            return self.__send_query(query, method, content_type, **kwargs).content
+        # results are only shared by the same credentials
+        identity = cache.identity(self.client.auth)
+        if identity is None:
+            return self.__send_query(query, method, content_type, **kwargs).content
+
+        database = self.client.url
+        key = cache.query_key(identity, database, method, query, content_type, **kwargs)
+        body = results_cache.get(database, key)
+        if body is None:
+            generation = results_cache.generation(database)
+            body = self.__send_query(query, method, content_type, **kwargs).content
+            results_cache.put(database, key, body, generation)
+        return body
+
+    def __invalidate(self):
+        if self.cache is not None:
+            self.cache.invalidate(self.client.url)
+
+    def __stream(self, query, method, content_type, chunk_size, decoder, **kwargs):
+        def _query():
+            with self.__send_query(
+                query, method, content_type, stream=True, **kwargs
+            ) as r:
+                chunks = self.client._iter_content(r, chunk_size)
+                try:
+                    yield decoder(chunks) if decoder else chunks
+                finally:
+                    chunks.close()
+
+        return _nextcontext(_query())
+
+    def __send_query(self, query, method, content_type=None, stream=False, **kwargs):
         txId = self.transaction
+        url = "/{}/{}".format(txId, method) if txId else "/{}".format(method)
+
+        prepared = kwargs.get("prepared")
+        if prepared is not None:
+            return self.client.post(
+                url,
+                data=prepared._encode(kwargs),
+                headers={"Accept": content_type, "Content-Type": _FORM},
+                stream=stream,
+            )
+
         params = {
             "query": query,
             "baseURI": kwargs.get("base_uri"),
@@ -304,17 +590,72 @@ class Connection(object):
         for k, v in bindings.items():
             params["${}".format(k)] = v
 
-        url = "/{}/{}".format(txId, method) if txId else "/{}".format(method)
-
-        r = self.client.post(
+        return self.client.post(
             url,
             data=params,
             headers={"Accept": content_type},
+            stream=stream,
         )
 
-        return r.json() if content_type == content_types.SPARQL_JSON else r.content
+    def prepare(self, query, content_type=None, **defaults):
+        """Prepares a query to run many times.
+
+        The query text and the arguments fixed at preparation are
+        url-encoded once, so each execution only encodes its bindings,
+        limit and offset.
+
+        Args:
+          query (str): SPARQL select, ask, construct or describe query
+          content_type (str, optional): Content type of the results.
+            Defaults to 'application/sparql-results+json' for select,
+            'text/boolean' for ask and 'text/turtle' for graph queries
+          base_uri (str, optional): Base URI for the parsing of the query
+          timeout (int, optional): Number of ms after which the query should
+            timeout. 0 or less implies no timeout
+          reasoning (bool, optional): Enable reasoning for the query
+          bindings (dict, optional): Default values of query variables
+          limit (int, optional): Default maximum number of results
+          offset (int, optional): Default offset into the result set
+
+        Returns:
+          PreparedQuery: The prepared query
 
-    def select(self, query, content_type=content_types.SPARQL_JSON, **kwargs):
+        Raises:
+          ValueError: If the query is not a select, ask, construct or
+            describe query
+
+        Examples:
+          >>> q = conn.prepare('select * {?s :name ?name}', reasoning=True)
+          >>> q.execute(bindings={'name': '"Frodo"'})
+          >>> q.execute_many([{'name': '"Frodo"'}, {'name': '"Sam"'}])
+        """
+        return PreparedQuery(self, query, content_type, **defaults)
+
+    def _prepared(self, prepared, content_type, stream, chunk_size, decoder, **kwargs):
+        # runs a PreparedQuery, with its defaults merged into kwargs
+        if stream:
+            return self.__stream(
+                prepared.query,
+                "query",
+                content_type,
+                chunk_size,
+                decoder,
+                prepared=prepared,
+                **kwargs,
+            )
+        return self.__content(
+            prepared.query, "query", content_type, prepared=prepared, **kwargs
+        )
+
+    def select(
+        self,
+        query,
+        content_type=content_types.SPARQL_JSON,
+        stream=False,
+        chunk_size=65536,
+        result_set=False,
+        **kwargs,
+    ):
         """Executes a SPARQL select query.
 
         Args:
@@ -329,6 +670,13 @@ class Connection(object):
             values
           content_type (str, optional): Content type for results.
             Defaults to 'application/sparql-results+json'
+          stream (bool, optional): Parse results while they are received
+            instead of reading the whole response first. Defaults to False
+          chunk_size (int, optional): Number of bytes to read per chunk when
+            streaming. Defaults to 65536
+          result_set (bool, optional): Return a compact
+            :class:`stardog.results.ResultSet` built while the results are
+            received. Defaults to False
 
         Returns:
           dict: If content_type='application/sparql-results+json'
@@ -336,6 +684,20 @@ class Connection(object):
         Returns:
           str: Other content types
 
+        Returns:
+          stardog.results.ResultSet: If result_set = True
+
+        Returns:
+          stardog.results.BindingStream: If stream = True and
+            content_type='application/sparql-results+json', as a context
+            manager. Leaving it closes the response, even if results remain.
+            A :class:`stardog.results.BinaryResultStream` with the same
+            interface when the connection uses binary results
+
+        Returns:
+          gen: If stream = True for other content types, chunks of bytes as
+            a context manager
+
         Examples:
           >>> conn.select('select * {?s ?p ?o}',
                           offset=100, limit=100, reasoning=True)
@@ -343,10 +705,322 @@ class Connection(object):
           bindings
 
           >>> conn.select('select * {?s ?p ?o}', bindings={'o': '<urn:a>'})
+
+          streaming
+
+          >>> with conn.select('select * {?s ?p ?o}', stream=True) as bindings:
+                for binding in bindings:
+                  print(binding['s']['value'])
+
+          result set
+
+          >>> results = conn.select('select * {?s ?p ?o}', result_set=True)
+          >>> [row.s.value for row in results]
         """
+        if result_set:
+            if stream or content_type != content_types.SPARQL_JSON:
+                raise ValueError(
+                    "result_set cannot be combined with stream or a content type"
+                )
+            with self.select(query, stream=True, chunk_size=chunk_size, **kwargs) as r:
+                return results.ResultSet.from_bindings(r)
+
+        decoder = None
+        if content_type == content_types.SPARQL_JSON:
+            decoder = results.BindingStream
+            if self.binary_results:
+                content_type = content_types.BINARY_RDF
+                decoder = results.BinaryResultStream
+
+        if stream:
+            return self.__stream(
+                query, "query", content_type, chunk_size, decoder, **kwargs
+            )
+        if decoder is results.BinaryResultStream:
+            body = self.__content(query, "query", content_type, **kwargs)
+            return results.collect(decoder([body]))
         return self.__query(query, "query", content_type=content_type, **kwargs)
 
-    def graph(self, query, content_type=content_types.TURTLE, **kwargs):
+    def select_pages(self, query, page_size=10000, prefetch=2, **kwargs):
+        """Executes a SPARQL select query one page of results at a time.
+
+        Pages are requested with limit and offset on a background thread,
+        up to `prefetch` pages ahead of the bindings consumed, and iteration
+        stops after the first page holding fewer than `page_size` results.
+        Give the query an ORDER BY so that pages do not overlap.
+
+        Args:
+          query (str): SPARQL query
+          page_size (int, optional): Number of results per request.
+            Defaults to 10000
+          prefetch (int, optional): Number of pages fetched ahead. 0 fetches
+            each page when the previous one is consumed. Defaults to 2
+          limit (int, optional): Maximum number of results over all pages
+          offset (int, optional): Offset of the first page
+          **kwargs: Other query arguments accepted by :meth:`select`
+
+        Returns:
+          gen: SPARQL JSON bindings. Closing the generator stops fetching
+
+        Examples:
+          >>> for binding in conn.select_pages(
+                  'select * {?s ?p ?o} order by ?s', page_size=5000):
+                print(binding['s']['value'])
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+
+        offset = kwargs.pop("offset", None) or 0
+        limit = kwargs.pop("limit", None)
+        setup = self._thread_initializer()
+
+        def _fetch(offset, size):
+            r = self.select(query, offset=offset, limit=size, **kwargs)
+            return r["results"]["bindings"]
+
+        def _bindings():
+            pages = _paged(_fetch, offset, page_size, limit)
+            with contextlib.closing(_prefetched(pages, prefetch, setup)) as pages:
+                for page in pages:
+                    yield from page
+
+        return _bindings()
+
+    def select_partitioned(
+        self, query, var, partitions=4, values=None, stream=False, **kwargs
+    ):
+        """Executes a SPARQL select query as concurrent partial queries.
+
+        Each partial query gets a clause added at the end of its outermost
+        group: a VALUES block over a share of `values` when given, or else a
+        FILTER keeping one hash bucket of `var` (see
+        :func:`stardog.sparql.hash_filter`). The partial queries run in
+        parallel, one thread each, and their bindings are merged in arrival
+        order. Solution modifiers such as ORDER BY, DISTINCT or aggregates
+        only apply within a partition. Size `pool_maxsize` to at least the
+        number of partitions.
+
+        Args:
+          query (str): SPARQL query
+          var (str): Variable to partition on, without the '?'
+          partitions (int, optional): Number of partial queries. Defaults to 4
+          values (list, optional): Every value of `var` to query for, as
+            accepted by :func:`stardog.sparql.term`. Defaults to `None`,
+            partitioning by hash
+          stream (bool, optional): Yield bindings while they are received.
+            Defaults to False
+          base_uri (str, optional): Base URI for the parsing of the query
+          timeout (int, optional): Number of ms after which each partial
+            query should timeout. 0 or less implies no timeout
+          reasoning (bool, optional): Enable reasoning for the query
+          bindings (dict, optional): Map between query variables and their
+            values
+
+        Returns:
+          dict: SPARQL JSON results, if stream = False
+
+        Returns:
+          gen: If stream = True, bindings as a context manager. Leaving it
+            closes every response
+
+        Examples:
+          >>> conn.select_partitioned('select * {?s ?p ?o}', 's', partitions=8)
+
+          >>> with conn.select_partitioned('select * {?s a :Person ; :name ?n}',
+                                           's', values=people, stream=True) as rows:
+                for row in rows:
+                  print(row['n']['value'])
+        """
+        if "limit" in kwargs or "offset" in kwargs:
+            raise ValueError("limit and offset cannot be used with partitions")
+        if partitions < 1:
+            raise ValueError("partitions must be positive")
+
+        if values is None:
+            clauses = [
+                sparql.hash_filter(var, partitions, bucket)
+                for bucket in range(partitions)
+            ]
+        else:
+            clauses = [
+                sparql.values(var, part)
+                for part in sparql.partition(values, partitions)
+            ]
+        queries = [sparql.inject(query, clause) for clause in clauses]
+        setup = self._thread_initializer()
+
+        def _open(query):
+            return lambda: self.select(query, stream=True, **kwargs)
+
+        if stream:
+            return _merge_context([_open(q) for q in queries], setup)
+
+        with _merge_context([_open(q) for q in queries], setup) as merged:
+            bindings = list(merged)
+        return {"head": {"vars": merged.vars}, "results": {"bindings": bindings}}
+
+    def select_batch(
+        self, query, bindings_list, chunk_size=100, row_var="_row", **kwargs
+    ):
+        """Executes a SPARQL select query once per set of bindings, in batches.
+
+        Up to `chunk_size` sets of bindings go into a single request, as a
+        VALUES block added at the end of the outermost group of the query.
+        Each row of the block carries its position in `bindings_list` in the
+        `row_var` variable, which is projected to split the results back up.
+        As with any VALUES block, the bindings join with the query pattern
+        instead of replacing the variables before evaluation, and solution
+        modifiers such as LIMIT or ORDER BY apply to a whole batch.
+
+        Args:
+          query (str): SPARQL select query
+          bindings_list (iterable of dict): Values of query variables, as
+            accepted by :func:`stardog.sparql.term`. Variables missing from
+            a set are left unbound
+          chunk_size (int, optional): Number of sets of bindings per request.
+            Defaults to 100
+          row_var (str, optional): Name of the row index variable, which
+            must not be used by the query. Defaults to '_row'
+          base_uri (str, optional): Base URI for the parsing of the query
+          timeout (int, optional): Number of ms after which each batch
+            should timeout. 0 or less implies no timeout
+          reasoning (bool, optional): Enable reasoning for the query
+
+        Returns:
+          list[dict]: SPARQL JSON results, one per set of bindings, in input
+            order
+
+        Examples:
+          >>> names = conn.select_batch('select ?name {?p :name ?name}',
+                                        [{'p': '<urn:frodo>'}, {'p': '<urn:sam>'}])
+          >>> names[1]['results']['bindings']
+        """
+        if {"limit", "offset", "bindings"} & set(kwargs):
+            raise ValueError("limit, offset and bindings cannot be used in batches")
+        if "?" + row_var in query or "$" + row_var in query:
+            raise ValueError("The query already uses ?{}".format(row_var))
+
+        bindings_list = list(bindings_list)
+        projected = sparql.project(query, row_var)
+        variables = []
+        for bindings in bindings_list:
+            variables.extend(v for v in bindings if v not in variables)
+
+        out = []
+        for start in range(0, len(bindings_list), chunk_size):
+            chunk = bindings_list[start : start + chunk_size]
+            values = sparql.values(
+                [row_var] + variables,
+                (
+                    [i] + [bindings.get(v) for v in variables]
+                    for i, bindings in enumerate(chunk)
+                ),
+            )
+            r = self.select(sparql.inject(projected, values), **kwargs)
+
+            head = dict(r["head"])
+            head["vars"] = [v for v in head.get("vars", []) if v != row_var]
+            rows = [[] for _ in chunk]
+            for binding in r["results"]["bindings"]:
+                rows[int(binding.pop(row_var)["value"])].append(binding)
+            out.extend(
+                {
+                    "head": dict(head, vars=list(head["vars"])),
+                    "results": {"bindings": b},
+                }
+                for b in rows
+            )
+        return out
+
+    def select_frame(self, query, chunk_size=100000, **kwargs):
+        """Executes a SPARQL select query into a pandas DataFrame.
+
+        Results are fetched as TSV and parsed in chunks of rows. Columns
+        whose bound values are all xsd integers, decimals/doubles, booleans
+        or dates get native dtypes, other columns hold the lexical form of
+        IRIs and literals. Requires pandas.
+
+        Args:
+          query (str): SPARQL query
+          chunk_size (int, optional): Number of rows to parse at a time.
+            Defaults to 100000
+          base_uri (str, optional): Base URI for the parsing of the query
+          limit (int, optional): Maximum number of results to return
+          offset (int, optional): Offset into the result set
+          timeout (int, optional): Number of ms after which the query should
+            timeout. 0 or less implies no timeout
+          reasoning (bool, optional): Enable reasoning for the query
+          bindings (dict, optional): Map between query variables and their
+            values
+
+        Returns:
+          pandas.DataFrame: One column per variable
+
+        Examples:
+          >>> df = conn.select_frame('select ?name ?age {?p :name ?name ; :age ?age}')
+          >>> df['age'].mean()
+        """
+        with self.select(
+            query, content_types.TSV, stream=True, chunk_size=65536, **kwargs
+        ) as chunks:
+            return columnar.read_tsv(chunks, chunk_size)
+
+    def select_arrays(self, query, chunk_size=100000, **kwargs):
+        """Executes a SPARQL select query into NumPy arrays.
+
+        Same as :meth:`select_frame`, returning a NumPy array per variable.
+        Requires pandas.
+
+        Args:
+          query (str): SPARQL query
+          chunk_size (int, optional): Number of rows to parse at a time.
+            Defaults to 100000
+          **kwargs: Query arguments accepted by :meth:`select`
+
+        Returns:
+          dict: Maps variable names to numpy.ndarray
+
+        Examples:
+          >>> arrays = conn.select_arrays('select ?age {?p :age ?age}')
+          >>> arrays['age'].mean()
+        """
+        return columnar.to_arrays(self.select_frame(query, chunk_size, **kwargs))
+
+    def select_arrow(self, query, batch_rows=65536, schema=None, **kwargs):
+        """Executes a SPARQL select query into Arrow record batches.
+
+        Results are fetched as TSV and converted to record batches while
+        the response is read, without building per-row objects. IRI columns
+        are dictionary encoded, and columns whose bound values are all xsd
+        integers, decimals/doubles, booleans, dates or dateTimes get native
+        types. Requires pyarrow.
+
+        Args:
+          query (str): SPARQL query
+          batch_rows (int, optional): Maximum number of rows per batch.
+            Defaults to 65536
+          schema (pyarrow.Schema, optional): Types to convert the columns to.
+            Defaults to `None`, inferring them from the first batch
+          **kwargs: Query arguments accepted by :meth:`select`
+
+        Returns:
+          pyarrow.RecordBatchReader: The batches, as a context manager.
+            Leaving it closes the response
+
+        Examples:
+          >>> with conn.select_arrow('select * {?s ?p ?o}') as batches:
+                pyarrow.parquet.write_table(batches.read_all(), 'triples.parquet')
+        """
+
+        def _arrow():
+            with self.select(
+                query, content_types.TSV, stream=True, chunk_size=65536, **kwargs
+            ) as chunks:
+                yield columnar.read_arrow(chunks, batch_rows, schema)
+
+        return _nextcontext(_arrow())
+
+    def graph(self, query, content_type=None, stream=False, chunk_size=65536, **kwargs):
         """Executes a SPARQL graph query.
 
         Args:
@@ -360,11 +1034,21 @@ class Connection(object):
           bindings (dict, optional): Map between query variables and their
             values
           content_type (str): Content type for results.
-            Defaults to 'text/turtle'
+            Defaults to 'text/turtle', or 'application/n-triples' when
+            streaming
+          stream (bool, optional): Parse statements while they are received.
+            Only for N-Triples and N-Quads. Defaults to False
+          chunk_size (int, optional): Number of bytes to read per chunk when
+            streaming. Defaults to 65536
 
         Returns:
           str: Results in format given by content_type
 
+        Returns:
+          gen: If stream = True, ``(s, p, o)`` tuples of
+            :mod:`stardog.terms`, or ``(s, p, o, g)`` for N-Quads, as a
+            context manager. Leaving it closes the response
+
         Examples:
           >>> conn.graph('construct {?s ?p ?o} where {?s ?p ?o}',
                          offset=100, limit=100, reasoning=True)
@@ -373,8 +1057,31 @@ class Connection(object):
 
           >>> conn.graph('construct {?s ?p ?o} where {?s ?p ?o}',
                          bindings={'o': '<urn:a>'})
+
+          streaming
+
+          >>> with conn.graph('construct {?s ?p ?o} where {?s ?p ?o}',
+                              stream=True) as triples:
+                for s, p, o in triples:
+                  print(s.value)
         """
-        return self.__query(query, "query", content_type, **kwargs)
+        if not stream:
+            return self.__query(
+                query, "query", content_type or content_types.TURTLE, **kwargs
+            )
+
+        content_type = content_type or content_types.NTRIPLES
+        if content_type not in (content_types.NTRIPLES, content_types.NQUADS):
+            raise ValueError("Only N-Triples and N-Quads can be streamed")
+        quads = content_type == content_types.NQUADS
+        return self.__stream(
+            query,
+            "query",
+            content_type,
+            chunk_size,
+            lambda chunks: ntriples.parse(chunks, quads),
+            **kwargs,
+        )
 
     def paths(self, query, content_type=content_types.SPARQL_JSON, **kwargs):
         """Executes a SPARQL paths query.
@@ -444,7 +1151,10 @@ class Connection(object):
         Examples:
           >>> conn.update('delete where {?s ?p ?o}')
         """
-        self.__query(query, "update", None, **kwargs)
+        try:
+            self.__query(query, "update", None, **kwargs)
+        finally:
+            self.__invalidate()
 
     def is_consistent(self, graph_uri=None):
         """Checks if the database or named graph is consistent wrt its schema.
@@ -534,6 +1244,197 @@ class Connection(object):
         self.close()
 
 
+class ExportStats(object):
+    """Progress of :meth:`Connection.export_to_file`.
+
+    Attributes:
+      bytes_received (int): Bytes of the export read from the response,
+        before compressing them, or as received when passing gzip through
+      bytes_written (int): Bytes written to the file
+      seconds (float): Seconds since the export started
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        """float: Bytes received per second."""
+        return self.bytes_received / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return "ExportStats(bytes_received={}, bytes_written={}, {:.1f} MB/s)".format(
+            self.bytes_received, self.bytes_written, self.throughput / 1e6
+        )
+
+
+class PreparedQuery(object):
+    """A query encoded once to be run many times.
+
+    Created by :meth:`Connection.prepare`. Runs in the transaction of its
+    connection at execution time, and uses the connection's result cache.
+
+    Attributes:
+      query (str): The query
+      form (str): 'select', 'ask', 'construct' or 'describe'
+      content_type (str): Content type of the results
+      defaults (dict): Arguments given at preparation
+    """
+
+    ARGUMENTS = ("bindings", "limit", "offset")
+
+    def __init__(self, conn, query, content_type=None, **defaults):
+        unknown = set(defaults) - {
+            "base_uri",
+            "timeout",
+            "reasoning",
+            "bindings",
+            "limit",
+            "offset",
+        }
+        if unknown:
+            raise TypeError("Unknown query arguments: {}".format(sorted(unknown)))
+
+        form = sparql.query_form(query)
+        if form is None:
+            raise ValueError(
+                "Only select, ask, construct and describe queries can be prepared"
+            )
+
+        self.conn = conn
+        self.query = query
+        self.form = form
+        self.content_type = content_type or _FORM_CONTENT_TYPES[self.form]
+        self.defaults = defaults
+
+        static = {
+            "query": query,
+            "baseURI": defaults.get("base_uri"),
+            "timeout": defaults.get("timeout"),
+            "reasoning": defaults.get("reasoning"),
+        }
+        self._static = urllib.parse.urlencode(
+            [(k, v) for k, v in static.items() if v is not None]
+        )
+
+    def execute(self, **kwargs):
+        """Runs the query.
+
+        Args:
+          bindings (dict, optional): Values of query variables, added to the
+            default bindings
+          limit (int, optional): Maximum number of results to return
+          offset (int, optional): Offset into the result set
+
+        Returns:
+          dict, bool or bytes: As returned by :meth:`Connection.select`,
+            :meth:`Connection.ask` or :meth:`Connection.graph`
+        """
+        body = self.conn._prepared(
+            self, self.content_type, False, None, None, **self.__arguments(kwargs)
+        )
+        if self.content_type == content_types.SPARQL_JSON:
+            return json.loads(body)
+        if self.form == "ask" and self.content_type == content_types.BOOLEAN:
+            return bool(distutils.util.strtobool(body.decode()))
+        return body
+
+    def execute_iter(self, chunk_size=65536, **kwargs):
+        """Runs the query, parsing the results while they are received.
+
+        Takes the same arguments as :meth:`execute`.
+
+        Args:
+          chunk_size (int, optional): Number of bytes to read per chunk.
+            Defaults to 65536
+
+        Returns:
+          stardog.results.BindingStream: For select queries with SPARQL JSON
+            results, or else `(s, p, o)` tuples for graph queries with
+            N-Triples results, or chunks of bytes, as a context manager
+
+        Raises:
+          ValueError: For ask queries
+        """
+        if self.form == "ask":
+            raise ValueError("ask results cannot be streamed")
+
+        decoder = None
+        if self.content_type == content_types.SPARQL_JSON:
+            decoder = results.BindingStream
+        elif self.content_type in (content_types.NTRIPLES, content_types.NQUADS):
+            quads = self.content_type == content_types.NQUADS
+            decoder = functools.partial(ntriples.parse, quads=quads)
+
+        return self.conn._prepared(
+            self,
+            self.content_type,
+            True,
+            chunk_size,
+            decoder,
+            **self.__arguments(kwargs),
+        )
+
+    def execute_many(self, bindings_list, max_workers=None, **kwargs):
+        """Runs the query once per set of bindings.
+
+        Args:
+          bindings_list (iterable of dict): Values of query variables
+          max_workers (int, optional): Number of queries to run at once.
+            Defaults to `None`, running them one after the other
+          limit (int, optional): Maximum number of results of each query
+          offset (int, optional): Offset into each result set
+
+        Returns:
+          list: Results as returned by :meth:`execute`, in input order
+        """
+        if not max_workers:
+            return [self.execute(bindings=b, **kwargs) for b in bindings_list]
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers, initializer=self.conn._thread_initializer()
+        ) as pool:
+            return list(
+                pool.map(lambda b: self.execute(bindings=b, **kwargs), bindings_list)
+            )
+
+    def __arguments(self, kwargs):
+        unknown = set(kwargs) - set(self.ARGUMENTS)
+        if unknown:
+            raise TypeError("Unknown query arguments: {}".format(sorted(unknown)))
+
+        arguments = dict(self.defaults)
+        arguments.update((k, v) for k, v in kwargs.items() if v is not None)
+        if self.defaults.get("bindings") and kwargs.get("bindings"):
+            arguments["bindings"] = dict(
+                self.defaults["bindings"], **kwargs["bindings"]
+            )
+        return arguments
+
+    def _encode(self, arguments):
+        params = [
+            (k, arguments[k])
+            for k in ("limit", "offset")
+            if arguments.get(k) is not None
+        ]
+        params.extend(
+            ("${}".format(k), v) for k, v in (arguments.get("bindings") or {}).items()
+        )
+        if not params:
+            return self._static.encode("ascii")
+        return "{}&{}".format(self._static, urllib.parse.urlencode(params)).encode(
+            "ascii"
+        )
+
+    def __repr__(self):
+        return "PreparedQuery({!r})".format(
+            self.query if len(self.query) < 60 else self.query[:57] + "..."
+        )
+
+
 class Docs(object):
     """BITES: Document Storage.
 
@@ -612,7 +1513,7 @@ class Docs(object):
 
         def _get():
             with self.client.get("/docs/{}".format(name), stream=stream) as r:
-                yield r.iter_content(chunk_size=chunk_size) if stream else r.content
+                yield self.client._iter_content(r, chunk_size) if stream else r.content
 
         doc = _get()
         return _nextcontext(doc) if stream else next(doc)
@@ -654,12 +1555,13 @@ class ICV(object):
           >>> icv.add(File('constraints.ttl'))
         """
         with content.data() as data:
+            body, encoding = self.client._upload(content, data)
             self.client.post(
                 "/icv/add",
-                data=data,
+                data=body,
                 headers={
                     "Content-Type": content.content_type,
-                    "Content-Encoding": content.content_encoding,
+                    "Content-Encoding": encoding,
                 },
             )
 
@@ -675,12 +1577,13 @@ class ICV(object):
           >>> icv.remove(File('constraints.ttl'))
         """
         with content.data() as data:
+            body, encoding = self.client._upload(content, data)
             self.client.post(
                 "/icv/remove",
-                data=data,
+                data=body,
                 headers={
                     "Content-Type": content.content_type,
-                    "Content-Encoding": content.content_encoding,
+                    "Content-Encoding": encoding,
                 },
             )
 
@@ -935,3 +1838,146 @@ class GraphQL(object):
 @contextlib.contextmanager
 def _nextcontext(r):
     yield next(r)
+
+
+def _paged(fetch, offset, page_size, limit=None):
+    while limit is None or limit > 0:
+        size = page_size if limit is None else min(page_size, limit)
+        page = fetch(offset, size)
+        yield page
+        if len(page) < size:
+            return
+        offset += size
+        if limit is not None:
+            limit -= size
+
+
+_DONE = object()
+
+
+def _prefetched(items, size, setup=None):
+    """Consumes an iterator on a background thread, up to size items ahead."""
+    if size < 1:
+        yield from items
+        return
+
+    ready = queue.Queue()
+    # one slot per item being fetched or waiting to be consumed
+    slots = threading.Semaphore(size)
+    stop = threading.Event()
+
+    def _slot():
+        while not stop.is_set():
+            if slots.acquire(timeout=0.1):
+                return not stop.is_set()
+        return False
+
+    def _run():
+        try:
+            if setup:
+                setup()
+            items_iter = iter(items)
+            while _slot():
+                item = next(items_iter, _DONE)
+                ready.put((item, None))
+                if item is _DONE:
+                    return
+        except Exception as e:
+            ready.put((None, e))
+
+    thread = threading.Thread(target=_run, name="stardog-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = ready.get()
+            slots.release()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class _Merged(object):
+    """Iterates over the items of several streams read by one thread each."""
+
+    def __init__(self, openers, setup=None, size=1024):
+        self.vars = []
+        self._ready = queue.Queue(size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(
+                target=self.__run,
+                args=(opener, setup),
+                name="stardog-partition",
+                daemon=True,
+            )
+            for opener in openers
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._running = len(self._threads)
+
+    def __put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __run(self, opener, setup):
+        try:
+            if setup:
+                setup()
+            with opener() as stream:
+                with self._lock:
+                    for var in getattr(stream, "vars", ()):
+                        if var not in self.vars:
+                            self.vars.append(var)
+                for item in stream:
+                    if not self.__put((item, None)):
+                        return
+            self.__put((_DONE, None))
+        except Exception as e:
+            self.__put((None, e))
+
+    def __iter__(self):
+        while self._running:
+            item, error = self._ready.get()
+            if error is not None:
+                self.close()
+                raise error
+            if item is _DONE:
+                self._running -= 1
+                continue
+            yield item
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+@contextlib.contextmanager
+def _merge_context(openers, setup=None):
+    merged = _Merged(openers, setup)
+    try:
+        yield merged
+    finally:
+        merged.close()
+
+
+_FORM = "application/x-www-form-urlencoded"
+
+_FORM_CONTENT_TYPES = {
+    "select": content_types.SPARQL_JSON,
+    "ask": content_types.BOOLEAN,
+    "construct": content_types.TURTLE,
+    "describe": content_types.TURTLE,
+}
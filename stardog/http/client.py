@@ -1,8 +1,99 @@
+import time
+import uuid
+import zlib
+
 import requests
 import requests.auth
 import requests_toolbelt.multipart as multipart
 
 from .. import exceptions as exceptions
+from . import cluster
+from . import compression
+from . import hedging
+from . import instrumentation
+from . import transports
+
+
+class ConnectionPool(object):
+    """Pooled HTTP transport that can be shared between clients.
+
+    Every :class:`Client` owns a private pool unless one is given, so
+    passing the same ConnectionPool to many connections pointing at the
+    same endpoint reuses their sockets instead of opening new ones.
+    """
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        keep_alive=True,
+        max_retries=0,
+        session=None,
+        transport=None,
+    ):
+        """Initializes a connection pool.
+
+        Args:
+          pool_connections (int, optional): Number of per-host pools to keep.
+            Defaults to 10
+          pool_maxsize (int, optional): Maximum number of connections kept
+            per host. Should be at least the number of threads sharing the
+            pool. Defaults to 10
+          pool_block (bool, optional): Block when every connection is in use
+            instead of opening a throwaway one. Defaults to False
+          keep_alive (bool, optional): Reuse connections between requests.
+            Defaults to True
+          max_retries (int, optional): Retries for failed connection
+            attempts. Defaults to 0
+          session (requests.session.Session, optional): requests Session
+            object to configure. Defaults to `None`
+          transport (str, optional): Transport backend, one of 'requests',
+            'urllib3' or 'httpx'. Defaults to 'requests'
+
+        Examples:
+          >>> pool = ConnectionPool(pool_maxsize=50, pool_block=True)
+          >>> conns = [Connection('db', pool=pool) for _ in range(50)]
+        """
+        if transport not in (None, "requests"):
+            if session is not None:
+                raise ValueError("session can only be used with the requests transport")
+            self.session = None
+            self.transport = transports.create(
+                transport,
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                keep_alive=keep_alive,
+            )
+            return
+
+        if session is None:
+            session = requests.Session()
+        elif not isinstance(session, requests.Session):
+            raise TypeError(
+                f"type(session) = {type(session)} must be a valid requests.Session object."
+            )
+
+        self.session = session
+        transports._configure(
+            self.session,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=keep_alive,
+            max_retries=max_retries,
+        )
+        self.transport = transports.RequestsTransport(self.session)
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 class Client(object):
@@ -18,8 +109,29 @@ class Client(object):
         password=None,
         session=None,
         auth=None,
+        pool=None,
+        pool_connections=None,
+        pool_maxsize=None,
+        pool_block=None,
+        keep_alive=None,
+        accept_encoding=None,
+        compress_uploads=False,
+        hedge=None,
+        transport=None,
+        hooks=None,
+        metadata_cache=None,
+        in_transaction=None,
     ):
+        # several endpoints make up a cluster that requests are routed across
+        if isinstance(endpoint, (list, tuple)):
+            endpoint = cluster.Cluster(endpoint)
+        self.cluster = endpoint if isinstance(endpoint, cluster.Cluster) else None
+        if self.cluster is not None:
+            endpoint = self.cluster.seeds[0]
+
         self.url = endpoint if endpoint else self.DEFAULT_ENDPOINT
+        self.endpoint = self.url
+        self.database_path = "/{}".format(database) if database else ""
 
         # XXX this might not be right when the auth object is used.  Ideally we could drop storing this
         # information with this object but it is used when a store procedure is made as the "creator"
@@ -28,7 +140,31 @@ class Client(object):
         if database:
             self.url = "{}/{}".format(self.url, database)
 
-        if session is None:
+        pool_options = {
+            "pool_connections": pool_connections,
+            "pool_maxsize": pool_maxsize,
+            "pool_block": pool_block,
+            "keep_alive": keep_alive,
+        }
+        pool_options = {k: v for k, v in pool_options.items() if v is not None}
+
+        if transport == "requests":
+            transport = None
+
+        # a shared pool belongs to whoever created it, so it is neither
+        # reconfigured nor closed here
+        self.pool = pool
+        if pool is not None:
+            if session is not None or transport is not None or pool_options:
+                raise ValueError(
+                    "pool cannot be combined with session, transport or pool settings"
+                )
+            self.session = pool.session
+        elif transport is not None:
+            if session is not None:
+                raise ValueError("session can only be used with the requests transport")
+            self.session = None
+        elif session is None:
             self.session = requests.Session()
         elif isinstance(session, requests.Session):
             # allows using e.g. proxy configuration defined explicitly
@@ -43,22 +179,298 @@ class Client(object):
             auth = requests.auth.HTTPBasicAuth(
                 self.username, password if password else self.DEFAULT_PASSWORD
             )
-        self.session.auth = auth
+
+        if pool is not None:
+            self.transport = pool.transport
+        elif isinstance(transport, str):
+            self.transport = transports.create(transport, **pool_options)
+        elif transport is not None:
+            if pool_options:
+                raise ValueError("transport instances are configured on creation")
+            self.transport = transport
+        else:
+            if pool_options:
+                transports._configure(self.session, **pool_options)
+            self.transport = transports.RequestsTransport(self.session)
+
+        # auth travels with each request since a shared session may serve
+        # clients with different credentials
+        self.auth = auth
+        if pool is None and self.session is not None:
+            self.session.auth = auth
+
+        # explicit negotiation of compressed responses, requests otherwise
+        # only asks for gzip and deflate
+        self.accept_encoding = (
+            compression.accept_encoding(accept_encoding) if accept_encoding else None
+        )
+        self.transfer_stats = compression.TransferStats()
+        self.compress_uploads = compress_uploads
+        self.hedge = hedge
+        self.hooks = list(hooks or [])
+        self.metadata_cache = metadata_cache
+        # tells whether the caller is in a transaction, whose requests all
+        # go to the coordinator
+        self.in_transaction = in_transaction
 
     def post(self, path, **kwargs):
-        return self.__wrap(self.session.post(self.url + path, **kwargs))
+        return self._request("POST", path, **kwargs)
 
     def put(self, path, **kwargs):
-        return self.__wrap(self.session.put(self.url + path, **kwargs))
+        return self._request("PUT", path, **kwargs)
 
     def get(self, path, **kwargs):
-        return self.__wrap(self.session.get(self.url + path, **kwargs))
+        return self._request("GET", path, **kwargs)
 
     def delete(self, path, **kwargs):
-        return self.__wrap(self.session.delete(self.url + path, **kwargs))
+        return self._request("DELETE", path, **kwargs)
 
     def close(self):
-        self.session.close()
+        if self.pool is None:
+            self.transport.close()
+
+    def _request(self, method, path, **kwargs):
+        if self.metadata_cache is None:
+            return self.__request(method, path, **kwargs)
+
+        if method == "GET":
+            kwargs.setdefault("auth", self.auth)
+            return self.metadata_cache.request(
+                self.url,
+                path,
+                lambda **kw: self.__request(method, path, **kw),
+                **kwargs,
+            )
+        try:
+            return self.__request(method, path, **kwargs)
+        finally:
+            self.metadata_cache.invalidate(method, path)
+
+    def __request(self, method, path, **kwargs):
+        kwargs.setdefault("auth", self.auth)
+        if self.accept_encoding:
+            headers = dict(kwargs.get("headers") or {})
+            headers.setdefault("Accept-Encoding", self.accept_encoding)
+            kwargs["headers"] = headers
+
+        event = None
+        if self.hooks:
+            event = instrumentation.RequestEvent(
+                method,
+                instrumentation.path_template(path, bool(self.database_path)),
+                self.url + path,
+                time.time(),
+            )
+            event.bytes_sent = _count(kwargs)
+        start = time.monotonic()
+        pinned = self.in_transaction is not None and self.in_transaction()
+
+        try:
+            if (
+                self.hedge is not None
+                and not pinned
+                and hedging.is_hedgeable(method, path)
+            ):
+                r = self.__hedged(method, path, **kwargs)
+            else:
+                r = self.__send(method, path, write=pinned, **kwargs)
+        except Exception as e:
+            if event is not None:
+                event.error = e
+                self.__emit(event, start)
+            raise
+
+        try:
+            r = self.__wrap(r)
+        except exceptions.StardogException as e:
+            if event is not None:
+                event.error = e
+                event.stardog_code = e.stardog_code
+                self.__emit(event, start, r, _wire_bytes(r, len(r.content)))
+            raise
+
+        if not kwargs.get("stream"):
+            received = self.__record(r, len(r.content))
+            if event is not None:
+                self.__emit(event, start, r, received)
+        elif event is not None:
+            # emitted by _iter_content once the body was read
+            r._stardog_event = (event, start)
+        return r
+
+    def __emit(self, event, start, response=None, received=0):
+        event.total = time.monotonic() - start
+        if response is not None:
+            event.url = response.url or event.url
+            event.status = response.status_code
+            event.ttfb = response.elapsed.total_seconds()
+            event.bytes_received = received
+            event.bytes_sent = _body_size(response.request, event.bytes_sent)
+        elif callable(event.bytes_sent):
+            event.bytes_sent = event.bytes_sent()
+
+        for hook in self.hooks:
+            hook(event)
+
+    def __send(self, method, path, exclude=(), picked=None, write=False, **kwargs):
+        if self.cluster is not None:
+            return self.__route(method, path, exclude, picked, write, **kwargs)
+
+        if picked is not None:
+            picked(self.endpoint)
+        return self.transport.request(method, self.url + path, **kwargs)
+
+    def __route(self, method, path, exclude=(), picked=None, write=False, **kwargs):
+        read = not write and cluster.is_read(method, path)
+        tried = []
+        while True:
+            node = self.cluster.acquire(
+                read, self.transport, self.auth, tried + list(exclude)
+            )
+            if picked is not None:
+                picked(node)
+            failed = False
+            try:
+                return self.transport.request(
+                    method, node + self.database_path + path, **kwargs
+                )
+            except requests.ConnectionError:
+                failed = True
+                tried.append(node)
+                # reads are safe to retry on another node
+                if not read or len(tried) >= len(self.cluster.nodes):
+                    raise
+            finally:
+                self.cluster.release(node, failed)
+
+    def __hedged(self, method, path, **kwargs):
+        # the original query is sent as is so that the server can still
+        # cache its plan and results; only the hedge is tagged with a
+        # comment, so that either one can be found among the running
+        # queries and killed
+        data = kwargs.get("data")
+        query = None
+        if isinstance(data, dict) and data.get("query"):
+            query = data["query"]
+            tag = "# pystardog-hedge {}".format(uuid.uuid4().hex)
+
+        def send(attempt, nodes):
+            attempt_kwargs = dict(kwargs)
+            if query and attempt:
+                attempt_kwargs["data"] = dict(data, query="{}\n{}".format(query, tag))
+            exclude = [node for a, node in nodes.items() if a != attempt]
+            return self.__send(
+                method,
+                path,
+                exclude,
+                lambda node: nodes.__setitem__(attempt, node),
+                **attempt_kwargs,
+            )
+
+        def kill(node, attempt):
+            if attempt:
+                self.__kill(node, lambda running: tag in running.get("query", ""))
+            else:
+                # only the original is killed, not a same query of others
+                self.__kill(node, lambda running: running.get("query") == query, True)
+
+        return self.hedge.run(send, kill if query else None)
+
+    def __kill(self, node, match, unique=False):
+        # best effort, the query may already be gone
+        try:
+            r = self.transport.request("GET", node + "/admin/queries", auth=self.auth)
+            database = self.database_path[1:]
+            queries = [
+                q
+                for q in r.json().get("queries", [])
+                if match(q) and q.get("db", database) == database
+            ]
+            if unique and len(queries) > 1:
+                return
+            for q in queries:
+                self.transport.request(
+                    "DELETE",
+                    "{}/admin/queries/{}".format(node, q["id"]),
+                    auth=self.auth,
+                )
+        except (requests.RequestException, ValueError):
+            pass
+
+    def _upload(self, content, data):
+        """Returns the request body and Content-Encoding to upload content.
+
+        Content that is not already encoded is gzip-compressed while it is
+        being sent when the client compresses uploads.
+        """
+        if self.compress_uploads and not content.content_encoding:
+            return compression.gzip_stream(data), "gzip"
+        return data, content.content_encoding
+
+    def _iter_content(self, response, chunk_size):
+        """Iterates over a streamed response body, decoding it on the fly."""
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                yield chunk
+        finally:
+            self.__finish(response, received)
+
+    def _iter_into(self, response, buffer, decode=True):
+        """Iterates over a streamed response body read into a reusable buffer.
+
+        Yields memoryviews of `buffer`, only valid until the next one is
+        read. gzip bodies are inflated into new bytes when decoding, and
+        bodies that cannot be read into a buffer, or that use other codings,
+        fall back to :meth:`_iter_content`.
+        """
+        readinto = getattr(response.raw, "readinto", None)
+        encoding = response.headers.get("Content-Encoding", "identity").lower()
+        if readinto is None or decode and encoding not in ("identity", "gzip"):
+            yield from self._iter_content(response, len(buffer))
+            return
+
+        inflater = None
+        if decode and encoding == "gzip":
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        view = memoryview(buffer)
+        received = decoded = 0
+        try:
+            while True:
+                size = readinto(view)
+                if not size:
+                    break
+                received += size
+                if inflater is None:
+                    yield view[:size]
+                    continue
+                chunk = inflater.decompress(view[:size])
+                decoded += len(chunk)
+                if chunk:
+                    yield chunk
+            if inflater is not None:
+                chunk = inflater.flush()
+                decoded += len(chunk)
+                if chunk:
+                    yield chunk
+        finally:
+            self.__finish(response, decoded if inflater else received)
+
+    def __finish(self, response, decompressed):
+        compressed = self.__record(response, decompressed)
+        pending = getattr(response, "_stardog_event", None)
+        if pending is not None:
+            del response._stardog_event
+            self.__emit(pending[0], pending[1], response, compressed)
+
+    def __record(self, response, decompressed):
+        compressed = _wire_bytes(response, decompressed)
+        self.transfer_stats.record(
+            compressed, decompressed, response.headers.get("Content-Encoding")
+        )
+        return compressed
 
     def __wrap(self, request):
         if not request.ok:
@@ -78,6 +490,76 @@ class Client(object):
 
         return request
 
+    def _multipart_stream(self, parts):
+        """Encodes a multipart/form-data body without buffering it.
+
+        Args:
+          parts (list[tuple]): (name, filename, data, content_type, headers)
+            tuples, where data is str, bytes, a file or an iterable of bytes
+
+        Returns:
+          tuple: The Content-Type header and a generator of body chunks
+        """
+        boundary = uuid.uuid4().hex
+
+        def _body():
+            for name, filename, data, content_type, headers in parts:
+                disposition = 'form-data; name="{}"'.format(name)
+                if filename:
+                    disposition += '; filename="{}"'.format(filename)
+
+                lines = ["--" + boundary, "Content-Disposition: " + disposition]
+                if content_type:
+                    lines.append("Content-Type: " + content_type)
+                for header, value in (headers or {}).items():
+                    if value:
+                        lines.append("{}: {}".format(header, value))
+
+                yield ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+                for chunk in compression.iter_chunks(data):
+                    yield chunk
+                yield b"\r\n"
+
+            yield "--{}--\r\n".format(boundary).encode("utf-8")
+
+        return "multipart/form-data; boundary={}".format(boundary), _body()
+
     def _multipart(self, response):
         decoder = multipart.decoder.MultipartDecoder.from_response(response)
         return [part.content for part in decoder.parts]
+
+
+def _wire_bytes(response, decompressed):
+    tell = getattr(response.raw, "tell", None)
+    return tell() if tell else decompressed
+
+
+def _count(kwargs):
+    """Counts the bytes of a streamed request body as they are sent.
+
+    Returns a callable giving the count so far.
+    """
+    data = kwargs.get("data")
+    counter = [0]
+    if hasattr(data, "__next__") and not hasattr(data, "read"):
+
+        def counted():
+            for chunk in data:
+                counter[0] += len(chunk)
+                yield chunk
+
+        kwargs["data"] = counted()
+    return lambda: counter[0]
+
+
+def _body_size(request, counted):
+    body = getattr(request, "body", None)
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+
+    length = request.headers.get("Content-Length")
+    return int(length) if length is not None else counted()
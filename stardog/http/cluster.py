@@ -0,0 +1,181 @@
+"""Client-side routing across the nodes of a Stardog cluster.
+"""
+
+import itertools
+import threading
+import time
+import urllib.parse
+
+import requests
+
+# requests to these database paths never modify data and may go to any node
+_READ_PATHS = ("/query", "/explain")
+
+
+def is_read(method, path):
+    """Whether a request can be served by any cluster node.
+
+    Transactions and writes must reach the coordinator, while GETs and
+    queries outside of a transaction can be spread across the cluster.
+
+    Args:
+      method (str): HTTP method
+      path (str): Request path relative to the database url
+
+    Returns:
+      bool: True for read-only requests
+    """
+    if "/transaction" in path:
+        return False
+    return method == "GET" or (method == "POST" and path in _READ_PATHS)
+
+
+class Cluster(object):
+    """Stardog cluster endpoints.
+
+    Sends transactional and write requests to the coordinator and spreads
+    reads across every node, picking the one with the fewest requests in
+    flight. Membership and the coordinator are discovered from the first
+    reachable endpoint with ``GET /admin/cluster`` on first use, replacing a
+    load balancer in front of the cluster.
+
+    A Cluster can be shared between connections so they share the same view
+    of the cluster and of the load on each node.
+    """
+
+    def __init__(self, endpoints, discover=True, retry_after=30):
+        """Initializes a cluster.
+
+        Args:
+          endpoints (list[str]): Urls of one or more cluster nodes
+          discover (bool, optional): Discover the remaining nodes and the
+            coordinator from the server. Defaults to True
+          retry_after (int, optional): Seconds during which a node that
+            refused a connection is skipped. Defaults to 30
+
+        Examples:
+          >>> cluster = Cluster(['http://sd1:5820', 'http://sd2:5820'])
+          >>> conn = Connection('db', endpoint=cluster)
+        """
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+
+        self.seeds = [e.rstrip("/") for e in endpoints]
+        self.nodes = list(self.seeds)
+        self.coordinator = None
+        self.discover = discover
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._discovered = not discover
+        self._outstanding = {}
+        self._down = {}
+        self._turn = itertools.count()
+
+    def refresh(self, session, auth=None):
+        """Discovers the cluster nodes and the current coordinator.
+
+        Args:
+          session (stardog.http.transports.Transport): Transport, or requests
+            Session, to query the server with
+          auth (requests.auth.AuthBase, optional): Authentication object
+        """
+        for seed in self.seeds + self.nodes:
+            try:
+                r = session.request("GET", seed + "/admin/cluster", auth=auth)
+            except requests.RequestException:
+                continue
+            if r.ok:
+                break
+        else:
+            # not a cluster, or no node reachable: keep what we were given
+            with self._lock:
+                self._discovered = True
+            return
+
+        info = r.json()
+        scheme = urllib.parse.urlsplit(seed).scheme or "http"
+        nodes = [self.__url(scheme, n) for n in info.get("nodes", [])]
+        coordinator = info.get("coordinator")
+        coordinator = self.__url(scheme, coordinator) if coordinator else None
+
+        if coordinator is None:
+            for node in nodes:
+                try:
+                    check = session.request(
+                        "GET", node + "/admin/cluster/coordinator", auth=auth
+                    )
+                except requests.RequestException:
+                    continue
+                if check.status_code == 200:
+                    coordinator = node
+                    break
+
+        with self._lock:
+            if nodes:
+                self.nodes = nodes
+            self.coordinator = coordinator
+            self._discovered = True
+
+    def acquire(self, read, session=None, auth=None, exclude=()):
+        """Picks the node a request should be sent to.
+
+        Every acquired node must be given back with :meth:`release`.
+
+        Args:
+          read (bool): Whether the request is read-only
+          session (stardog.http.transports.Transport, optional): Transport,
+            or requests Session, used to discover the cluster on first use
+          auth (requests.auth.AuthBase, optional): Authentication object
+          exclude (list[str], optional): Nodes to avoid if possible
+
+        Returns:
+          str: Base url of the node
+        """
+        if not self._discovered and session is not None:
+            self.refresh(session, auth)
+
+        with self._lock:
+            if read:
+                node = self.__least_outstanding(exclude)
+            else:
+                node = self.coordinator or self.nodes[0]
+            self._outstanding[node] = self._outstanding.get(node, 0) + 1
+            return node
+
+    def release(self, node, failed=False):
+        """Gives back a node picked by :meth:`acquire`.
+
+        Args:
+          node (str): The node
+          failed (bool, optional): The node could not be reached. It is
+            skipped for `retry_after` seconds and the coordinator is
+            rediscovered on next use
+        """
+        with self._lock:
+            self._outstanding[node] -= 1
+            if failed:
+                self._down[node] = time.monotonic() + self.retry_after
+                self._discovered = not self.discover
+
+    def __least_outstanding(self, exclude):
+        now = time.monotonic()
+        candidates = (
+            [n for n in self.nodes if n not in exclude and self._down.get(n, 0) <= now]
+            or [n for n in self.nodes if n not in exclude]
+            or self.nodes
+        )
+
+        # rotate so that ties are broken round-robin
+        start = next(self._turn) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        return min(candidates, key=lambda n: self._outstanding.get(n, 0))
+
+    @staticmethod
+    def __url(scheme, address):
+        return address if "://" in address else "{}://{}".format(scheme, address)
+
+    def __repr__(self):
+        return "Cluster({})".format(self.nodes)
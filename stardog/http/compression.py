@@ -0,0 +1,148 @@
+"""HTTP compression support.
+"""
+
+import threading
+import zlib
+
+import urllib3.util.request
+
+
+def available_encodings():
+    """Content codings the HTTP stack can decode, preferred first.
+
+    gzip and deflate are always available; zstd and br are added when the
+    `zstandard` or `brotli` packages are installed.
+
+    Returns:
+      list[str]: Content coding names
+    """
+    supported = urllib3.util.request.ACCEPT_ENCODING.split(",")
+    preferred = ["zstd", "br", "gzip", "deflate"]
+    return [e for e in preferred if e in supported]
+
+
+def accept_encoding(encodings):
+    """Builds an Accept-Encoding header value.
+
+    Args:
+      encodings (bool, str or list[str]): True for every available coding,
+        or the codings to ask for, preferred first
+
+    Returns:
+      str: Header value
+
+    Raises:
+      ValueError: If a coding cannot be decoded locally
+    """
+    if encodings is True:
+        return ", ".join(available_encodings())
+
+    if isinstance(encodings, str):
+        encodings = [e.strip() for e in encodings.split(",")]
+
+    unsupported = set(encodings) - set(available_encodings()) - {"identity"}
+    if unsupported:
+        raise ValueError(
+            "Cannot decode content codings: {}".format(", ".join(sorted(unsupported)))
+        )
+
+    return ", ".join(encodings)
+
+
+def gzip_stream(data, chunk_size=65536, level=6):
+    """Compresses data with gzip as it is read.
+
+    Only one chunk of the input is held in memory at a time, so it can be
+    used as a streaming request body.
+
+    Args:
+      data (str, bytes, file-like or iterable of bytes): Data to compress
+      chunk_size (int, optional): Bytes to read from file-like data at a
+        time. Defaults to 65536
+      level (int, optional): zlib compression level. Defaults to 6
+
+    Returns:
+      gen: Compressed chunks
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in iter_chunks(data, chunk_size):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_chunks(data, chunk_size=65536):
+    """Iterates over str, bytes, file-like or iterable data as bytes chunks.
+
+    Args:
+      data (str, bytes, file-like or iterable of bytes): Data to read
+      chunk_size (int, optional): Bytes to read from file-like data at a
+        time. Defaults to 65536
+
+    Returns:
+      gen: Chunks of bytes
+    """
+    if isinstance(data, str):
+        yield data.encode("utf-8")
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        yield bytes(data)
+    elif hasattr(data, "read"):
+        while True:
+            chunk = data.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+    else:
+        for chunk in data:
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+class TransferStats(object):
+    """Counters for bytes received on the wire versus bytes decoded.
+
+    Updated by :class:`stardog.http.client.Client` for every response whose
+    body it reads, including streamed ones once they are exhausted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.compressed_responses = 0
+        self.compressed_bytes = 0
+        self.decompressed_bytes = 0
+
+    def record(self, compressed, decompressed, encoding=None):
+        """Adds a response body to the counters.
+
+        Args:
+          compressed (int): Bytes received on the wire
+          decompressed (int): Bytes after decoding
+          encoding (str, optional): Content-Encoding of the response
+        """
+        with self._lock:
+            self.responses += 1
+            if encoding and encoding != "identity":
+                self.compressed_responses += 1
+            self.compressed_bytes += compressed
+            self.decompressed_bytes += decompressed
+
+    @property
+    def ratio(self):
+        """float: Decompressed over compressed bytes, 1.0 if nothing was read."""
+        if not self.compressed_bytes:
+            return 1.0
+        return self.decompressed_bytes / self.compressed_bytes
+
+    def reset(self):
+        """Sets every counter back to zero."""
+        with self._lock:
+            self.responses = 0
+            self.compressed_responses = 0
+            self.compressed_bytes = 0
+            self.decompressed_bytes = 0
+
+    def __repr__(self):
+        return "TransferStats(compressed_bytes={}, decompressed_bytes={})".format(
+            self.compressed_bytes, self.decompressed_bytes
+        )
@@ -0,0 +1,181 @@
+"""Hedged requests to cut tail latency of reads.
+"""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+from . import cluster
+
+# database paths behind select/ask/graph/paths, size and export
+_HEDGED_PATHS = ("/query", "/size", "/export")
+
+
+def is_hedgeable(method, path):
+    """Whether a request is an idempotent read that may be sent twice.
+
+    Args:
+      method (str): HTTP method
+      path (str): Request path relative to the database url
+
+    Returns:
+      bool: True if the request can be hedged
+    """
+    return cluster.is_read(method, path) and path in _HEDGED_PATHS
+
+
+class HedgePolicy(object):
+    """Hedging policy for read requests.
+
+    When a read has not completed after a delay, a duplicate is sent to
+    another cluster node (or the same endpoint) and the first response wins.
+    By default the delay follows a percentile of recently observed latencies,
+    so only the slowest requests are duplicated. The query of the losing
+    request is killed on the server when it can be identified.
+    """
+
+    def __init__(
+        self,
+        delay=None,
+        percentile=95,
+        initial_delay=0.05,
+        min_delay=0.005,
+        window=1000,
+        kill_losers=True,
+        max_workers=32,
+    ):
+        """Initializes a hedging policy.
+
+        Args:
+          delay (float, optional): Fixed delay in seconds before hedging.
+            Defaults to `None`, following `percentile` instead
+          percentile (float, optional): Percentile of recent latencies after
+            which a request is hedged. Defaults to 95
+          initial_delay (float, optional): Delay in seconds used until enough
+            latencies were observed. Defaults to 0.05
+          min_delay (float, optional): Lower bound of the delay in seconds.
+            Defaults to 0.005
+          window (int, optional): Number of recent latencies to keep.
+            Defaults to 1000
+          kill_losers (bool, optional): Kill the query of the losing request
+            on the server. Defaults to True
+          max_workers (int, optional): Maximum number of requests in flight
+            through this policy. Defaults to 32
+
+        Examples:
+          >>> conn = Connection('db', endpoint=['http://sd1:5820',
+                                                'http://sd2:5820'],
+                                hedge=HedgePolicy(percentile=99))
+        """
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.kill_losers = kill_losers
+        self.max_workers = max_workers
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedges_won = 0
+
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def delay(self):
+        """Seconds to wait for a response before hedging.
+
+        Returns:
+          float: The delay
+        """
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if len(latencies) < 20:
+            return self.initial_delay
+
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[index])
+
+    def record(self, latency):
+        """Adds an observed latency.
+
+        Args:
+          latency (float): Seconds taken by a request
+        """
+        with self._lock:
+            self._latencies.append(latency)
+
+    def run(self, send, kill=None):
+        """Runs a request, hedging it if it is slow.
+
+        Args:
+          send (callable): Called with the attempt number and a dict in which
+            it stores the node it picked by attempt. Returns the response
+          kill (callable, optional): Called in the background with the node
+            and attempt number of the losing request
+
+        Returns:
+          requests.Response: The first successful response
+        """
+        executor = self.__executor()
+        nodes = {}
+        start = time.monotonic()
+
+        with self._lock:
+            self.requests += 1
+
+        pending = {executor.submit(send, 0, nodes): 0}
+        done, _ = concurrent.futures.wait(pending, timeout=self.delay())
+        if not done:
+            with self._lock:
+                self.hedged += 1
+            pending[executor.submit(send, 1, nodes)] = 1
+
+        error = None
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+
+                self.record(time.monotonic() - start)
+                if attempt:
+                    with self._lock:
+                        self.hedges_won += 1
+
+                for loser, lost in pending.items():
+                    loser.add_done_callback(_close)
+                    if kill is not None and self.kill_losers:
+                        executor.submit(kill, nodes.get(lost), lost)
+                return response
+
+        raise error
+
+    def close(self):
+        """Stops the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def __executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="stardog-hedge"
+                )
+            return self._executor
+
+
+def _close(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
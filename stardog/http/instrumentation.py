@@ -0,0 +1,315 @@
+"""Per-request timing events and ready-made hooks to collect them.
+
+A hook is any callable taking a :class:`RequestEvent`. Hooks given to a
+:class:`stardog.http.client.Client` (through the `hooks` argument of
+Connection and Admin) are called once for every request, after its body was
+read. For streamed responses that happens when the stream is exhausted or
+closed.
+"""
+
+import bisect
+import re
+import threading
+
+_TXID = re.compile(r"/[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}(?=/|$)")
+
+# resources addressed by name, e.g. /admin/users/{name}/roles
+_NAMED = re.compile(
+    r"^(?:/admin/(?:databases|users|roles|virtual_graphs|data_sources"
+    r"|queries(?:/stored)?|permissions/(?:role|user)|cache(?:/target|/refresh)?)"
+    r"|/\{db\}/(?:docs|graphql/schemas))/(?P<name>[^/]+)"
+)
+
+# fixed sub-resources that sit where a name could be
+_LITERALS = {
+    "valid",
+    "backup_all",
+    "list",
+    "import",
+    "import_db",
+    "stored",
+    "graphs",
+    "queries",
+    "status",
+    "target",
+    "refresh",
+    "size",
+}
+
+
+def path_template(path, database=False):
+    """Replaces database names, transaction ids and resource names in a path.
+
+    Args:
+      path (str): Request path
+      database (bool, optional): The path is relative to a database url.
+        Defaults to False
+
+    Returns:
+      str: The path template, e.g. `/{db}/{txid}/add`
+
+    Examples:
+      >>> path_template('/admin/users/frodo/roles')
+      '/admin/users/{name}/roles'
+    """
+    path = path.split("?", 1)[0]
+    if database:
+        path = "/{db}" + path
+    elif not path.startswith("/admin/") and path.count("/") > 1:
+        path = "/{db}" + path[path.index("/", 1) :]
+
+    path = _TXID.sub("/{txid}", path)
+
+    match = _NAMED.match(path)
+    if match and match.group("name") not in _LITERALS:
+        path = path[: match.start("name")] + "{name}" + path[match.end("name") :]
+    return path
+
+
+class RequestEvent(object):
+    """Timings and sizes of a single request.
+
+    Attributes:
+      method (str): HTTP method
+      path (str): Path template, e.g. `/{db}/query`
+      url (str): Full url the request was sent to
+      start (float): Wall clock time the request started at, in seconds
+        since the epoch
+      ttfb (float): Seconds until the response headers were received, or
+        `None` if no response was received
+      total (float): Seconds until the response body was read
+      bytes_sent (int): Size of the request body, `None` if unknown
+      bytes_received (int): Bytes of response body received on the wire
+      status (int): HTTP status code, `None` if no response was received
+      stardog_code (str): Stardog error code of a failed request
+      error (Exception): Exception raised by the request, if any
+    """
+
+    def __init__(self, method, path, url, start):
+        self.method = method
+        self.path = path
+        self.url = url
+        self.start = start
+        self.ttfb = None
+        self.total = None
+        self.bytes_sent = None
+        self.bytes_received = 0
+        self.status = None
+        self.stardog_code = None
+        self.error = None
+
+    def __repr__(self):
+        return "RequestEvent({} {} status={} total={:.4f})".format(
+            self.method, self.path, self.status, self.total or 0
+        )
+
+
+class Histogram(object):
+    """Cumulative bucket histogram of observed values."""
+
+    DEFAULT_BOUNDS = (
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    )
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        """Initializes a histogram.
+
+        Args:
+          bounds (list[float], optional): Sorted upper bounds of the buckets.
+            Defaults to 1ms to 10s
+        """
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Adds a value.
+
+        Args:
+          value (float): The value
+        """
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile):
+        """Estimates a percentile from the buckets.
+
+        Args:
+          percentile (float): Percentile between 0 and 100
+
+        Returns:
+          float: Upper bound of the bucket holding the percentile, or the
+            largest observed value for the last bucket. 0 if empty
+        """
+        if not self.count:
+            return 0.0
+
+        rank = self.count * percentile / 100
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        """float: Mean of the observed values, 0 if empty."""
+        return self.sum / self.count if self.count else 0.0
+
+    def copy(self):
+        """Copies the histogram.
+
+        Returns:
+          Histogram: A histogram with the same observations
+        """
+        copy = Histogram(self.bounds)
+        copy.buckets = list(self.buckets)
+        copy.count = self.count
+        copy.sum = self.sum
+        copy.max = self.max
+        return copy
+
+    def __repr__(self):
+        return "Histogram(count={}, mean={:.4f}, p99={:.4f})".format(
+            self.count, self.mean, self.percentile(99)
+        )
+
+
+class HistogramHook(object):
+    """Aggregates request timings into in-process histograms.
+
+    Events are grouped by method and path template, so e.g. every query
+    against any database ends up in ``('POST', '/{db}/query')``.
+
+    Examples:
+      >>> hook = HistogramHook()
+      >>> conn = Connection('db', hooks=[hook])
+      >>> conn.select('select * {?s ?p ?o}')
+      >>> hook.stats()[('POST', '/{db}/query')]['total'].percentile(99)
+    """
+
+    def __init__(self, bounds=Histogram.DEFAULT_BOUNDS):
+        """Initializes a histogram hook.
+
+        Args:
+          bounds (list[float], optional): Upper bounds in seconds of the
+            histogram buckets. Defaults to 1ms to 10s
+        """
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __call__(self, event):
+        with self._lock:
+            stats = self._stats.get((event.method, event.path))
+            if stats is None:
+                stats = self._stats[(event.method, event.path)] = {
+                    "ttfb": Histogram(self.bounds),
+                    "total": Histogram(self.bounds),
+                    "errors": 0,
+                    "bytes_sent": 0,
+                    "bytes_received": 0,
+                }
+
+            if event.ttfb is not None:
+                stats["ttfb"].observe(event.ttfb)
+            stats["total"].observe(event.total)
+            if event.error is not None:
+                stats["errors"] += 1
+            stats["bytes_sent"] += event.bytes_sent or 0
+            stats["bytes_received"] += event.bytes_received
+
+    def stats(self):
+        """Statistics collected so far.
+
+        Returns:
+          dict: Maps (method, path template) to a dict with `ttfb` and `total`
+            histograms, the number of `errors`, and the `bytes_sent` and
+            `bytes_received` totals. A copy taken at once, which requests
+            sent afterwards leave unchanged
+        """
+        with self._lock:
+            return {
+                key: dict(value, ttfb=value["ttfb"].copy(), total=value["total"].copy())
+                for key, value in self._stats.items()
+            }
+
+    def reset(self):
+        """Drops everything collected so far."""
+        with self._lock:
+            self._stats = {}
+
+
+class OpenTelemetryHook(object):
+    """Emits an OpenTelemetry client span for every request.
+
+    Spans are children of the span current when the request completes.
+    Requires the `opentelemetry-api` package.
+
+    Examples:
+      >>> conn = Connection('db', hooks=[OpenTelemetryHook()])
+    """
+
+    def __init__(self, tracer=None):
+        """Initializes an OpenTelemetry hook.
+
+        Args:
+          tracer (opentelemetry.trace.Tracer, optional): Tracer creating the
+            spans. Defaults to the `pystardog` tracer of the global provider
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError:  # pragma: no cover - optional dependency
+            raise ImportError(
+                "OpenTelemetryHook requires opentelemetry-api, install it with "
+                "`pip install opentelemetry-api`"
+            )
+
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("pystardog")
+
+    def __call__(self, event):
+        start = int(event.start * 1e9)
+        span = self.tracer.start_span(
+            "{} {}".format(event.method, event.path),
+            kind=self._trace.SpanKind.CLIENT,
+            start_time=start,
+            attributes={
+                "http.request.method": event.method,
+                "url.full": event.url,
+                "url.template": event.path,
+            },
+        )
+
+        if event.status is not None:
+            span.set_attribute("http.response.status_code", event.status)
+        if event.bytes_sent is not None:
+            span.set_attribute("http.request.body.size", event.bytes_sent)
+        span.set_attribute("http.response.body.size", event.bytes_received)
+        if event.ttfb is not None:
+            span.add_event("first_byte", timestamp=start + int(event.ttfb * 1e9))
+
+        if event.stardog_code:
+            span.set_attribute("stardog.error_code", event.stardog_code)
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+
+        span.end(end_time=start + int(event.total * 1e9))
@@ -0,0 +1,341 @@
+"""HTTP transports used by :class:`stardog.http.client.Client`.
+
+A transport sends one request and returns a ``requests.Response``, and
+raises the ``requests`` exceptions for connection errors and timeouts, so
+the rest of the library works the same whichever transport is in use. Requests
+are always encoded by ``requests`` (query parameters, form data, multipart
+files and authentication), only the way they are sent changes.
+"""
+
+import contextlib
+import datetime
+import importlib.util
+import time
+
+import requests
+import requests.adapters
+import requests.structures
+import requests.utils
+import urllib3
+
+
+class Transport(object):
+    """Transport base class."""
+
+    def request(self, method, url, **kwargs):
+        """Sends a request.
+
+        Args:
+          method (str): HTTP method
+          url (str): Full url of the request
+          **kwargs: Arguments accepted by ``requests.Session.request``
+
+        Returns:
+          requests.Response: The response
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """Closes all pooled connections."""
+        pass
+
+
+class RequestsTransport(Transport):
+    """Transport backed by a ``requests.Session``. This is the default."""
+
+    def __init__(self, session=None):
+        """Initializes a requests transport.
+
+        Args:
+          session (requests.session.Session, optional): requests Session
+            object. Defaults to a new session
+        """
+        self.session = session if session is not None else requests.Session()
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """Transport sending requests straight through a ``urllib3.PoolManager``.
+
+    Skips the adapter, cookie and redirect machinery of ``requests.Session``.
+    Session level settings such as proxies are not applied.
+    """
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        keep_alive=True,
+        manager=None,
+    ):
+        """Initializes a urllib3 transport.
+
+        Args:
+          pool_connections (int, optional): Number of per-host pools to keep.
+            Defaults to 10
+          pool_maxsize (int, optional): Maximum number of connections kept
+            per host. Defaults to 10
+          pool_block (bool, optional): Block when every connection is in use.
+            Defaults to False
+          keep_alive (bool, optional): Reuse connections between requests.
+            Defaults to True
+          manager (urllib3.PoolManager, optional): Pool manager to use instead
+            of creating one
+        """
+        self.manager = manager or urllib3.PoolManager(
+            num_pools=pool_connections, maxsize=pool_maxsize, block=pool_block
+        )
+        self.headers = requests.utils.default_headers()
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+
+    def request(self, method, url, stream=False, **kwargs):
+        prepared = _prepare(method, url, self.headers, **kwargs)
+        body = prepared.body
+
+        start = time.monotonic()
+        try:
+            raw = self.manager.urlopen(
+                method,
+                prepared.url,
+                body=body,
+                headers=dict(prepared.headers),
+                chunked=_is_stream(body),
+                redirect=False,
+                retries=False,
+                preload_content=False,
+                decode_content=False,
+            )
+            return _response(
+                prepared, raw, raw.status, raw.reason, raw.headers, start, stream
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise _urllib3_error(e)(e, request=prepared) from e
+
+    def close(self):
+        self.manager.clear()
+
+
+class HttpxTransport(Transport):
+    """Transport backed by an ``httpx.Client``, optionally over HTTP/2.
+
+    HTTP/2 multiplexes concurrent requests over a single connection per
+    host. It requires the `h2` package (``pip install pystardog[http2]``).
+    """
+
+    def __init__(self, http2=None, pool_maxsize=100, keep_alive=True, client=None):
+        """Initializes an httpx transport.
+
+        Args:
+          http2 (bool, optional): Negotiate HTTP/2. Defaults to `None`,
+            negotiating it when the `h2` package is installed and using
+            HTTP/1.1 otherwise
+          pool_maxsize (int, optional): Maximum number of connections.
+            Defaults to 100
+          keep_alive (bool, optional): Reuse connections between requests.
+            Defaults to True
+          client (httpx.Client, optional): httpx Client to use instead of
+            creating one
+        """
+        try:
+            import httpx
+        except ImportError:  # pragma: no cover - optional dependency
+            raise ImportError(
+                "HttpxTransport requires httpx, install it with `pip install pystardog[http2]`"
+            )
+
+        if http2 is None:
+            http2 = importlib.util.find_spec("h2") is not None
+
+        self.client = client or httpx.Client(
+            http2=http2,
+            timeout=None,
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize if keep_alive else 0,
+            ),
+        )
+        self.headers = requests.utils.default_headers()
+
+    def request(self, method, url, stream=False, **kwargs):
+        prepared = _prepare(method, url, self.headers, **kwargs)
+        body = prepared.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        elif hasattr(body, "read"):
+            body = iter(lambda: body.read(65536), b"")
+
+        start = time.monotonic()
+        request = self.client.build_request(
+            method, prepared.url, headers=dict(prepared.headers), content=body
+        )
+        with _httpx_errors(prepared):
+            r = self.client.send(request, stream=True)
+            return _response(
+                prepared,
+                _HttpxRaw(r, prepared),
+                r.status_code,
+                r.reason_phrase,
+                r.headers,
+                start,
+                stream,
+            )
+
+    def close(self):
+        self.client.close()
+
+
+_TRANSPORTS = ("requests", "urllib3", "httpx")
+
+
+def create(name, **options):
+    """Creates a transport by name.
+
+    Args:
+      name (str): One of 'requests', 'urllib3' or 'httpx'
+      **options: Pool settings (pool_connections, pool_maxsize, pool_block,
+        keep_alive) passed on to the transport
+
+    Returns:
+      Transport: The transport
+    """
+    if name not in _TRANSPORTS:
+        raise ValueError(
+            "Unknown transport {}, expected one of {}".format(
+                name, ", ".join(sorted(_TRANSPORTS))
+            )
+        )
+    if name == "requests":
+        session = requests.Session()
+        _configure(session, **options)
+        return RequestsTransport(session)
+    if name == "urllib3":
+        return Urllib3Transport(**options)
+
+    options.pop("pool_connections", None)
+    options.pop("pool_block", None)
+    return HttpxTransport(**options)
+
+
+def _configure(
+    session,
+    pool_connections=10,
+    pool_maxsize=10,
+    pool_block=False,
+    keep_alive=True,
+    max_retries=0,
+):
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=max_retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+
+
+def _prepare(method, url, default_headers, headers=None, auth=None, **kwargs):
+    # requests drops headers set to None, and so do we
+    merged = requests.structures.CaseInsensitiveDict(default_headers)
+    for name, value in (headers or {}).items():
+        if value is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = value
+
+    return requests.Request(method, url, headers=merged, auth=auth, **kwargs).prepare()
+
+
+def _is_stream(body):
+    return (
+        body is not None
+        and not isinstance(body, (bytes, bytearray, str))
+        and not hasattr(body, "read")
+    )
+
+
+def _response(prepared, raw, status, reason, headers, start, stream):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason
+    response.headers = requests.structures.CaseInsensitiveDict(headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.raw = raw
+    response.url = prepared.url
+    response.request = prepared
+    response.elapsed = datetime.timedelta(seconds=time.monotonic() - start)
+
+    if not stream:
+        # reads the whole body and hands the connection back to the pool
+        response.content
+        response.close()
+
+    return response
+
+
+def _urllib3_error(error):
+    """The requests exception type matching a urllib3 error."""
+    if isinstance(error, urllib3.exceptions.MaxRetryError) and error.reason:
+        error = error.reason
+    # refused connections are connect timeouts to urllib3
+    if isinstance(error, urllib3.exceptions.NewConnectionError):
+        return requests.exceptions.ConnectionError
+    if isinstance(error, urllib3.exceptions.ConnectTimeoutError):
+        return requests.exceptions.ConnectTimeout
+    if isinstance(error, urllib3.exceptions.ReadTimeoutError):
+        return requests.exceptions.ReadTimeout
+    if isinstance(error, urllib3.exceptions.SSLError):
+        return requests.exceptions.SSLError
+    return requests.exceptions.ConnectionError
+
+
+@contextlib.contextmanager
+def _httpx_errors(prepared):
+    """Raises the requests exceptions matching httpx errors."""
+    import httpx
+
+    try:
+        yield
+    except httpx.ConnectTimeout as e:
+        raise requests.exceptions.ConnectTimeout(e, request=prepared) from e
+    except httpx.ReadTimeout as e:
+        raise requests.exceptions.ReadTimeout(e, request=prepared) from e
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(e, request=prepared) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(e, request=prepared) from e
+
+
+class _HttpxRaw(object):
+    """The parts of a urllib3 response requests reads a body through."""
+
+    def __init__(self, response, prepared=None):
+        self.response = response
+        self.prepared = prepared
+
+    def stream(self, chunk_size, decode_content=True):
+        if decode_content:
+            chunks = self.response.iter_bytes(chunk_size)
+        else:
+            chunks = self.response.iter_raw(chunk_size)
+        with _httpx_errors(self.prepared):
+            yield from chunks
+
+    def read(self, amt=None, decode_content=True):
+        return b"".join(self.stream(amt, decode_content))
+
+    def tell(self):
+        return self.response.num_bytes_downloaded
+
+    def close(self):
+        self.response.close()
@@ -0,0 +1,183 @@
+"""Parse N-Triples and N-Quads while they are received.
+"""
+
+import re
+
+from . import terms as terms
+
+_TERM = re.compile(
+    r"[ \t]*(?:"
+    r"(<<)"
+    r"|<([^>]*)>"
+    r"|_:([^\s.<>\"]+(?:\.+[^\s.<>\"]+)*)"
+    r'|"((?:[^"\\]|\\.)*)"(?:@([a-zA-Z]+(?:-[a-zA-Z0-9]+)*)|\^\^<([^>]*)>)?'
+    r")"
+)
+_END_TRIPLE = re.compile(r"[ \t]*>>")
+_END = re.compile(r"[ \t]*\.[ \t]*(?:#.*)?$")
+
+_ESCAPE = re.compile(r"\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))")
+_ESCAPES = {
+    "t": "\t",
+    "b": "\b",
+    "n": "\n",
+    "r": "\r",
+    "f": "\f",
+    '"': '"',
+    "'": "'",
+    "\\": "\\",
+}
+
+
+def _unescape_match(match):
+    code = match.group(1) or match.group(2)
+    if code:
+        return chr(int(code, 16))
+    char = match.group(3)
+    if char not in _ESCAPES:
+        raise ValueError("invalid escape \\{}".format(char))
+    return _ESCAPES[char]
+
+
+def _unescape(value):
+    return _ESCAPE.sub(_unescape_match, value) if "\\" in value else value
+
+
+class _Terms(object):
+    # creates new terms, holding on to none of them
+    iri = staticmethod(terms.IRI)
+    bnode = staticmethod(terms.BNode)
+    literal = staticmethod(terms.Literal)
+
+
+class Parser(object):
+    """Parses N-Triples and N-Quads lines into terms.
+
+    Quoted triples of RDF-star (``<< s p o >>``) are supported.
+    """
+
+    def __init__(self, quads=False, factory=None):
+        """Initializes a parser.
+
+        Args:
+          quads (bool, optional): Parse N-Quads. Defaults to False
+          factory (stardog.terms.TermFactory, optional): Creates the terms,
+            sharing one object per distinct IRI and blank node. Defaults to
+            `None`, creating new terms so that memory use stays constant
+        """
+        self.quads = quads
+        self.factory = factory or _Terms()
+
+    def parse_line(self, line):
+        """Parses a single line.
+
+        Args:
+          line (str): The line, without the line break
+
+        Returns:
+          tuple: ``(s, p, o)``, or ``(s, p, o, g)`` for N-Quads with `None`
+            for the default graph. `None` for blank and comment lines
+
+        Raises:
+          ValueError: If the line is not a valid statement
+        """
+        stripped = line.strip()
+        if not stripped or stripped[0] == "#":
+            return None
+
+        s, pos = self.__term(line, 0)
+        p, pos = self.__term(line, pos)
+        o, pos = self.__term(line, pos)
+        if not self.quads:
+            statement = (s, p, o)
+        else:
+            g = None
+            if not _END.match(line, pos):
+                g, pos = self.__term(line, pos)
+            statement = (s, p, o, g)
+
+        if not _END.match(line, pos):
+            raise ValueError("Expected '.' at: {!r}".format(line[pos:]))
+        return statement
+
+    def __term(self, line, pos):
+        match = _TERM.match(line, pos)
+        if match is None or match.end() == pos:
+            raise ValueError("Expected a term at: {!r}".format(line[pos:]))
+
+        quoted, iri, bnode, value, lang, datatype = match.groups()
+        factory = self.factory
+        if iri is not None:
+            return factory.iri(_unescape(iri)), match.end()
+        if bnode is not None:
+            return factory.bnode(bnode), match.end()
+        if value is not None:
+            if datatype is not None:
+                datatype = _unescape(datatype)
+            return factory.literal(_unescape(value), datatype, lang), match.end()
+
+        s, pos = self.__term(line, match.end())
+        p, pos = self.__term(line, pos)
+        o, pos = self.__term(line, pos)
+        end = _END_TRIPLE.match(line, pos)
+        if end is None:
+            raise ValueError("Expected '>>' at: {!r}".format(line[pos:]))
+        return terms.Triple(s, p, o), end.end()
+
+
+def lines(chunks):
+    """Splits chunks of UTF-8 bytes into lines.
+
+    Args:
+      chunks (iterable of bytes): The data
+
+    Returns:
+      gen: Lines as str, without line breaks
+    """
+    rest = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        rest += chunk
+        end = rest.rfind(b"\n")
+        if end < 0:
+            continue
+        text, rest = rest[:end].decode("utf-8"), rest[end + 1 :]
+        for line in text.split("\n"):
+            yield line[:-1] if line.endswith("\r") else line
+    if rest:
+        yield rest.decode("utf-8").rstrip("\r")
+
+
+def parse(chunks, quads=False, factory=None):
+    """Parses N-Triples or N-Quads while they are received.
+
+    Only the current chunk and line are held in memory, unless a factory
+    interning terms is given.
+
+    Args:
+      chunks (iterable of bytes): The data
+      quads (bool, optional): Parse N-Quads. Defaults to False
+      factory (stardog.terms.TermFactory, optional): Creates the terms,
+        sharing one object per distinct IRI and blank node. Defaults to
+        `None`, creating new terms
+
+    Returns:
+      gen: Statements, as ``(s, p, o)`` tuples, or ``(s, p, o, g)`` for
+        N-Quads
+
+    Raises:
+      ValueError: If a line is not a valid statement, with its line number
+
+    Examples:
+      >>> list(parse([b'<urn:a> <urn:b> "c" .\\n']))
+      [(IRI('urn:a'), IRI('urn:b'), Literal('c'))]
+    """
+    parser = Parser(quads, factory)
+    for number, line in enumerate(lines(chunks), 1):
+        try:
+            statement = parser.parse_line(line)
+        except ValueError as e:
+            raise ValueError("Invalid statement on line {}: {}".format(number, e))
+        if statement is not None:
+            yield statement
@@ -0,0 +1,509 @@
+"""Incremental parsing of query results.
+"""
+
+import codecs
+import json
+import re
+import struct
+
+from . import terms as terms
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class BindingStream(object):
+    """Iterates over the bindings of a SPARQL JSON select result as it arrives.
+
+    Only the binding being parsed and one chunk of the response are held in
+    memory, whatever the size of the result.
+
+    Attributes:
+      head (dict): The `head` member of the result, e.g. ``{'vars': ['s']}``
+    """
+
+    def __init__(self, chunks):
+        """Initializes a binding stream.
+
+        Args:
+          chunks (iterable of bytes): The response body
+        """
+        self.head = None
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._peeked = []
+        self._bindings = self.__parse()
+
+    @property
+    def vars(self):
+        """list[str]: Names of the projected variables."""
+        if self.head is None and not self._peeked:
+            # the head comes before the bindings, reading one gets past it
+            self._peeked.extend(self.__take())
+        return (self.head or {}).get("vars", [])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._peeked:
+            return self._peeked.pop()
+        return next(self._bindings)
+
+    def __take(self):
+        for binding in self._bindings:
+            return [binding]
+        return []
+
+    def __parse(self):
+        self.__expect("{")
+        for key in self.__members():
+            if key != "results":
+                value = self.__value()
+                if key == "head":
+                    self.head = value
+                continue
+
+            self.__expect("{")
+            for key in self.__members():
+                if key != "bindings":
+                    self.__value()
+                    continue
+
+                self.__expect("[")
+                if self.__peek() == "]":
+                    self._pos += 1
+                    continue
+                while True:
+                    yield self.__value()
+                    separator = self.__char()
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        self.__error("',' or ']'")
+
+    def __members(self):
+        if self.__peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.__value()
+            self.__expect(":")
+            yield key
+            separator = self.__char()
+            if separator == "}":
+                return
+            if separator != ",":
+                self.__error("',' or '}'")
+
+    def __value(self):
+        self.__peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self.__fill():
+                    raise
+                continue
+            # a number may continue in the next chunk
+            if end == len(self._buffer) and not self._eof:
+                if isinstance(value, (int, float)) and self.__fill():
+                    continue
+            self._pos = end
+            return value
+
+    def __peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self.__fill():
+                raise ValueError("Unexpected end of SPARQL JSON results")
+
+    def __char(self):
+        char = self.__peek()
+        self._pos += 1
+        return char
+
+    def __expect(self, char):
+        if self.__char() != char:
+            self._pos -= 1
+            self.__error("'{}'".format(char))
+
+    def __error(self, expected):
+        raise ValueError(
+            "Invalid SPARQL JSON results: expected {} at {!r}".format(
+                expected, self._buffer[self._pos : self._pos + 20]
+            )
+        )
+
+    def __fill(self):
+        if self._eof:
+            return False
+
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer = self._buffer[self._pos :] + text
+                self._pos = 0
+                return True
+
+        self._eof = True
+        text = self._decoder.decode(b"", True)
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        return bool(text)
+
+
+class Row(tuple):
+    """A result row.
+
+    A tuple of terms in the order of the variables of its
+    :class:`ResultSet`, with `None` for unbound variables. Terms can also be
+    looked up by variable name, as an item or an attribute. The variable
+    names are held once by the row class shared by every row of a result.
+
+    Variables named like tuple methods, e.g. `count` or `index`, can only be
+    looked up as items: ``row['count']``.
+    """
+
+    __slots__ = ()
+    vars = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def get(self, var, default=None):
+        """Returns the term bound to a variable, or default if unbound."""
+        index = self._index.get(var)
+        term = None if index is None else tuple.__getitem__(self, index)
+        return default if term is None else term
+
+    def asdict(self):
+        """Returns the bound variables as a dict of terms."""
+        return {var: term for var, term in zip(self.vars, self) if term is not None}
+
+    def __repr__(self):
+        return "Row({})".format(
+            ", ".join("{}={!r}".format(var, term) for var, term in zip(self.vars, self))
+        )
+
+
+class ResultSet(object):
+    """Compact in-memory select results.
+
+    Rows are :class:`Row` tuples sharing one variable header. Each distinct
+    IRI and blank node is a single :class:`stardog.terms.IRI` or
+    :class:`stardog.terms.BNode` object, and literals keep their lexical form
+    until :attr:`stardog.terms.Literal.python` is read.
+
+    Attributes:
+      vars (tuple[str]): Names of the projected variables
+      rows (list[Row]): The rows
+    """
+
+    __slots__ = ("vars", "rows")
+
+    def __init__(self, vars, rows):
+        self.vars = tuple(vars)
+        self.rows = rows
+
+    @classmethod
+    def from_bindings(cls, bindings, vars=None):
+        """Builds a result set from SPARQL JSON bindings.
+
+        Args:
+          bindings (iterable of dict): Bindings, e.g. a :class:`BindingStream`
+          vars (list[str], optional): Variable names. Defaults to
+            `bindings.vars`
+
+        Returns:
+          ResultSet: The results
+        """
+        vars = tuple(bindings.vars if vars is None else vars)
+        row = type(
+            "Row",
+            (Row,),
+            {
+                "__slots__": (),
+                "vars": vars,
+                "_index": {var: i for i, var in enumerate(vars)},
+            },
+        )
+        convert = terms.TermFactory().from_json
+
+        def _row(binding):
+            return row(
+                convert(binding[var]) if var in binding else None for var in vars
+            )
+
+        return cls(vars, [_row(binding) for binding in bindings])
+
+    def column(self, var):
+        """Returns the terms bound to a variable, in row order.
+
+        Args:
+          var (str): Variable name
+
+        Returns:
+          list: Terms, `None` where unbound
+        """
+        index = self.vars.index(var)
+        return [row[index] for row in self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __repr__(self):
+        return "ResultSet(vars={}, rows={})".format(list(self.vars), len(self.rows))
+
+
+def collect(stream):
+    """Reads a result stream into a SPARQL JSON results dict.
+
+    Args:
+      stream (BindingStream or BinaryResultStream): The results
+
+    Returns:
+      dict: ``{'head': ..., 'results': {'bindings': [...]}}``
+    """
+    bindings = list(stream)
+    return {"head": stream.head, "results": {"bindings": bindings}}
+
+
+# record markers of the binary results table format
+_NULL = 0
+_REPEAT = 1
+_NAMESPACE = 2
+_QNAME = 3
+_URI = 4
+_BNODE = 5
+_PLAIN_LITERAL = 6
+_LANG_LITERAL = 7
+_DATATYPE_LITERAL = 8
+_EMPTY_ROW = 9
+_TRIPLE = 10
+_ERROR = 126
+_TABLE_END = 127
+
+_MAGIC = b"BQRT"
+_INT = struct.Struct(">i")
+_HEADER = struct.Struct(">4si")
+
+
+class _Incomplete(Exception):
+    pass
+
+
+class BinaryResultStream(object):
+    """Iterates over the bindings of a binary select result as it arrives.
+
+    Decodes the `application/x-binary-rdf-results-table` format into
+    bindings shaped like those of SPARQL JSON results, e.g.
+    ``{'s': {'type': 'uri', 'value': 'urn:a'}}``. Unbound variables are
+    left out, and a value repeated from the previous row is the same dict.
+
+    Attributes:
+      vars (list[str]): Names of the projected variables
+      head (dict): ``{'vars': vars}``, as in SPARQL JSON results
+    """
+
+    def __init__(self, chunks):
+        """Initializes a binary result stream.
+
+        Args:
+          chunks (iterable of bytes): The response body
+
+        Raises:
+          ValueError: If the body is not in the binary results format
+        """
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._namespaces = {}
+
+        magic, self.version = self.__read(
+            lambda buffer: (_HEADER.unpack_from(buffer), 8)
+        )
+        if magic != _MAGIC:
+            raise ValueError("Invalid binary results: bad magic number")
+
+        if self.version == 1:
+            self.__string = _string_reader(struct.Struct(">H"), _modified_utf8)
+        elif self.version == 2:
+            self.__string = _string_reader(_INT, "utf-16-be")
+        else:
+            self.__string = _string_reader(_INT, "utf-8")
+
+        def _vars(buffer):
+            (count,), pos = _INT.unpack_from(buffer), 4
+            names = []
+            for _ in range(count):
+                name, pos = self.__string(buffer, pos)
+                names.append(name)
+            return names, pos
+
+        self.vars = self.__read(_vars)
+        self.head = {"vars": self.vars}
+        self._rows = self.__rows()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    def __read(self, parse):
+        # parses from the start of the buffer, reading more until it fits
+        while True:
+            try:
+                value, pos = parse(self._buffer)
+            except (_Incomplete, struct.error, IndexError):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    raise ValueError("Unexpected end of binary results")
+                self._buffer += chunk
+                continue
+            self._buffer = self._buffer[pos:]
+            return value
+
+    def __rows(self):
+        variables = list(enumerate(self.vars))
+        previous = [None] * len(variables)
+        buffer, pos = self._buffer, 0
+        value = _term_reader(self.__string, self._namespaces)
+
+        while True:
+            start = pos
+            try:
+                marker = buffer[pos]
+                if marker == _TABLE_END:
+                    return
+                if marker == _ERROR:
+                    message, _ = self.__string(buffer, pos + 2)
+                    raise ValueError("Query failed: {}".format(message))
+                if not variables:
+                    if marker != _EMPTY_ROW:
+                        raise ValueError(
+                            "Invalid binary results: unexpected marker {}".format(
+                                marker
+                            )
+                        )
+                    pos += 1
+                    row = {}
+                else:
+                    row = {}
+                    current = list(previous)
+                    for i, var in variables:
+                        if buffer[pos] == _REPEAT:
+                            term = previous[i]
+                            pos += 1
+                        else:
+                            term, pos = value(buffer, pos)
+                            current[i] = term
+                        if term is not None:
+                            row[var] = term
+                    previous = current
+            except (_Incomplete, struct.error, IndexError):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    raise ValueError("Unexpected end of binary results")
+                buffer, pos = buffer[start:] + chunk, 0
+                continue
+            yield row
+
+
+def _term_reader(string, namespaces):
+    def term(buffer, pos):
+        marker = buffer[pos]
+        pos += 1
+        while marker == _NAMESPACE:
+            (ns,) = _INT.unpack_from(buffer, pos)
+            namespaces[ns], pos = string(buffer, pos + 4)
+            marker = buffer[pos]
+            pos += 1
+
+        if marker == _QNAME:
+            (ns,) = _INT.unpack_from(buffer, pos)
+            local, pos = string(buffer, pos + 4)
+            return {"type": "uri", "value": namespaces[ns] + local}, pos
+        if marker == _URI:
+            iri, pos = string(buffer, pos)
+            return {"type": "uri", "value": iri}, pos
+        if marker == _NULL:
+            return None, pos
+        if marker == _PLAIN_LITERAL:
+            label, pos = string(buffer, pos)
+            return {"type": "literal", "value": label}, pos
+        if marker == _DATATYPE_LITERAL:
+            label, pos = string(buffer, pos)
+            datatype, pos = term(buffer, pos)
+            return (
+                {"type": "literal", "value": label, "datatype": datatype["value"]},
+                pos,
+            )
+        if marker == _LANG_LITERAL:
+            label, pos = string(buffer, pos)
+            lang, pos = string(buffer, pos)
+            return {"type": "literal", "value": label, "xml:lang": lang}, pos
+        if marker == _BNODE:
+            label, pos = string(buffer, pos)
+            return {"type": "bnode", "value": label}, pos
+        if marker == _TRIPLE:
+            subject, pos = term(buffer, pos)
+            predicate, pos = term(buffer, pos)
+            obj, pos = term(buffer, pos)
+            triple = {"subject": subject, "predicate": predicate, "object": obj}
+            return {"type": "triple", "value": triple}, pos
+
+        raise ValueError("Invalid binary results: unexpected marker {}".format(marker))
+
+    return term
+
+
+def _string_reader(length, codec):
+    unpack, size = length.unpack_from, length.size
+
+    if callable(codec):
+
+        def read(buffer, pos):
+            (count,) = unpack(buffer, pos)
+            pos += size
+            end = pos + count
+            if end > len(buffer):
+                raise _Incomplete()
+            return codec(buffer[pos:end]), end
+
+    else:
+
+        def read(buffer, pos):
+            (count,) = unpack(buffer, pos)
+            pos += size
+            end = pos + count
+            if end > len(buffer):
+                raise _Incomplete()
+            return buffer[pos:end].decode(codec), end
+
+    return read
+
+
+def _modified_utf8(data):
+    # strings written by java's DataOutput.writeUTF
+    return data.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
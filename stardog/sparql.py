@@ -0,0 +1,256 @@
+"""Build fragments of SPARQL queries.
+"""
+
+import decimal
+import math
+import re
+
+from . import terms as terms
+
+_XSD = "http://www.w3.org/2001/XMLSchema#"
+
+_ESCAPES = {
+    "\\": "\\\\",
+    '"': '\\"',
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+}
+
+# the prologue and comments up to the query form
+_FORM = re.compile(
+    r"(?:\s+|#[^\n]*(?:\n|$)|(?:PREFIX\s+[^\s:]*:|BASE)\s*<[^>]*>)*"
+    r"(SELECT|ASK|CONSTRUCT|DESCRIBE)\b(?:\s+(?:DISTINCT|REDUCED)\b)?",
+    re.IGNORECASE,
+)
+
+# tokens that may hold a '}' without closing a group
+_SKIP = re.compile(
+    r'"""(?:[^"\\]|\\.|"(?!""))*"""'
+    r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r"|<[^<>\"{}|^`\\\s]*>"
+    r"|#[^\n]*"
+)
+
+
+def literal(value):
+    """Quotes a string as a SPARQL string literal.
+
+    Args:
+      value (str): The string
+
+    Returns:
+      str: e.g. `"say \\"hi\\""`
+    """
+    return '"' + "".join(_ESCAPES.get(c, c) for c in value) + '"'
+
+
+def term(value):
+    """Formats a value as a SPARQL term.
+
+    Args:
+      value: A :mod:`stardog.terms` IRI or Literal, a bool, int, float or
+        decimal, `None` for UNDEF, or a str that already is a SPARQL term,
+        e.g. `'<urn:a>'`
+
+    Returns:
+      str: The term
+
+    Examples:
+      >>> term(IRI('urn:a'))
+      '<urn:a>'
+      >>> term(Literal('chat', lang='fr'))
+      '"chat"@fr'
+    """
+    if value is None:
+        return "UNDEF"
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, terms.IRI):
+        return "<{}>".format(value.value)
+    if isinstance(value, terms.Literal):
+        if value.lang:
+            return "{}@{}".format(literal(value.value), value.lang)
+        if value.datatype:
+            return "{}^^<{}>".format(literal(value.value), value.datatype)
+        return literal(value.value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            lexical = "NaN"
+        elif math.isinf(value):
+            lexical = "INF" if value > 0 else "-INF"
+        else:
+            lexical = repr(value)
+        return '"{}"^^<{}double>'.format(lexical, _XSD)
+    if isinstance(value, (int, decimal.Decimal)):
+        return str(value)
+    raise TypeError("Cannot use {!r} as a SPARQL term".format(value))
+
+
+def values(variables, rows):
+    """Builds a VALUES block.
+
+    Args:
+      variables (str or list[str]): Variable name, or names
+      rows (iterable): Terms accepted by :func:`term` for a single
+        variable, or tuples of them
+
+    Returns:
+      str: The VALUES block
+
+    Examples:
+      >>> values('s', [IRI('urn:a'), IRI('urn:b')])
+      'VALUES ?s { <urn:a> <urn:b> }'
+    """
+    if isinstance(variables, str):
+        return "VALUES ?{} {{ {} }}".format(
+            variables, " ".join(term(row) for row in rows)
+        )
+    return "VALUES ({}) {{ {} }}".format(
+        " ".join("?" + var for var in variables),
+        " ".join("({})".format(" ".join(term(t) for t in row)) for row in rows),
+    )
+
+
+def hash_filter(var, buckets, bucket):
+    """Builds a FILTER keeping the solutions of one hash bucket of a variable.
+
+    Solutions are bucketed by the leading hex digits of the MD5 of the
+    string value of the variable, so the filters of all buckets together
+    keep every solution exactly once. Unbound values and blank nodes, which
+    have no string value, fall into bucket 0.
+
+    Args:
+      var (str): Variable name
+      buckets (int): Number of buckets
+      bucket (int): The bucket, from 0 to `buckets` - 1
+
+    Returns:
+      str: The FILTER
+
+    Examples:
+      >>> hash_filter('s', 4, 1)
+      'FILTER(SUBSTR(MD5(STR(?s)), 1, 1) IN ("1", "5", "9", "d"))'
+    """
+    if not 0 <= bucket < buckets:
+        raise ValueError("bucket must be between 0 and {}".format(buckets - 1))
+
+    digits = 1
+    while 16**digits < buckets:
+        digits += 1
+    # one more digit evens out buckets that do not divide the prefixes
+    if (16**digits) % buckets:
+        digits += 1
+
+    prefixes = (
+        '"{:0{}x}"'.format(i, digits) for i in range(bucket, 16**digits, buckets)
+    )
+    condition = "SUBSTR(MD5(STR(?{})), 1, {}) IN ({})".format(
+        var, digits, ", ".join(prefixes)
+    )
+    if bucket == 0:
+        condition = "!BOUND(?{0}) || isBlank(?{0}) || {1}".format(var, condition)
+    return "FILTER({})".format(condition)
+
+
+def query_form(query):
+    """Finds the form of a query.
+
+    Args:
+      query (str): SPARQL query
+
+    Returns:
+      str: 'select', 'ask', 'construct' or 'describe', `None` for other
+        queries, e.g. updates
+    """
+    match = _FORM.match(query)
+    return match.group(1).lower() if match else None
+
+
+def project(query, var):
+    """Adds a variable to the projection of a select query.
+
+    Args:
+      query (str): SPARQL select query
+      var (str): Variable name
+
+    Returns:
+      str: The query, unchanged if it projects every variable with `*`
+
+    Raises:
+      ValueError: If the query is not a select query
+
+    Examples:
+      >>> project('select distinct ?s {?s ?p ?o}', 'row')
+      'select distinct ?row ?s {?s ?p ?o}'
+    """
+    match = _FORM.match(query)
+    if match is None or match.group(1).lower() != "select":
+        raise ValueError("Not a select query")
+    if query[match.end() :].lstrip().startswith("*"):
+        return query
+    return "{} ?{}{}".format(query[: match.end()], var, query[match.end() :])
+
+
+def inject(query, clause):
+    """Adds a clause at the end of the outermost group of a query.
+
+    The group is closed by the last '}' outside of strings, IRIs and
+    comments, so a query ending with a VALUES block is not supported.
+
+    Args:
+      query (str): SPARQL query
+      clause (str): e.g. a VALUES block or FILTER
+
+    Returns:
+      str: The query with the clause
+
+    Raises:
+      ValueError: If the query has no group pattern
+
+    Examples:
+      >>> inject('select * { ?s ?p ?o } limit 10', 'FILTER(isIRI(?o))')
+      'select * { ?s ?p ?o \\nFILTER(isIRI(?o))\\n} limit 10'
+    """
+    end = None
+    pos = 0
+    while True:
+        brace = query.find("}", pos)
+        skip = _SKIP.search(query, pos)
+        if brace < 0:
+            break
+        if skip and skip.start() < brace:
+            pos = skip.end()
+            continue
+        end = brace
+        pos = brace + 1
+
+    if end is None:
+        raise ValueError("The query has no group pattern")
+    return "{}\n{}\n{}".format(query[:end], clause, query[end:])
+
+
+def partition(items, parts):
+    """Splits items into contiguous parts of nearly equal size.
+
+    Args:
+      items (list): The items
+      parts (int): Number of parts
+
+    Returns:
+      list[list]: At most `parts` non empty lists
+    """
+    items = list(items)
+    size, extra = divmod(len(items), parts)
+    out = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            out.append(items[start:end])
+        start = end
+    return out
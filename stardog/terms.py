@@ -0,0 +1,238 @@
+"""RDF terms found in query results.
+
+Terms are small immutable objects with ``__slots__``. Literals keep their
+lexical form and only convert it to a Python value when asked.
+"""
+
+import datetime
+import decimal
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+_INTEGERS = {
+    XSD + t
+    for t in (
+        "integer",
+        "int",
+        "long",
+        "short",
+        "byte",
+        "nonNegativeInteger",
+        "nonPositiveInteger",
+        "negativeInteger",
+        "positiveInteger",
+        "unsignedLong",
+        "unsignedInt",
+        "unsignedShort",
+        "unsignedByte",
+    )
+}
+_FLOATS = {XSD + "double", XSD + "float"}
+_SPECIAL_FLOATS = {"INF": "inf", "-INF": "-inf", "+INF": "inf", "NaN": "nan"}
+
+
+class IRI(object):
+    """An IRI.
+
+    Attributes:
+      value (str): The IRI
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return type(other) is IRI and other.value == self.value
+
+    def __hash__(self):
+        return hash((IRI, self.value))
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return "IRI({!r})".format(self.value)
+
+
+class BNode(object):
+    """A blank node.
+
+    Attributes:
+      value (str): The blank node label
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return type(other) is BNode and other.value == self.value
+
+    def __hash__(self):
+        return hash((BNode, self.value))
+
+    def __str__(self):
+        return "_:" + self.value
+
+    def __repr__(self):
+        return "BNode({!r})".format(self.value)
+
+
+class Literal(object):
+    """A literal.
+
+    Attributes:
+      value (str): The lexical form
+      datatype (str): Datatype IRI, `None` for plain and language tagged
+        literals
+      lang (str): Language tag, `None` if there is none
+    """
+
+    __slots__ = ("value", "datatype", "lang")
+
+    def __init__(self, value, datatype=None, lang=None):
+        self.value = value
+        self.datatype = datatype
+        self.lang = lang
+
+    @property
+    def python(self):
+        """The value as a Python object.
+
+        xsd integers, decimals, doubles/floats, booleans, dates and
+        dateTimes are converted on every access. Other literals, and
+        lexical forms that are not valid for their datatype, are returned
+        as str.
+        """
+        datatype = self.datatype
+        value = self.value
+        try:
+            if datatype in _INTEGERS:
+                return int(value)
+            if datatype == XSD + "decimal":
+                return decimal.Decimal(value)
+            if datatype in _FLOATS:
+                return float(_SPECIAL_FLOATS.get(value, value))
+            if datatype == XSD + "boolean":
+                return value in ("true", "1")
+            if datatype == XSD + "dateTime":
+                return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if datatype == XSD + "date":
+                return datetime.date.fromisoformat(value)
+        except (ValueError, decimal.InvalidOperation):
+            pass
+        return value
+
+    def __eq__(self, other):
+        return (
+            type(other) is Literal
+            and other.value == self.value
+            and other.datatype == self.datatype
+            and other.lang == self.lang
+        )
+
+    def __hash__(self):
+        return hash((Literal, self.value, self.datatype, self.lang))
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        if self.lang:
+            return "Literal({!r}, lang={!r})".format(self.value, self.lang)
+        if self.datatype:
+            return "Literal({!r}, datatype={!r})".format(self.value, self.datatype)
+        return "Literal({!r})".format(self.value)
+
+
+class Triple(object):
+    """An RDF-star quoted triple.
+
+    Attributes:
+      subject (IRI, BNode or Triple): The subject
+      predicate (IRI): The predicate
+      object (IRI, BNode, Literal or Triple): The object
+    """
+
+    __slots__ = ("subject", "predicate", "object")
+
+    def __init__(self, subject, predicate, object):
+        self.subject = subject
+        self.predicate = predicate
+        self.object = object
+
+    def __eq__(self, other):
+        return type(other) is Triple and (
+            other.subject,
+            other.predicate,
+            other.object,
+        ) == (self.subject, self.predicate, self.object)
+
+    def __hash__(self):
+        return hash((Triple, self.subject, self.predicate, self.object))
+
+    def __repr__(self):
+        return "Triple({!r}, {!r}, {!r})".format(
+            self.subject, self.predicate, self.object
+        )
+
+
+class TermFactory(object):
+    """Creates terms, sharing a single object per distinct IRI or blank node.
+
+    Datatype IRIs and language tags of literals are interned as well, so a
+    result with many repeated terms only holds each of them once.
+    """
+
+    def __init__(self):
+        self._iris = {}
+        self._bnodes = {}
+        self._strings = {}
+
+    def iri(self, value):
+        """Returns the IRI with the given value."""
+        iri = self._iris.get(value)
+        if iri is None:
+            iri = self._iris[value] = IRI(value)
+        return iri
+
+    def bnode(self, value):
+        """Returns the blank node with the given label."""
+        bnode = self._bnodes.get(value)
+        if bnode is None:
+            bnode = self._bnodes[value] = BNode(value)
+        return bnode
+
+    def literal(self, value, datatype=None, lang=None):
+        """Returns a literal, with its datatype and language tag interned."""
+        if datatype is not None:
+            datatype = self._strings.setdefault(datatype, datatype)
+        if lang is not None:
+            lang = self._strings.setdefault(lang, lang)
+        return Literal(value, datatype, lang)
+
+    def from_json(self, term):
+        """Converts a term of SPARQL JSON results.
+
+        Args:
+          term (dict): e.g. ``{'type': 'uri', 'value': 'urn:a'}``
+
+        Returns:
+          IRI, BNode, Literal or Triple: The term
+        """
+        kind = term["type"]
+        if kind == "uri":
+            return self.iri(term["value"])
+        if kind == "bnode":
+            return self.bnode(term["value"])
+        if kind == "triple":
+            value = term["value"]
+            return Triple(
+                self.from_json(value["subject"]),
+                self.from_json(value["predicate"]),
+                self.from_json(value["object"]),
+            )
+        return self.literal(term["value"], term.get("datatype"), term.get("xml:lang"))
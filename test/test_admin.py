@@ -907,6 +907,27 @@ def test_add_and_delete_namespaces(admin):
     db.drop()
 
 
+def test_set_and_update_namespaces(admin):
+
+    db = admin.new_database("test_db")
+    defaults = {ns["prefix"]: ns["name"] for ns in db.namespaces()}
+
+    diff = db.update_namespaces(add={"ns1": "my:ns1:", "ns2": "my:ns2:"})
+    assert diff == {"added": ["ns1", "ns2"], "removed": [], "changed": []}
+    assert len(db.namespaces()) == len(defaults) + 2
+
+    # nothing to change
+    assert not any(db.update_namespaces(add={"ns1": "my:ns1:"}).values())
+
+    diff = db.set_namespaces(dict(defaults, ns1="my:other:"))
+    assert diff == {"added": [], "removed": ["ns2"], "changed": ["ns1"]}
+
+    db.update_namespaces(remove=["ns1", "non-existent-ns"])
+    assert {ns["prefix"]: ns["name"] for ns in db.namespaces()} == defaults
+
+    db.drop()
+
+
 def test_database_exists_in_databases_list(admin):
     db = admin.new_database("my_db")
     all_databases = admin.databases()
@@ -1,3 +1,8 @@
+import json
+import re
+import time
+import urllib.parse
+
 import pytest
 import requests
 import requests_mock
@@ -417,3 +422,1737 @@ class TestStardogException:
         assert str(exception) == "Mymessage"
         assert exception.http_code == 400
         assert exception.stardog_code == "SD90A"
+
+
+class TestConnectionPool:
+    def test_pool_settings(self):
+        from stardog.http.client import Client
+
+        client = Client(pool_maxsize=32, pool_block=True, keep_alive=False)
+        adapter = client.session.get_adapter("http://localhost:5820")
+        assert adapter._pool_maxsize == 32
+        assert adapter._pool_block is True
+        assert client.session.headers["Connection"] == "close"
+
+    def test_shared_pool(self):
+        from stardog.http.client import ConnectionPool
+
+        with ConnectionPool(pool_maxsize=4) as pool:
+            with requests_mock.Mocker(session=pool.session) as m:
+                m.get("http://localhost:5820/db1/size", text="1")
+                m.get("http://localhost:5820/db2/size", text="2")
+
+                conn1 = stardog.connection.Connection(
+                    "db1", username="alice", password="a", pool=pool
+                )
+                conn2 = stardog.connection.Connection(
+                    "db2", username="bob", password="b", pool=pool
+                )
+                assert conn1.client.session is conn2.client.session
+                assert conn1.size() == 1
+                assert conn2.size() == 2
+                conn1.close()
+
+                # each client keeps its own credentials on the shared session
+                users = [r.headers["Authorization"] for r in m.request_history]
+                assert users[0] != users[1]
+
+    def test_pool_conflicts_with_session(self):
+        from stardog.http.client import Client, ConnectionPool
+
+        with pytest.raises(ValueError):
+            Client(pool=ConnectionPool(), session=requests.Session())
+
+
+class TestThreadSafeConnection:
+    def test_transactions_per_thread(self):
+        import itertools
+        import threading
+
+        ids = itertools.count()
+        barrier = threading.Barrier(2)
+        seen = {}
+
+        def begin(request, context):
+            return "tx{}".format(next(ids))
+
+        with requests_mock.Mocker() as m:
+            m.post(requests_mock.ANY, text="")
+            m.post("http://localhost:5820/db/transaction/begin", text=begin)
+
+            conn = stardog.connection.Connection("db", thread_safe=True)
+
+            def work(name):
+                seen[name] = conn.begin()
+                barrier.wait()
+                assert conn.transaction == seen[name]
+                conn.commit()
+
+            threads = [threading.Thread(target=work, args=(n,)) for n in "ab"]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        assert sorted(seen.values()) == ["tx0", "tx1"]
+        assert conn.transaction is None
+        commits = [r.path for r in m.request_history if "commit" in r.path]
+        assert sorted(commits) == [
+            "/db/transaction/commit/tx0",
+            "/db/transaction/commit/tx1",
+        ]
+
+
+class TestResponseCompression:
+    def test_accept_encoding(self):
+        from stardog.http import compression
+
+        assert compression.accept_encoding(["gzip"]) == "gzip"
+        assert "gzip" in compression.accept_encoding(True)
+        with pytest.raises(ValueError):
+            compression.accept_encoding(["lzma"])
+
+    def test_streamed_export_is_decoded_and_counted(self):
+        import gzip
+
+        turtle = b"<urn:s> <urn:p> <urn:o> .\n" * 1000
+        body = gzip.compress(turtle)
+
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://localhost:5820/db/export",
+                content=body,
+                headers={"Content-Encoding": "gzip"},
+            )
+
+            conn = stardog.connection.Connection("db", accept_encoding=["gzip"])
+            with conn.export(stream=True, chunk_size=100) as stream:
+                assert b"".join(stream) == turtle
+
+            assert m.last_request.headers["Accept-Encoding"] == "gzip"
+
+        stats = conn.client.transfer_stats
+        assert stats.compressed_responses == 1
+        assert stats.compressed_bytes == len(body)
+        assert stats.decompressed_bytes == len(turtle)
+        assert stats.ratio > 1
+
+
+class TestUploadCompression:
+    @staticmethod
+    def _body(request):
+        body = request.body
+        return body if isinstance(body, bytes) else b"".join(body)
+
+    def test_add_is_gzipped(self):
+        import gzip
+
+        bodies = []
+
+        def add(request, context):
+            bodies.append(
+                (request.headers.get("Content-Encoding"), self._body(request))
+            )
+            return ""
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/transaction/begin", text="tx")
+            m.post("http://localhost:5820/db/tx/add", text=add)
+            m.post("http://localhost:5820/db/tx/remove", text=add)
+
+            conn = stardog.connection.Connection("db", compress_uploads=True)
+            conn.begin()
+            conn.add(content.File("data/example.ttl"))
+            conn.remove(content.File("data/example.ttl.zip"))
+
+        encoding, body = bodies[0]
+        assert encoding == "gzip"
+        assert gzip.decompress(body) == b"<urn:subj> <urn:pred> <urn:obj> ."
+
+        # already encoded content is sent as is
+        encoding, body = bodies[1]
+        assert encoding == "zip"
+        assert body == open("data/example.ttl.zip", "rb").read()
+
+    def test_new_database_is_streamed(self):
+        import email
+        import gzip
+        import json
+
+        def create(request, context):
+            message = email.message_from_bytes(
+                b"Content-Type: "
+                + request.headers["Content-Type"].encode()
+                + b"\r\n\r\n"
+                + self._body(request)
+            )
+            parts = message.get_payload()
+            assert parts[0]["Content-Encoding"] == "gzip"
+            data = gzip.decompress(parts[0].get_payload(decode=True))
+            assert data == b"<urn:subj> <urn:pred> <urn:obj> ."
+            meta = json.loads(parts[1].get_payload())
+            assert meta["dbname"] == "db"
+            assert meta["files"] == [{"filename": "example.ttl"}]
+            return ""
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/admin/databases", text=create)
+
+            admin = stardog.admin.Admin(compress_uploads=True)
+            admin.new_database("db", None, content.File("data/example.ttl"))
+
+            assert m.call_count == 1
+
+
+class TestCluster:
+    def test_routing(self):
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://sd1:5820/admin/cluster",
+                json={"nodes": ["sd1:5820", "sd2:5820"], "coordinator": "sd2:5820"},
+            )
+            for node in ("sd1", "sd2"):
+                m.post(f"http://{node}:5820/db/query", json={})
+            m.post("http://sd2:5820/db/transaction/begin", text="tx")
+            m.post("http://sd2:5820/db/tx/clear", text="")
+            m.post("http://sd2:5820/db/transaction/commit/tx", text="")
+            for node in ("sd1", "sd2"):
+                m.get(
+                    f"http://{node}:5820/db/reasoning/tx/explain/inconsistency",
+                    json={"proofs": []},
+                )
+
+            conn = stardog.connection.Connection(
+                "db", endpoint=["http://sd1:5820", "http://sd2:5820"]
+            )
+            for _ in range(4):
+                conn.select("select * {?s ?p ?o}")
+            conn.begin()
+            conn.clear()
+            # GETs in a transaction need its state on the coordinator
+            for _ in range(4):
+                conn.explain_inconsistency()
+            conn.commit()
+
+            hosts = [(r.hostname, r.path) for r in m.request_history[1:]]
+
+        assert conn.client.cluster.coordinator == "http://sd2:5820"
+        queries = [host for host, path in hosts if path == "/db/query"]
+        assert sorted(queries) == ["sd1", "sd1", "sd2", "sd2"]
+        assert {host for host, path in hosts if path != "/db/query"} == {"sd2"}
+
+    def test_reads_fail_over(self):
+        from stardog.http.cluster import Cluster
+
+        cluster = Cluster(["http://sd1:5820", "http://sd2:5820"], discover=False)
+        with requests_mock.Mocker() as m:
+            m.get("http://sd1:5820/db/size", exc=requests.exceptions.ConnectionError)
+            m.get("http://sd2:5820/db/size", text="3")
+
+            conn = stardog.connection.Connection("db", endpoint=cluster)
+            assert conn.size() == 3
+            assert conn.size() == 3
+
+        # the node that refused the connection is skipped afterwards
+        assert [r.hostname for r in m.request_history].count("sd1") <= 1
+
+
+class TestHedging:
+    @staticmethod
+    def _session(handler):
+        # requests_mock runs one request at a time, which defeats hedging
+        class Adapter(requests.adapters.BaseAdapter):
+            def send(self, request, **kwargs):
+                response = requests.Response()
+                response.status_code = 200
+                response._content = json.dumps(handler(request)).encode()
+                response.request = request
+                response.url = request.url
+                return response
+
+            def close(self):
+                pass
+
+        session = requests.Session()
+        session.mount("http://", Adapter())
+        return session
+
+    def test_slow_read_is_hedged(self):
+        import threading
+        import urllib.parse
+        from stardog.http.cluster import Cluster
+        from stardog.http.hedging import HedgePolicy
+
+        running = []
+        killed = []
+        done = threading.Event()
+
+        def handler(request):
+            url = urllib.parse.urlsplit(request.url)
+            if url.path == "/db/query":
+                running.append(
+                    (url.hostname, urllib.parse.parse_qs(request.body)["query"][0])
+                )
+                if len(running) == 1:
+                    done.wait(5)
+                return {"node": url.hostname}
+            if url.path == "/admin/queries":
+                return {"queries": [{"id": "q1", "query": running[0][1]}]}
+            killed.append(url.hostname)
+            done.set()
+            return {}
+
+        policy = HedgePolicy(delay=0.01)
+        cluster = Cluster(["http://sd1:5820", "http://sd2:5820"], discover=False)
+        conn = stardog.connection.Connection(
+            "db", endpoint=cluster, hedge=policy, session=self._session(handler)
+        )
+
+        results = conn.select("select * {}")
+        assert done.wait(5)
+
+        # the duplicate went to the other node, and the original was killed
+        assert results == {"node": running[1][0]}
+        assert running[0][0] != running[1][0]
+        # only the duplicate carries a tag
+        assert running[0][1] == "select * {}"
+        assert running[1][1].startswith("select * {}\n# pystardog-hedge ")
+        assert killed == [running[0][0]]
+        assert policy.hedged == 1
+        assert policy.hedges_won == 1
+        policy.close()
+
+    def test_losing_hedge_is_killed_by_tag(self):
+        import threading
+        import time
+        import urllib.parse
+        from stardog.http.hedging import HedgePolicy
+
+        running = []
+        killed = []
+        done = threading.Event()
+
+        def handler(request):
+            url = urllib.parse.urlsplit(request.url)
+            if url.path == "/db/query":
+                running.append(urllib.parse.parse_qs(request.body)["query"][0])
+                if len(running) == 1:
+                    time.sleep(0.1)
+                else:
+                    done.wait(5)
+                return {}
+            if url.path == "/admin/queries":
+                return {
+                    "queries": [
+                        {"id": "q{}".format(i), "db": "db", "query": q}
+                        for i, q in enumerate(running)
+                    ]
+                }
+            killed.append(url.path)
+            done.set()
+            return {}
+
+        policy = HedgePolicy(delay=0.01)
+        conn = stardog.connection.Connection(
+            "db", hedge=policy, session=self._session(handler)
+        )
+        conn.select("select * {}")
+        assert done.wait(5)
+
+        assert killed == ["/admin/queries/q1"]
+        assert policy.hedges_won == 0
+        policy.close()
+
+    def test_writes_are_not_hedged(self):
+        from stardog.http.hedging import is_hedgeable
+
+        assert is_hedgeable("POST", "/query")
+        assert is_hedgeable("GET", "/export")
+        assert not is_hedgeable("POST", "/update")
+        assert not is_hedgeable("POST", "/tx/query")
+        assert not is_hedgeable("POST", "/transaction/begin")
+
+
+class TestTransports:
+    @pytest.fixture
+    def server(self):
+        import gzip
+        import http.server
+        import threading
+
+        received = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.reply(b"")
+
+            def do_POST(self):
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    body = b""
+                    while True:
+                        size = int(self.rfile.readline(), 16)
+                        body += self.rfile.read(size + 2)[:size]
+                        if not size:
+                            break
+                else:
+                    body = self.rfile.read(int(self.headers["Content-Length"]))
+                self.reply(body)
+
+            def reply(self, body):
+                received.append((self.command, self.path, dict(self.headers), body))
+                payload = gzip.compress(b"42")
+                self.send_response(200)
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield "http://127.0.0.1:{}".format(server.server_address[1]), received
+        server.shutdown()
+        server.server_close()
+
+    @pytest.mark.parametrize("transport", ["requests", "urllib3", "httpx"])
+    def test_cluster_failover(self, server, transport):
+        from stardog.http.cluster import Cluster
+        from stardog.http.transports import create
+
+        endpoint, received = server
+        # nothing listens on port 1, so the connection is refused
+        with pytest.raises(requests.exceptions.ConnectionError):
+            create(transport).request("GET", "http://127.0.0.1:1/db/size")
+
+        cluster = Cluster(["http://127.0.0.1:1", endpoint], discover=False)
+        conn = stardog.connection.Connection(
+            "db", endpoint=cluster, transport=transport
+        )
+        for _ in range(3):
+            assert conn.size(exact=True) == 42
+        assert len(received) == 3
+        conn.close()
+
+    @pytest.mark.parametrize("transport", ["requests", "urllib3", "httpx"])
+    def test_transport(self, server, transport):
+        import gzip
+        from stardog.http.transports import HttpxTransport
+
+        if transport == "httpx":
+            transport = HttpxTransport()
+
+        endpoint, received = server
+        conn = stardog.connection.Connection(
+            "db", endpoint=endpoint, transport=transport, compress_uploads=True
+        )
+
+        assert conn.size(exact=True) == 42
+        conn.begin()
+        conn.add(content.Raw("<urn:s> <urn:p> <urn:o> .", content_type=NTRIPLES))
+        conn.close()
+
+        method, path, headers, _ = received[0]
+        assert (method, path) == ("GET", "/db/size?exact=True")
+        assert headers["Authorization"].startswith("Basic ")
+
+        # the streamed gzip upload arrives intact
+        method, path, headers, body = received[2]
+        assert (method, path) == ("POST", "/db/42/add")
+        assert headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(body) == b"<urn:s> <urn:p> <urn:o> ."
+
+        assert conn.client.transfer_stats.compressed_responses == 3
+
+    def test_pool_transport(self, server):
+        from stardog.http.client import ConnectionPool
+        from stardog.http.transports import Urllib3Transport
+
+        endpoint, received = server
+        with ConnectionPool(transport="urllib3") as pool:
+            conn1 = stardog.connection.Connection("db", endpoint=endpoint, pool=pool)
+            conn2 = stardog.connection.Connection("db", endpoint=endpoint, pool=pool)
+
+            assert isinstance(pool.transport, Urllib3Transport)
+            assert conn1.client.transport is conn2.client.transport
+            assert conn1.size() == conn2.size() == 42
+
+    def test_unknown_transport(self):
+        with pytest.raises(ValueError):
+            stardog.connection.Connection("db", transport="curl")
+        with pytest.raises(ValueError):
+            stardog.connection.Connection(
+                "db", transport="urllib3", session=requests.Session()
+            )
+
+
+class TestInstrumentation:
+    def test_path_template(self):
+        from stardog.http.instrumentation import path_template
+
+        txid = "0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0"
+        assert path_template("/query", database=True) == "/{db}/query"
+        assert path_template("/" + txid + "/add", database=True) == "/{db}/{txid}/add"
+        assert (
+            path_template("/transaction/commit/" + txid, database=True)
+            == "/{db}/transaction/commit/{txid}"
+        )
+        assert path_template("/docs/report.pdf", database=True) == "/{db}/docs/{name}"
+        assert path_template("/docs/size", database=True) == "/{db}/docs/size"
+        assert path_template("/admin/users/frodo/roles") == "/admin/users/{name}/roles"
+        assert path_template("/admin/users/valid") == "/admin/users/valid"
+        assert (
+            path_template("/admin/queries/stored/q1") == "/admin/queries/stored/{name}"
+        )
+        assert (
+            path_template("/admin/databases/db/options")
+            == "/admin/databases/{name}/options"
+        )
+        assert path_template("/admin/cluster/standby/pause?pause=true") == (
+            "/admin/cluster/standby/pause"
+        )
+        assert path_template("/db/namespaces") == "/{db}/namespaces"
+
+    def test_histogram_hook(self):
+        from stardog.http.instrumentation import HistogramHook
+
+        hook = HistogramHook()
+        events = []
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json={"results": {}})
+            m.get(
+                "http://localhost:5820/db/size",
+                status_code=404,
+                json={"code": "0D0DU2", "message": "Database does not exist"},
+            )
+            m.get("http://localhost:5820/db/export", text="<urn:s> <urn:p> <urn:o> .")
+
+            conn = stardog.connection.Connection("db", hooks=[hook, events.append])
+            conn.select("select * {?s ?p ?o}")
+            conn.select("select * {?s ?p ?o}")
+            with pytest.raises(stardog.exceptions.StardogException):
+                conn.size()
+            with conn.export(stream=True) as stream:
+                assert b"".join(stream) == b"<urn:s> <urn:p> <urn:o> ."
+
+        query, _, failed, export = events
+        assert (query.method, query.path, query.status) == ("POST", "/{db}/query", 200)
+        assert query.bytes_sent == len(m.request_history[0].body)
+        assert query.bytes_received == len(b'{"results": {}}')
+        assert query.total >= query.ttfb >= 0
+        assert (failed.status, failed.stardog_code) == (404, "0D0DU2")
+        assert export.bytes_received == len(b"<urn:s> <urn:p> <urn:o> .")
+
+        stats = hook.stats()
+        assert stats[("POST", "/{db}/query")]["total"].count == 2
+        assert stats[("GET", "/{db}/size")]["errors"] == 1
+
+        # the stats are a snapshot, later requests leave them unchanged
+        hook(query)
+        assert stats[("POST", "/{db}/query")]["total"].count == 2
+        assert hook.stats()[("POST", "/{db}/query")]["total"].count == 3
+
+    def test_histogram_percentile(self):
+        from stardog.http.instrumentation import Histogram
+
+        histogram = Histogram(bounds=[0.1, 0.2, 0.5])
+        for value in [0.05] * 90 + [0.15] * 9 + [0.7]:
+            histogram.observe(value)
+        assert histogram.percentile(50) == 0.1
+        assert histogram.percentile(99) == 0.2
+        assert histogram.percentile(100) == 0.7
+
+    def test_opentelemetry_hook(self):
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+            InMemorySpanExporter,
+        )
+        from stardog.http.instrumentation import OpenTelemetryHook
+
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        hook = OpenTelemetryHook(provider.get_tracer("test"))
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json={"results": {}})
+            conn = stardog.connection.Connection("db", hooks=[hook])
+            conn.select("select * {?s ?p ?o}")
+
+        (span,) = exporter.get_finished_spans()
+        assert span.name == "POST /{db}/query"
+        assert span.attributes["http.response.status_code"] == 200
+        assert span.attributes["url.template"] == "/{db}/query"
+        assert [e.name for e in span.events] == ["first_byte"]
+
+
+class TestStreamingSelect:
+    RESULTS = {
+        "head": {"vars": ["s", "o"]},
+        "results": {
+            "bindings": [
+                {
+                    "s": {"type": "uri", "value": "urn:s%d" % i},
+                    "o": {"type": "literal", "value": "caf\u00e9 %d" % i},
+                }
+                for i in range(50)
+            ]
+        },
+    }
+
+    def test_binding_stream(self):
+        from stardog.results import BindingStream
+
+        body = json.dumps(self.RESULTS, indent=1, ensure_ascii=False).encode()
+        # one byte at a time, splitting every token and utf-8 sequence
+        bindings = BindingStream(body[i : i + 1] for i in range(len(body)))
+        assert bindings.vars == ["s", "o"]
+        assert list(bindings) == self.RESULTS["results"]["bindings"]
+
+    def test_binding_stream_edge_cases(self):
+        from stardog.results import BindingStream
+
+        empty = BindingStream([b'{"head": {"vars": []}, "results": {"bindings": []}}'])
+        assert list(empty) == []
+        assert empty.vars == []
+
+        trailing = BindingStream(
+            [
+                b'{"results": {"distinct": false, "bindings": [{}]}, "head": {"n": 12',
+                b"3}}",
+            ]
+        )
+        assert list(trailing) == [{}]
+        assert trailing.head == {"n": 123}
+
+        with pytest.raises(ValueError):
+            list(BindingStream([b'{"results": {"bindings": [{}']))
+
+    def test_select_stream(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self.RESULTS)
+            conn = stardog.connection.Connection("db")
+
+            with conn.select("select * {?s ?p ?o}", stream=True, chunk_size=7) as rows:
+                first = next(rows)
+            assert first["s"]["value"] == "urn:s0"
+            assert m.last_request.headers["Accept"] == SPARQL_JSON
+
+            with conn.select(
+                "select * {?s ?p ?o}", content_type=SPARQL_JSON, stream=True
+            ) as rows:
+                assert len(list(rows)) == 50
+
+            m.post("http://localhost:5820/db/query", text="s\turn:a\n")
+            with conn.select(
+                "select * {?s ?p ?o}", content_type=TSV, stream=True
+            ) as chunks:
+                assert b"".join(chunks) == b"s\turn:a\n"
+
+
+class TestBinaryResults:
+    @staticmethod
+    def _string(value):
+        import struct
+
+        data = value.encode("utf-8")
+        return struct.pack(">i", len(data)) + data
+
+    def _results(self):
+        import struct
+
+        s = self._string
+        return b"".join(
+            [
+                b"BQRT",
+                struct.pack(">ii", 4, 3),
+                s("s") + s("o") + s("n"),
+                # namespace 0, then a qname using it
+                b"\x02" + struct.pack(">i", 0) + s("http://example.org/"),
+                b"\x03" + struct.pack(">i", 0) + s("a"),
+                b"\x07" + s("caf\u00e9") + s("fr"),
+                b"\x00",
+                # second row repeats the subject
+                b"\x01",
+                b"\x08" + s("42") + b"\x04" + s("http://www.w3.org/2001/XMLSchema#int"),
+                b"\x05" + s("b0"),
+                b"\x04" + s("urn:b"),
+                b"\x06" + s("plain"),
+                b"\x0a"
+                + (b"\x04" + s("urn:s"))
+                + (b"\x04" + s("urn:p"))
+                + (b"\x06" + s("o")),
+                b"\x7f",
+            ]
+        )
+
+    EXPECTED = [
+        {
+            "s": {"type": "uri", "value": "http://example.org/a"},
+            "o": {"type": "literal", "value": "caf\u00e9", "xml:lang": "fr"},
+        },
+        {
+            "s": {"type": "uri", "value": "http://example.org/a"},
+            "o": {
+                "type": "literal",
+                "value": "42",
+                "datatype": "http://www.w3.org/2001/XMLSchema#int",
+            },
+            "n": {"type": "bnode", "value": "b0"},
+        },
+        {
+            "s": {"type": "uri", "value": "urn:b"},
+            "o": {"type": "literal", "value": "plain"},
+            "n": {
+                "type": "triple",
+                "value": {
+                    "subject": {"type": "uri", "value": "urn:s"},
+                    "predicate": {"type": "uri", "value": "urn:p"},
+                    "object": {"type": "literal", "value": "o"},
+                },
+            },
+        },
+    ]
+
+    def test_decode(self):
+        from stardog.results import BinaryResultStream
+
+        body = self._results()
+        rows = BinaryResultStream(body[i : i + 1] for i in range(len(body)))
+        assert rows.vars == ["s", "o", "n"]
+        assert list(rows) == self.EXPECTED
+
+    def test_errors(self):
+        import struct
+        from stardog.results import BinaryResultStream
+
+        header = b"BQRT" + struct.pack(">ii", 4, 1) + self._string("s")
+        failed = BinaryResultStream([header + b"\x7e\x02" + self._string("boom")])
+        with pytest.raises(ValueError, match="boom"):
+            list(failed)
+
+        with pytest.raises(ValueError):
+            list(BinaryResultStream([header + b"\x04" + self._string("urn:a")]))
+        with pytest.raises(ValueError):
+            BinaryResultStream([b"{}"])
+
+    def test_select(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", content=self._results())
+            conn = stardog.connection.Connection("db", binary_results=True)
+
+            assert conn.select("select * {?s ?o ?n}") == {
+                "head": {"vars": ["s", "o", "n"]},
+                "results": {"bindings": self.EXPECTED},
+            }
+            assert m.last_request.headers["Accept"] == BINARY_RDF
+
+            with conn.select("select * {?s ?o ?n}", stream=True) as rows:
+                assert list(rows) == self.EXPECTED
+
+            # asking for a content type explicitly still gets the raw bytes
+            assert conn.select("select * {?s ?o ?n}", content_type=BINARY_RDF) == (
+                self._results()
+            )
+
+
+class TestColumnar:
+    TSV = (
+        "?s\t?n\t?d\t?label\t?when\t?flag\n"
+        '<urn:a>\t1\t"1.5"^^<http://www.w3.org/2001/XMLSchema#double>\t'
+        '"caf\\"e"@fr\t"2020-01-02T03:04:05"^^<http://www.w3.org/2001/XMLSchema#dateTime>'
+        "\ttrue\n"
+        '_:b1\t"7"^^<http://www.w3.org/2001/XMLSchema#int>\t2\t"tab\\there"\t'
+        '"2021-05-06T00:00:00"^^<http://www.w3.org/2001/XMLSchema#dateTime>\tfalse\n'
+        '<urn:c>\t\t3e2\t"x"^^<urn:dt>\t\t\n'
+    ).encode()
+
+    def test_read_tsv(self):
+        pd = pytest.importorskip("pandas")
+        from stardog import columnar
+
+        body = self.TSV
+        # two rows per chunk, the last one without any integer
+        frame = columnar.read_tsv(
+            (body[i : i + 5] for i in range(0, len(body), 5)), chunk_size=2
+        )
+
+        assert list(frame.columns) == ["s", "n", "d", "label", "when", "flag"]
+        assert list(frame["s"]) == ["urn:a", "_:b1", "urn:c"]
+        assert str(frame["n"].dtype) == "Int64"
+        assert frame["n"].tolist()[:2] == [1, 7] and frame["n"].isna()[2]
+        assert frame["d"].tolist() == [1.5, 2.0, 300.0]
+        assert frame["label"].tolist() == ['caf"e', "tab\there", "x"]
+        assert frame["when"][0] == pd.Timestamp("2020-01-02T03:04:05")
+        assert str(frame["flag"].dtype) == "boolean"
+
+    def test_select_arrays(self):
+        pytest.importorskip("pandas")
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", content=self.TSV)
+            conn = stardog.connection.Connection("db")
+            arrays = conn.select_arrays("select * {?s ?n ?d}")
+
+        assert m.last_request.headers["Accept"] == TSV
+        assert arrays["d"].dtype == "float64"
+        assert arrays["d"].sum() == 303.5
+        # unbound integers turn into NaN
+        assert arrays["n"].dtype == "float64"
+
+    def test_select_arrow(self):
+        pa = pytest.importorskip("pyarrow")
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", content=self.TSV)
+            conn = stardog.connection.Connection("db")
+            with conn.select_arrow("select * {?s ?n ?d}", batch_rows=2) as batches:
+                assert batches.schema.field("s").type == pa.dictionary(
+                    pa.int32(), pa.string()
+                )
+                assert batches.schema.field("n").type == pa.int64()
+                assert batches.schema.field("flag").type == pa.bool_()
+                sizes = [batch.num_rows for batch in batches]
+
+        assert m.last_request.headers["Accept"] == TSV
+        assert sizes == [2, 1]
+
+    def test_arrow_schema_mismatch(self):
+        pytest.importorskip("pyarrow")
+        from stardog import columnar
+
+        body = b"?n\n1\n2\nabc\n"
+        with pytest.raises(ValueError, match="pass a schema"):
+            columnar.read_arrow([body], batch_rows=2).read_all()
+
+
+class TestResultSet:
+    XSD = "http://www.w3.org/2001/XMLSchema#"
+    RESULTS = {
+        "head": {"vars": ["s", "count", "label"]},
+        "results": {
+            "bindings": [
+                {
+                    "s": {"type": "uri", "value": "urn:s"},
+                    "count": {
+                        "type": "literal",
+                        "value": str(i),
+                        "datatype": "http://www.w3.org/2001/XMLSchema#integer",
+                    },
+                    "label": {"type": "literal", "value": "x", "xml:lang": "en"},
+                }
+                for i in range(3)
+            ]
+            + [{"s": {"type": "bnode", "value": "b0"}}]
+        },
+    }
+
+    def test_select_result_set(self):
+        from stardog import terms
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self.RESULTS)
+            conn = stardog.connection.Connection("db")
+            rs = conn.select("select * {?s ?p ?o}", result_set=True)
+
+        assert rs.vars == ("s", "count", "label")
+        assert len(rs) == 4
+        # every row shares one object per distinct IRI
+        assert rs[0].s is rs[1].s is rs[2]["s"]
+        assert rs[0].s == terms.IRI("urn:s")
+        assert [row["count"].python for row in rs[:3]] == [0, 1, 2]
+        assert rs[0].label == terms.Literal("x", lang="en")
+        assert rs[3].asdict() == {"s": terms.BNode("b0")}
+        assert rs[3].get("label", "-") == "-"
+        assert rs.column("count")[3] is None
+
+    def test_literal_python(self):
+        import datetime
+        import decimal
+        import math
+
+        from stardog.terms import Literal
+
+        assert Literal("1.10", self.XSD + "decimal").python == decimal.Decimal("1.10")
+        assert Literal("-INF", self.XSD + "double").python == float("-inf")
+        assert math.isnan(Literal("NaN", self.XSD + "float").python)
+        assert Literal("1", self.XSD + "boolean").python is True
+        assert Literal("2020-01-02", self.XSD + "date").python == datetime.date(
+            2020, 1, 2
+        )
+        assert Literal("2020-01-02T03:04:05Z", self.XSD + "dateTime").python == (
+            datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        )
+        # invalid lexical forms are left alone
+        assert Literal("abc", self.XSD + "int").python == "abc"
+
+    def test_result_set_options(self):
+        conn = stardog.connection.Connection("db")
+        with pytest.raises(ValueError):
+            conn.select("select * {?s ?p ?o}", stream=True, result_set=True)
+
+
+class TestSelectPages:
+    @staticmethod
+    def _page(request, context, total=25):
+        params = urllib.parse.parse_qs(request.text)
+        offset, limit = int(params["offset"][0]), int(params["limit"][0])
+        rows = range(offset, min(offset + limit, total))
+        return {
+            "head": {"vars": ["i"]},
+            "results": {
+                "bindings": [{"i": {"type": "literal", "value": str(i)}} for i in rows]
+            },
+        }
+
+    def test_select_pages(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self._page)
+            conn = stardog.connection.Connection("db")
+            values = [
+                b["i"]["value"] for b in conn.select_pages("select ?i {}", page_size=10)
+            ]
+
+        assert values == [str(i) for i in range(25)]
+        # stops after the short page
+        assert m.call_count == 3
+
+    def test_limit_offset_and_close(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self._page)
+            conn = stardog.connection.Connection("db")
+            pages = conn.select_pages(
+                "select ?i {}", page_size=4, prefetch=0, offset=3, limit=6
+            )
+            assert [b["i"]["value"] for b in pages] == ["3", "4", "5", "6", "7", "8"]
+            assert [
+                urllib.parse.parse_qs(r.text)["limit"] for r in m.request_history
+            ] == [
+                ["4"],
+                ["2"],
+            ]
+
+            for prefetch in (1, 3):
+                fetched = m.call_count
+                pages = conn.select_pages(
+                    "select ?i {}", page_size=1, prefetch=prefetch
+                )
+                next(pages)
+                time.sleep(0.2)
+                # the page consumed, and no more than prefetch ahead of it
+                assert m.call_count - fetched == 1 + prefetch
+                pages.close()
+                time.sleep(0.2)
+                assert m.call_count - fetched == 1 + prefetch
+
+    def test_error(self):
+        with requests_mock.Mocker() as m:
+            m.post(
+                "http://localhost:5820/db/query",
+                status_code=400,
+                json={"code": "QE0PE2", "message": "bad query"},
+            )
+            conn = stardog.connection.Connection("db")
+            with pytest.raises(stardog.exceptions.StardogException):
+                list(conn.select_pages("select"))
+
+    def test_async_select_pages(self):
+        import asyncio
+        import httpx
+        from stardog.aio import AsyncConnection
+
+        def handler(request):
+            params = urllib.parse.parse_qs(request.content.decode())
+            offset, limit = int(params["offset"][0]), int(params["limit"][0])
+            rows = range(offset, min(offset + limit, 25))
+            return httpx.Response(
+                200,
+                json={
+                    "results": {
+                        "bindings": [
+                            {"i": {"type": "literal", "value": str(i)}} for i in rows
+                        ]
+                    }
+                },
+            )
+
+        async def run():
+            session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with AsyncConnection("db", session=session) as conn:
+                return [
+                    b["i"]["value"]
+                    async for b in conn.select_pages(
+                        "select ?i {}", page_size=10, prefetch=3
+                    )
+                ]
+
+        assert asyncio.run(run()) == [str(i) for i in range(25)]
+
+
+class TestPartitionedSelect:
+    def test_sparql_helpers(self):
+        import re
+        from stardog import sparql, terms
+
+        assert sparql.term(terms.IRI("urn:a")) == "<urn:a>"
+        assert sparql.term(terms.Literal('a"b', lang="en")) == '"a\\"b"@en'
+        assert sparql.term(None) == "UNDEF"
+        assert sparql.term(True) == "true"
+        assert (
+            sparql.values(["a", "b"], [("<urn:a>", 1), (None, 2)])
+            == "VALUES (?a ?b) { (<urn:a> 1) (UNDEF 2) }"
+        )
+        query = 'select * { ?s ?p "}" # }\n} limit 1'
+        assert sparql.inject(query, "X") == 'select * { ?s ?p "}" # }\n\nX\n} limit 1'
+        with pytest.raises(ValueError):
+            sparql.inject("ask", "X")
+
+        # every md5 prefix lands in exactly one bucket
+        for buckets in (1, 3, 4, 20):
+            prefixes = [
+                re.findall(r'"([0-9a-f]+)"', sparql.hash_filter("s", buckets, b))
+                for b in range(buckets)
+            ]
+            flat = [p for bucket in prefixes for p in bucket]
+            assert len(flat) == len(set(flat)) == 16 ** len(flat[0])
+        assert "!BOUND(?s)" in sparql.hash_filter("s", 4, 0)
+        assert "!BOUND(?s)" not in sparql.hash_filter("s", 4, 1)
+
+    @staticmethod
+    def _bindings(request, context):
+        query = urllib.parse.parse_qs(request.text)["query"][0]
+        values = re.findall(r"<(urn:[^>]+)>", query.split("VALUES", 1)[-1])
+        return {
+            "head": {"vars": ["s"]},
+            "results": {
+                "bindings": [{"s": {"type": "uri", "value": v}} for v in values]
+            },
+        }
+
+    def test_values_partitions(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self._bindings)
+            conn = stardog.connection.Connection("db")
+            values = ["<urn:%d>" % i for i in range(10)]
+            results = conn.select_partitioned(
+                "select * { ?s ?p ?o }", "s", partitions=3, values=values
+            )
+
+        assert m.call_count == 3
+        assert results["head"] == {"vars": ["s"]}
+        assert sorted(
+            b["s"]["value"] for b in results["results"]["bindings"]
+        ) == sorted("urn:%d" % i for i in range(10))
+
+    def test_hash_partitions_stream(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self._bindings)
+            conn = stardog.connection.Connection("db")
+            with conn.select_partitioned(
+                "select * { ?s ?p ?o }", "s", partitions=4, stream=True
+            ) as bindings:
+                assert list(bindings) == []
+
+        queries = [urllib.parse.parse_qs(r.text)["query"][0] for r in m.request_history]
+        assert sorted(q.count("MD5(STR(?s))") for q in queries) == [1, 1, 1, 1]
+        assert all(q.rstrip().endswith("}") for q in queries)
+
+    def test_errors(self):
+        conn = stardog.connection.Connection("db")
+        with pytest.raises(ValueError):
+            conn.select_partitioned("select * { ?s ?p ?o }", "s", limit=10)
+
+        with requests_mock.Mocker() as m:
+            m.post(
+                "http://localhost:5820/db/query",
+                status_code=400,
+                json={"code": "QE0PE2", "message": "bad query"},
+            )
+            with pytest.raises(stardog.exceptions.StardogException):
+                conn.select_partitioned("select * { ?s ?p ?o }", "s")
+
+
+class TestGraphStream:
+    NT = (
+        "# comment\n"
+        '<urn:a> <urn:b> "caf\\u00e9\\n"@fr .\r\n'
+        '_:b1 <urn:b> "1"^^<http://www.w3.org/2001/XMLSchema#int> .\n'
+        "\n"
+        "<< <urn:a> <urn:b> _:c >> <urn:p> <urn:o> .\n"
+    ).encode()
+
+    def test_parse(self):
+        from stardog import ntriples, terms
+
+        body = self.NT
+        triples = list(ntriples.parse(body[i : i + 1] for i in range(len(body))))
+        assert triples == [
+            (
+                terms.IRI("urn:a"),
+                terms.IRI("urn:b"),
+                terms.Literal("caf\u00e9\n", lang="fr"),
+            ),
+            (
+                terms.BNode("b1"),
+                terms.IRI("urn:b"),
+                terms.Literal("1", "http://www.w3.org/2001/XMLSchema#int"),
+            ),
+            (
+                terms.Triple(terms.IRI("urn:a"), terms.IRI("urn:b"), terms.BNode("c")),
+                terms.IRI("urn:p"),
+                terms.IRI("urn:o"),
+            ),
+        ]
+        assert triples[2][2].value == "urn:o"
+
+        quads = list(
+            ntriples.parse(
+                [b"<urn:a> <urn:b> <urn:c> <urn:g> .\n<urn:a> <urn:b> <urn:c> ."],
+                quads=True,
+            )
+        )
+        assert [q[3] for q in quads] == [terms.IRI("urn:g"), None]
+
+        with pytest.raises(ValueError, match="line 2"):
+            list(ntriples.parse([b"<urn:a> <urn:b> <urn:c> .\n<urn:a> <urn:b> .\n"]))
+
+    def test_graph_stream(self):
+        from stardog import terms
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", content=self.NT)
+            conn = stardog.connection.Connection("db")
+            with conn.graph("construct {?s ?p ?o} {?s ?p ?o}", stream=True) as triples:
+                subjects = [s for s, p, o in triples]
+
+            assert m.last_request.headers["Accept"] == NTRIPLES
+            assert subjects[1] == terms.BNode("b1")
+
+            m.post("http://localhost:5820/db/query", text="<urn:a> <urn:b> <urn:c> .")
+            assert (
+                conn.graph("construct {?s ?p ?o} {?s ?p ?o}")
+                == b"<urn:a> <urn:b> <urn:c> ."
+            )
+            assert m.last_request.headers["Accept"] == TURTLE
+
+        with pytest.raises(ValueError):
+            conn.graph("construct {?s ?p ?o} {?s ?p ?o}", TURTLE, stream=True)
+
+
+class TestExportToFile:
+    DATA = b"<urn:a> <urn:b> <urn:c> .\n" * 5000
+
+    def test_export_to_file(self, tmp_path):
+        import gzip
+
+        path = str(tmp_path / "export.nt")
+        seen = []
+        with requests_mock.Mocker() as m:
+            m.get("http://localhost:5820/db/export", content=self.DATA)
+            conn = stardog.connection.Connection("db")
+            stats = conn.export_to_file(
+                path, NTRIPLES, chunk_size=1000, progress=seen.append
+            )
+
+            assert m.last_request.headers["Accept"] == NTRIPLES
+            with open(path, "rb") as f:
+                assert f.read() == self.DATA
+            assert stats.bytes_received == stats.bytes_written == len(self.DATA)
+            assert seen[-1] is stats
+
+            # compressed locally
+            stats = conn.export_to_file(path + ".gz", NTRIPLES, compression="gzip")
+            assert m.last_request.headers["Accept-Encoding"] == "gzip"
+            with gzip.open(path + ".gz") as f:
+                assert f.read() == self.DATA
+            assert stats.bytes_written < stats.bytes_received
+
+            # gzip from the server, passed through or inflated
+            compressed = gzip.compress(self.DATA)
+            m.get(
+                "http://localhost:5820/db/export",
+                content=compressed,
+                headers={"Content-Encoding": "gzip"},
+            )
+            stats = conn.export_to_file(path + ".gz", NTRIPLES, compression="gzip")
+            with open(path + ".gz", "rb") as f:
+                assert f.read() == compressed
+            conn.export_to_file(path, NTRIPLES, chunk_size=100)
+            with open(path, "rb") as f:
+                assert f.read() == self.DATA
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "export.nt",
+            "export.nt.gz",
+        ]
+
+    def test_failed_export(self, tmp_path):
+        path = tmp_path / "export.nt"
+        path.write_bytes(b"previous")
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://localhost:5820/db/export",
+                status_code=500,
+                json={"code": "000012", "message": "boom"},
+            )
+            conn = stardog.connection.Connection("db")
+            with pytest.raises(stardog.exceptions.StardogException):
+                conn.export_to_file(str(path))
+
+        assert path.read_bytes() == b"previous"
+        assert [p.name for p in tmp_path.iterdir()] == ["export.nt"]
+
+
+class TestResultCache:
+    RESULTS = {"head": {"vars": ["s"]}, "results": {"bindings": []}}
+
+    def test_select_cache(self):
+        from stardog.cache import ResultCache
+
+        cache = ResultCache()
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self.RESULTS)
+            m.post("http://localhost:5820/db/tx/query", json=self.RESULTS)
+            m.post("http://localhost:5820/db/update", text="")
+            m.post("http://localhost:5820/db/transaction/begin", text="tx")
+            m.post("http://localhost:5820/db/transaction/commit/tx", text="")
+            conn = stardog.connection.Connection("db", cache=cache)
+
+            assert conn.select("select * {?s ?p ?o}") == self.RESULTS
+            assert conn.select("select * {?s ?p ?o}", timeout=10) == self.RESULTS
+            assert m.call_count == 1
+            # arguments changing the results are part of the key
+            conn.select("select * {?s ?p ?o}", reasoning=True)
+            conn.select("select * {?s ?p ?o}", bindings={"s": "<urn:a>"})
+            assert m.call_count == 3
+            stats = cache.stats()
+            assert (stats.hits, stats.misses, stats.entries) == (1, 3, 3)
+
+            conn.update("insert data {<urn:a> <urn:b> <urn:c>}")
+            assert len(cache) == 0
+            conn.select("select * {?s ?p ?o}")
+            assert len(cache) == 1
+
+            # transactions bypass the cache and commits invalidate it
+            conn.begin()
+            conn.select("select * {?s ?p ?o}")
+            assert m.last_request.path == "/db/tx/query"
+            conn.commit()
+            assert len(cache) == 0
+
+    def test_cache_per_credentials(self):
+        from requests.auth import AuthBase, HTTPBasicAuth
+
+        from stardog.cache import ResultCache
+
+        class Kerberos(AuthBase):
+            def __call__(self, r):
+                return r
+
+        cache = ResultCache()
+        secret = {
+            "head": {"vars": ["s"]},
+            "results": {"bindings": [{"s": {"type": "uri", "value": "urn:secret"}}]},
+        }
+        with requests_mock.Mocker() as m:
+            m.post(
+                "http://localhost:5820/db/query",
+                [{"json": secret}, {"json": self.RESULTS}, {"json": self.RESULTS}],
+            )
+            alice = stardog.connection.Connection(
+                "db", auth=HTTPBasicAuth("alice", "a"), cache=cache
+            )
+            bob = stardog.connection.Connection(
+                "db", auth=HTTPBasicAuth("bob", "b"), cache=cache
+            )
+            assert alice.select("select * {?s ?p ?o}") == secret
+            assert bob.select("select * {?s ?p ?o}") == self.RESULTS
+            assert m.call_count == 2
+
+            # a known user with the wrong password is another identity
+            guess = stardog.connection.Connection(
+                "db", auth=HTTPBasicAuth("alice", "guess"), cache=cache
+            )
+            assert guess.select("select * {?s ?p ?o}") == self.RESULTS
+            assert m.call_count == 3
+
+            # unknown credentials are never cached
+            kerberos = stardog.connection.Connection("db", auth=Kerberos(), cache=cache)
+            m.post("http://localhost:5820/db/query", json=self.RESULTS)
+            kerberos.select("select * {?s ?p ?o}")
+            kerberos.select("select * {?s ?p ?o}")
+            assert m.call_count == 5
+            assert len(cache) == 3
+
+    def test_limits(self, monkeypatch):
+        from stardog import cache
+
+        results = cache.ResultCache(max_entries=2, max_bytes=2000, ttl=10)
+        results.put("db", "a", b"1")
+        results.put("db", "b", b"2")
+        assert results.get("db", "a") == b"1"
+        results.put("db", "c", b"3")
+        # b was least recently used
+        assert results.get("db", "b") is None
+        results.put("db", "big", b"x" * 2000)
+        assert results.get("db", "big") is None
+        results.put("db", "d", b"x" * 1600)
+        assert len(results) == 1
+        assert results.stats().evictions == 3
+
+        now = time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+        assert results.get("db", "d") is None
+        assert results.stats().expirations == 1
+
+        # results fetched while the database was invalidated are dropped
+        generation = results.generation("db")
+        results.invalidate("db")
+        results.put("db", "e", b"5", generation)
+        assert results.get("db", "e") is None
+
+    def test_sqlite_cache(self, tmp_path, monkeypatch):
+        from stardog import cache
+
+        path = str(tmp_path / "results.sqlite")
+        # two instances stand for two processes sharing the file
+        first = cache.SQLiteCache(path, max_entries=10, ttl=10)
+        second = cache.SQLiteCache(path, max_entries=10, ttl=10)
+
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self.RESULTS)
+            conn = stardog.connection.Connection("db", cache=first)
+            key = cache.query_key(
+                cache.identity(conn.client.auth),
+                "http://localhost:5820/db",
+                "query",
+                "select * {?s ?p ?o}",
+                SPARQL_JSON,
+            )
+            conn.select("select * {?s ?p ?o}")
+            assert second.get("http://localhost:5820/db", key) is not None
+            assert m.call_count == 1
+
+            # the key of another user or server misses in every process
+            other = stardog.connection.Connection(
+                "db", username="anonymous", password="anonymous", cache=second
+            )
+            other.select("select * {?s ?p ?o}")
+            assert m.call_count == 2
+            moved = cache.query_key(
+                key[0], "http://other:5820/db", "query", key[3], SPARQL_JSON
+            )
+            assert first.get("http://localhost:5820/db", moved) is None
+
+        # an invalidation through either instance is seen by both
+        generation = first.generation("http://localhost:5820/db")
+        second.invalidate("http://localhost:5820/db")
+        assert first.get("http://localhost:5820/db", key) is None
+        first.put("http://localhost:5820/db", key, b"stale", generation)
+        assert second.get("http://localhost:5820/db", key) is None
+
+        for i in range(12):
+            first.put("db", str(i), b"x")
+        stats = second.stats()
+        assert stats.entries == 10 and stats.bytes == 10
+        # evicted down to 90% of the limit at once
+        assert first.stats().evictions == 2
+        assert first.get("db", "1") is None and first.get("db", "2") == b"x"
+
+        now = time.time()
+        monkeypatch.setattr(cache.time, "time", lambda: now + 11)
+        assert second.get("db", "11") is None
+        assert second.stats().expirations == 1
+        first.close()
+        second.close()
+
+
+class TestMetadataCache:
+    def test_revalidation(self):
+        from stardog.cache import MetadataCache
+
+        cache = MetadataCache()
+
+        def databases(request, context):
+            if request.headers.get("If-None-Match") == '"v1"':
+                context.status_code = 304
+                return {}
+            context.headers["ETag"] = '"v1"'
+            return {"databases": ["db"]}
+
+        with requests_mock.Mocker() as m:
+            m.get("http://localhost:5820/admin/databases", json=databases)
+            m.post("http://localhost:5820/admin/databases", json={})
+            admin = stardog.admin.Admin(metadata_cache=cache)
+
+            assert [d.name for d in admin.databases()] == ["db"]
+            assert [d.name for d in admin.databases()] == ["db"]
+            assert m.request_history[1].headers["If-None-Match"] == '"v1"'
+            stats = cache.stats()
+            assert (stats.hits, stats.revalidations, stats.misses) == (1, 1, 1)
+
+            # changes through the same admin drop the cached list
+            admin.new_database("db2")
+            admin.databases()
+            assert "If-None-Match" not in m.last_request.headers
+
+    def test_ttl_and_invalidation(self, monkeypatch):
+        from stardog import cache
+
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://localhost:5820/admin/databases/db/options",
+                json={"search.enabled": False},
+            )
+            m.post("http://localhost:5820/admin/databases/db/options", json={})
+            m.put(
+                "http://localhost:5820/admin/databases/db/options",
+                json={"search.enabled": False},
+            )
+            m.get(
+                "http://localhost:5820/db/namespaces",
+                json={"namespaces": [{"prefix": "ex", "name": "urn:ex:"}]},
+            )
+            m.get("http://localhost:5820/admin/users", json={"users": ["admin"]})
+            admin = stardog.admin.Admin(metadata_cache=cache.MetadataCache(ttl=5))
+            db = admin.database("db")
+
+            db.get_all_options()
+            db.get_all_options()
+            db.namespaces()
+            db.namespaces()
+            admin.users()
+            assert m.call_count == 3
+
+            # a read through PUT keeps the cache
+            db.get_options("search.enabled")
+            db.get_all_options()
+            assert m.call_count == 4
+
+            # options hold the namespaces
+            db.set_options({"search.enabled": True})
+            db.namespaces()
+            db.get_all_options()
+            admin.users()
+            assert m.call_count == 7
+
+            now = time.monotonic()
+            monkeypatch.setattr(cache.time, "monotonic", lambda: now + 6)
+            admin.users()
+            assert m.call_count == 8
+
+    def test_shared_cache(self):
+        from requests.auth import HTTPBasicAuth
+
+        from stardog.cache import MetadataCache
+
+        shared = MetadataCache()
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://localhost:5820/admin/users",
+                [{"json": {"users": ["admin", "bob"]}}, {"json": {"users": ["bob"]}}],
+            )
+            m.get("http://other:5820/admin/users", json={"users": ["carl"]})
+            admin = stardog.admin.Admin(metadata_cache=shared)
+            bob = stardog.admin.Admin(
+                auth=HTTPBasicAuth("bob", "b"), metadata_cache=shared
+            )
+            other = stardog.admin.Admin("http://other:5820", metadata_cache=shared)
+
+            assert [u.name for u in admin.users()] == ["admin", "bob"]
+            assert [u.name for u in bob.users()] == ["bob"]
+            assert [u.name for u in other.users()] == ["carl"]
+            assert m.call_count == 3
+
+            assert [u.name for u in bob.users()] == ["bob"]
+            assert m.call_count == 3
+            assert shared.stats().entries == 3
+
+
+class TestPreparedQuery:
+    RESULTS = {"head": {"vars": ["s"]}, "results": {"bindings": []}}
+
+    def test_execute(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self.RESULTS)
+            conn = stardog.connection.Connection("db")
+            query = conn.prepare(
+                "PREFIX ex: <urn:ex:>\n# comment\nSELECT * {?s ex:p ?o}",
+                reasoning=True,
+                bindings={"o": "<urn:o>"},
+            )
+            assert query.form == "select"
+
+            assert query.execute(bindings={"s": "<urn:a>"}, limit=5) == self.RESULTS
+            params = urllib.parse.parse_qs(m.last_request.text)
+            assert params == {
+                "query": [query.query],
+                "reasoning": ["True"],
+                "limit": ["5"],
+                "$o": ["<urn:o>"],
+                "$s": ["<urn:a>"],
+            }
+            assert m.last_request.headers["Accept"] == SPARQL_JSON
+
+            results = query.execute_many(
+                [{"s": "<urn:%d>" % i} for i in range(4)], max_workers=2
+            )
+            assert results == [self.RESULTS] * 4
+            sent = sorted(
+                urllib.parse.parse_qs(r.text)["$s"][0] for r in m.request_history[1:]
+            )
+            assert sent == ["<urn:%d>" % i for i in range(4)]
+
+            with query.execute_iter() as bindings:
+                assert list(bindings) == []
+
+            with pytest.raises(TypeError):
+                query.execute(reasoning=False)
+
+    def test_execute_many_in_transaction(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/transaction/begin", text="tx1")
+            m.post("http://localhost:5820/db/tx1/query", json=self.RESULTS)
+            conn = stardog.connection.Connection("db", thread_safe=True)
+            query = conn.prepare("select * {?s ?p ?o}")
+            conn.begin()
+
+            query.execute_many([{"s": "<urn:a>"}, {"s": "<urn:b>"}], max_workers=2)
+            paths = [r.path for r in m.request_history[1:]]
+            assert paths == ["/db/tx1/query"] * 2
+
+    def test_forms(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", text="true")
+            conn = stardog.connection.Connection("db")
+            query = conn.prepare("ask {?s ?p ?o}")
+            assert query.execute() is True
+            assert m.last_request.headers["Accept"] == BOOLEAN
+
+            m.post("http://localhost:5820/db/query", text="<urn:a> <urn:b> <urn:c> .\n")
+            query = conn.prepare("construct {?s ?p ?o} {?s ?p ?o}", NTRIPLES)
+            with query.execute_iter() as triples:
+                assert len(list(triples)) == 1
+
+        with pytest.raises(ValueError):
+            conn.prepare("insert data {<urn:a> <urn:b> <urn:c>}")
+        with pytest.raises(TypeError):
+            conn.prepare("select * {?s ?p ?o}", reasonning=True)
+
+
+class TestSelectBatch:
+    @staticmethod
+    def _results(request, context):
+        # answers every row of the VALUES block with the ?p it binds
+        query = urllib.parse.parse_qs(request.text)["query"][0]
+        rows = re.findall(r"\((\d+) (<[^>]*>|UNDEF)\)", query)
+        bindings = []
+        for row, p in rows:
+            if p == "UNDEF":
+                continue
+            for i in range(int(row) % 3):
+                bindings.append(
+                    {
+                        "_row": {"type": "literal", "value": row},
+                        "p": {"type": "uri", "value": p[1:-1]},
+                        "n": {"type": "literal", "value": str(i)},
+                    }
+                )
+        return {"head": {"vars": ["_row", "p", "n"]}, "results": {"bindings": bindings}}
+
+    def test_select_batch(self):
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:5820/db/query", json=self._results)
+            conn = stardog.connection.Connection("db")
+            bindings = [{"p": "<urn:%d>" % i} for i in range(7)] + [{}]
+            results = conn.select_batch(
+                "select distinct ?p ?n { ?p <urn:n> ?n }", bindings, chunk_size=3
+            )
+
+        assert m.call_count == 3
+        query = urllib.parse.parse_qs(m.request_history[0].text)["query"][0]
+        assert query.startswith("select distinct ?_row ?p ?n")
+        assert "VALUES (?_row ?p) { (0 <urn:0>) (1 <urn:1>) (2 <urn:2>) }" in query
+
+        assert len(results) == 8
+        assert results[0]["head"]["vars"] == ["p", "n"]
+        # rows are numbered within each batch
+        assert [len(r["results"]["bindings"]) for r in results] == [
+            0,
+            1,
+            2,
+            0,
+            1,
+            2,
+            0,
+            0,
+        ]
+        assert results[4]["results"]["bindings"][0] == {
+            "p": {"type": "uri", "value": "urn:4"},
+            "n": {"type": "literal", "value": "0"},
+        }
+
+    def test_invalid(self):
+        conn = stardog.connection.Connection("db")
+        with pytest.raises(ValueError):
+            conn.select_batch("select ?_row {?_row ?p ?o}", [{}])
+        with pytest.raises(ValueError):
+            conn.select_batch("ask {?s ?p ?o}", [{}])
+        with pytest.raises(ValueError):
+            conn.select_batch("select * {?s ?p ?o}", [{}], limit=1)
+
+
+class TestNamespaces:
+    def test_update_namespaces(self):
+        written = []
+
+        def set_options(request, context):
+            written.append(request.json()["database.namespaces"])
+            return {}
+
+        with requests_mock.Mocker() as m:
+            m.put(
+                "http://localhost:5820/admin/databases/db/options",
+                json={"database.namespaces": ["a=urn:a:", "b=urn:b:", "c=urn:c:"]},
+            )
+            m.post("http://localhost:5820/admin/databases/db/options", json=set_options)
+            db = stardog.admin.Admin().database("db")
+
+            diff = db.update_namespaces(
+                add={"b": "urn:B:", "d": "urn:d="}, remove=["c", "x"]
+            )
+            assert diff == {"added": ["d"], "removed": ["c"], "changed": ["b"]}
+            assert written == [["a=urn:a:", "b=urn:B:", "d=urn:d="]]
+            # one read and one write
+            assert m.call_count == 2
+
+            assert db.set_namespaces({"c": "urn:c:", "b": "urn:b:", "a": "urn:a:"}) == {
+                "added": [],
+                "removed": [],
+                "changed": [],
+            }
+            assert m.call_count == 3
+
+            db.add_namespace("e", "urn:e:")
+            assert written[-1][-1] == "e=urn:e:"
+            with pytest.raises(Exception, match="already exists"):
+                db.add_namespace("a", "urn:x:")
+            with pytest.raises(Exception, match="does not exists"):
+                db.remove_namespace("x")
+
+
+class TestCatalog:
+    def test_snapshot(self):
+        base = "http://localhost:5820/admin"
+        with requests_mock.Mocker() as m:
+            m.get(base + "/databases", json={"databases": ["db1", "db2"]})
+            m.get(base + "/databases/db1/options", json={"search.enabled": True})
+            m.get(base + "/databases/db2/options", json={"search.enabled": False})
+            m.get(base + "/users", json={"users": ["anne", "bob", "carl"]})
+            m.get(base + "/users/anne/roles", json={"roles": ["reader"]})
+            m.get(base + "/users/bob/roles", json={"roles": ["reader", "writer"]})
+            m.get(base + "/users/carl/roles", json={"roles": []})
+            m.get(base + "/roles", json={"roles": ["reader", "writer"]})
+            m.get(
+                base + "/permissions/role/reader",
+                json={
+                    "permissions": [
+                        {"action": "READ", "resource_type": "db", "resource": ["db1"]}
+                    ]
+                },
+            )
+            m.get(
+                base + "/permissions/role/writer",
+                json={
+                    "permissions": [
+                        {"action": "ALL", "resource_type": "*", "resource": ["*"]}
+                    ]
+                },
+            )
+            m.get(base + "/virtual_graphs", json={"virtual_graphs": ["virtual://vg"]})
+            m.get(base + "/virtual_graphs/vg/info", json={"info": {"db": "db1"}})
+            m.get(base + "/data_sources", json={"data_sources": ["ds"]})
+
+            catalog = stardog.admin.Admin().snapshot(max_workers=4)
+            assert m.call_count == 13
+
+        assert catalog.databases["db1"]["search.enabled"] is True
+        assert catalog.users["bob"] == ("reader", "writer")
+        assert catalog.virtual_graphs["vg"]["db"] == "db1"
+        assert catalog.datasources == {"ds"}
+
+        assert catalog.roles_granting("read", "db", "db1") == {"reader", "writer"}
+        assert catalog.roles_granting("write", "db", "db1") == {"writer"}
+        assert catalog.roles_granting("read", "db", "db2") == {"writer"}
+        assert catalog.users_with_role("reader") == {"anne", "bob"}
+        assert catalog.users_granted("read", "db", "db1") == {"anne", "bob"}
+        assert catalog.users_granted("read", "db", "db2") == {"bob"}
+        assert catalog.users_with_role("nobody") == frozenset()
+
+        with pytest.raises(TypeError):
+            catalog.databases["db3"] = {}
+        with pytest.raises(AttributeError):
+            catalog.databases = {}
+
+
+class TestAsyncConnection:
+    @staticmethod
+    def _session(handler):
+        import httpx
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def test_select_and_transaction(self):
+        import asyncio
+        import httpx
+        from stardog.aio import AsyncConnection
+
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append((request.method, request.url.path))
+            if request.url.path == "/db/transaction/begin":
+                return httpx.Response(200, text="tx1")
+            if request.url.path == "/db/query":
+                assert b"graph-uri" not in request.content
+                assert request.headers["Accept"] == SPARQL_JSON
+                return httpx.Response(200, json={"results": {"bindings": []}})
+            return httpx.Response(200)
+
+        async def run():
+            async with AsyncConnection("db", session=self._session(handler)) as conn:
+                results = await conn.select("select * {?s ?p ?o}", limit=10)
+                assert results == {"results": {"bindings": []}}
+                await conn.begin()
+                await conn.add(content.Raw("<urn:a> <urn:b> <urn:c> .", TURTLE))
+                await conn.commit()
+
+        asyncio.run(run())
+        assert requests_seen == [
+            ("POST", "/db/query"),
+            ("POST", "/db/transaction/begin"),
+            ("POST", "/db/tx1/add"),
+            ("POST", "/db/transaction/commit/tx1"),
+        ]
+
+    def test_error(self):
+        import asyncio
+        import httpx
+        from stardog.aio import AsyncAdmin
+
+        def handler(request):
+            return httpx.Response(404, json={"code": "0D0DU2", "message": "nope"})
+
+        async def run():
+            async with AsyncAdmin(session=self._session(handler)) as admin:
+                await admin.databases()
+
+        with pytest.raises(stardog.exceptions.StardogException) as e:
+            asyncio.run(run())
+        assert e.value.http_code == 404
+        assert e.value.stardog_code == "0D0DU2"
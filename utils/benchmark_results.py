@@ -0,0 +1,150 @@
+"""Compares parsing throughput of SPARQL JSON and binary select results.
+
+Usage:
+    python utils/benchmark_results.py [--rows N] [--chunk-size N]
+        [--bandwidth MBIT]
+
+Builds a synthetic result with an IRI, a language tagged literal, a typed
+literal and an often unbound variable per row, encodes it in both formats
+and times every decoder over the same rows. The end-to-end estimate adds the
+time needed to receive the payload at the given bandwidth, since the binary
+format is mostly a saving in bytes on the wire.
+"""
+
+import argparse
+import json
+import struct
+import time
+
+from stardog import results
+
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+
+
+def bindings(rows):
+    for i in range(rows):
+        binding = {
+            "s": {"type": "uri", "value": "http://example.org/item/{}".format(i)},
+            "label": {
+                "type": "literal",
+                "value": "Item {}".format(i),
+                "xml:lang": "en",
+            },
+            "count": {
+                "type": "literal",
+                "value": str(i % 1000),
+                "datatype": XSD_INTEGER,
+            },
+        }
+        if i % 3 == 0:
+            binding["note"] = {"type": "literal", "value": "note {}".format(i)}
+        yield binding
+
+
+def encode_json(variables, rows):
+    return json.dumps(
+        {"head": {"vars": variables}, "results": {"bindings": list(bindings(rows))}}
+    ).encode("utf-8")
+
+
+def encode_binary(variables, rows):
+    def string(value):
+        data = value.encode("utf-8")
+        return struct.pack(">i", len(data)) + data
+
+    out = [b"BQRT", struct.pack(">ii", 4, len(variables))]
+    out.extend(string(v) for v in variables)
+
+    # namespaces are declared once and then referenced by id
+    namespaces = {}
+
+    def iri(value):
+        ns, local = value.rsplit("/", 1)
+        ns += "/"
+        declaration = b""
+        if ns not in namespaces:
+            namespaces[ns] = len(namespaces)
+            declaration = b"\x02" + struct.pack(">i", namespaces[ns]) + string(ns)
+        return declaration + b"\x03" + struct.pack(">i", namespaces[ns]) + string(local)
+
+    for binding in bindings(rows):
+        for var in variables:
+            term = binding.get(var)
+            if term is None:
+                out.append(b"\x00")
+            elif term["type"] == "uri":
+                out.append(iri(term["value"]))
+            elif "xml:lang" in term:
+                out.append(b"\x07" + string(term["value"]) + string(term["xml:lang"]))
+            elif "datatype" in term:
+                out.append(
+                    b"\x08" + string(term["value"]) + b"\x04" + string(term["datatype"])
+                )
+            else:
+                out.append(b"\x06" + string(term["value"]))
+    out.append(b"\x7f")
+    return b"".join(out)
+
+
+def chunked(data, size):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+def timed(name, rows, size, bandwidth, parse):
+    start = time.perf_counter()
+    count = parse()
+    elapsed = time.perf_counter() - start
+    assert count == rows, (name, count)
+
+    transfer = size * 8 / (bandwidth * 1e6)
+    print(
+        "{:<20} {:>10.2f} {:>12.0f} {:>14.2f}".format(
+            name, size / 1e6, rows / elapsed, elapsed + transfer
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    parser.add_argument("--bandwidth", type=float, default=100.0)
+    args = parser.parse_args()
+
+    variables = ["s", "label", "count", "note"]
+    as_json = encode_json(variables, args.rows)
+    as_binary = encode_binary(variables, args.rows)
+
+    print(
+        "{:<20} {:>10} {:>12} {:>14}".format("decoder", "MB", "rows/s", "end-to-end s")
+    )
+
+    timed(
+        "json.loads",
+        args.rows,
+        len(as_json),
+        args.bandwidth,
+        lambda: len(json.loads(as_json)["results"]["bindings"]),
+    )
+    timed(
+        "BindingStream",
+        args.rows,
+        len(as_json),
+        args.bandwidth,
+        lambda: sum(
+            1 for _ in results.BindingStream(chunked(as_json, args.chunk_size))
+        ),
+    )
+    timed(
+        "BinaryResultStream",
+        args.rows,
+        len(as_binary),
+        args.bandwidth,
+        lambda: sum(
+            1 for _ in results.BinaryResultStream(chunked(as_binary, args.chunk_size))
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compares the HTTP transports against a running Stardog server.
+
+Usage:
+    python utils/benchmark_transports.py [--endpoint URL] [--database DB]
+        [--requests N] [--threads N] [--query QUERY]
+
+The database is created if it does not exist. Every transport runs the same
+query the same number of times, spread over a thread pool sharing one
+connection, and the throughput and latency percentiles are reported.
+"""
+
+import argparse
+import concurrent.futures
+import statistics
+import time
+
+import stardog
+from stardog.http.client import ConnectionPool
+
+
+def run(transport, args):
+    with ConnectionPool(
+        pool_maxsize=args.threads, pool_block=True, transport=transport
+    ) as pool:
+        conn = stardog.Connection(
+            args.database,
+            endpoint=args.endpoint,
+            username=args.username,
+            password=args.password,
+            pool=pool,
+            thread_safe=True,
+        )
+
+        def timed(_):
+            start = time.perf_counter()
+            conn.select(args.query)
+            return time.perf_counter() - start
+
+        # warm up the pool
+        list(map(timed, range(args.threads)))
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.threads) as executor:
+            latencies = sorted(executor.map(timed, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "req/s": args.requests / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--endpoint", default="http://localhost:5820")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--database", default="pystardog-benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--transports", nargs="+", default=["requests", "urllib3", "httpx"]
+    )
+    parser.add_argument("--query", default="select * { ?s ?p ?o } limit 10")
+    args = parser.parse_args()
+
+    admin = stardog.Admin(args.endpoint, args.username, args.password)
+    if args.database not in [db.name for db in admin.databases()]:
+        admin.new_database(args.database)
+
+    print(
+        "{:<10} {:>10} {:>10} {:>10}".format("transport", "req/s", "p50 ms", "p99 ms")
+    )
+    for transport in args.transports:
+        try:
+            result = run(transport, args)
+        except ImportError as e:
+            print("{:<10} skipped: {}".format(transport, e))
+            continue
+        print(
+            "{:<10} {:>10.1f} {:>10.2f} {:>10.2f}".format(
+                transport, result["req/s"], result["p50 ms"], result["p99 ms"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()